@@ -0,0 +1,147 @@
+# backend/app/db/cost_guard.py
+"""
+Pre-execution cost guard for generated SQL.
+
+Runs EXPLAIN (FORMAT JSON) on the final (LIMIT-wrapped) query and compares
+the planner's estimated total cost and peak row count against configured
+thresholds. Runaway plans - typically a missing join condition that turns
+order_items x customers into a cartesian product - are rejected, or run in
+an approximate mode with a statement timeout and a reduced row cap.
+
+Plan summaries are cached by SQL fingerprint and data version, so repeated
+queries (and the same template with different constants) skip the EXPLAIN
+round trip until the next ingest changes the tables.
+"""
+
+from typing import Dict, Any, List, Optional
+import json
+import logging
+import os
+
+from sqlalchemy import text
+
+from .data_version import current_data_version
+from ..utils.cache import LRUCache
+from ..utils.sql_shape import fingerprint_sql
+
+# reject | approximate | off
+COST_GUARD_MODE = os.getenv("COST_GUARD_MODE", "reject").lower()
+MAX_PLAN_COST = float(os.getenv("MAX_PLAN_COST", "5000000"))
+MAX_PLAN_ROWS = float(os.getenv("MAX_PLAN_ROWS", "10000000"))
+APPROX_TIMEOUT_MS = int(os.getenv("APPROX_TIMEOUT_MS", "5000"))
+APPROX_MAX_ROWS = int(os.getenv("APPROX_MAX_ROWS", "100"))
+
+logger = logging.getLogger(__name__)
+
+_plan_cache = LRUCache(int(os.getenv("PLAN_CACHE_SIZE", "512")), name="plan")
+
+
+class QueryTooExpensive(Exception):
+    """Raised when a query's estimated plan exceeds the configured limits."""
+
+    def __init__(self, message: str, plan: Dict[str, Any]):
+        super().__init__(message)
+        self.plan = plan
+
+
+def _walk_plan(node: Dict[str, Any], summary: Dict[str, Any], depth: int = 0):
+    """Collect node types, seq scans and joins without a join condition."""
+    node_type = node.get("Node Type", "?")
+    summary["nodes"].append(f"{'  ' * depth}{node_type} (rows={int(node.get('Plan Rows', 0))}, "
+                            f"cost={node.get('Total Cost', 0):.0f})")
+    summary["peak_rows"] = max(summary["peak_rows"], float(node.get("Plan Rows", 0)))
+
+    if node_type == "Seq Scan" and node.get("Relation Name"):
+        summary["seq_scans"].append(node["Relation Name"])
+
+    # A nested loop with no join filter/condition over two relations is a cross join
+    if node_type == "Nested Loop" and not node.get("Join Filter") and not _has_inner_condition(node):
+        summary["cross_joins"] += 1
+
+    for child in node.get("Plans", []):
+        _walk_plan(child, summary, depth + 1)
+
+
+def _has_inner_condition(node: Dict[str, Any]) -> bool:
+    """True if the inner side of a nested loop is parameterised by the outer side."""
+    children = node.get("Plans", [])
+    if len(children) < 2:
+        return True
+    inner = children[1]
+    while inner.get("Node Type") in ("Materialize", "Memoize") and inner.get("Plans"):
+        if "Cache Key" in inner:
+            return True
+        inner = inner["Plans"][0]
+    return any(key in inner for key in ("Index Cond", "Recheck Cond")) or inner.get("Plans") is not None \
+        and any("Index Cond" in child or "Recheck Cond" in child for child in inner["Plans"])
+
+
+def summarize_plan(plan_json: Any) -> Dict[str, Any]:
+    """Reduce EXPLAIN (FORMAT JSON) output to the numbers the guard and the API need."""
+    if isinstance(plan_json, str):
+        plan_json = json.loads(plan_json)
+    root = plan_json[0]["Plan"]
+
+    summary: Dict[str, Any] = {
+        "total_cost": float(root.get("Total Cost", 0)),
+        "plan_rows": float(root.get("Plan Rows", 0)),
+        "peak_rows": 0.0,
+        "root_node": root.get("Node Type"),
+        "seq_scans": [],
+        "cross_joins": 0,
+        "nodes": [],
+    }
+    _walk_plan(root, summary)
+    return summary
+
+
+def explain(session, sql: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """EXPLAIN a query (no ANALYZE, nothing is executed), cached by fingerprint and data version."""
+    key = (fingerprint_sql(sql), current_data_version(session))
+    cached = _plan_cache.get(key)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    row = session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params or {}).fetchone()
+    summary = summarize_plan(row[0])
+    _plan_cache.set(key, summary)
+    return {**summary, "cached": False}
+
+
+def check_query_cost(session, sql: str, params: Optional[Dict[str, Any]] = None,
+                     mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Decide whether a query may run.
+
+    Returns:
+        {"verdict": "ok" | "approximate" | "skipped", "plan": summary or None, "reasons": [...]}
+
+    Raises:
+        QueryTooExpensive: plan exceeds thresholds and mode is "reject"
+    """
+    mode = (mode or COST_GUARD_MODE).lower()
+    if mode == "off":
+        return {"verdict": "skipped", "plan": None, "reasons": []}
+
+    plan = explain(session, sql, params)
+
+    reasons: List[str] = []
+    if plan["total_cost"] > MAX_PLAN_COST:
+        reasons.append(f"estimated cost {plan['total_cost']:.0f} > {MAX_PLAN_COST:.0f}")
+    if plan["peak_rows"] > MAX_PLAN_ROWS:
+        reasons.append(f"estimated rows {plan['peak_rows']:.0f} > {MAX_PLAN_ROWS:.0f}")
+    if not reasons:
+        return {"verdict": "ok", "plan": plan, "reasons": []}
+
+    if plan["cross_joins"]:
+        reasons.append(f"{plan['cross_joins']} join(s) without a join condition (missing JOIN ... ON?)")
+
+    logger.warning("Cost guard %s: %s", mode, "; ".join(reasons))
+    if mode == "approximate":
+        return {"verdict": "approximate", "plan": plan, "reasons": reasons}
+    raise QueryTooExpensive("Query rejected by cost guard: " + "; ".join(reasons), plan)
+
+
+def apply_approximate_limits(session):
+    """Bound the current transaction for a query running in approximate mode."""
+    session.execute(text("SELECT set_config('statement_timeout', :ms, true)"), {"ms": str(APPROX_TIMEOUT_MS)})
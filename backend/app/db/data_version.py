@@ -0,0 +1,63 @@
+# backend/app/db/data_version.py
+"""
+Data-version counter for the normalized tables.
+
+Every ingest (full reload or incremental) bumps a single-row counter in the
+same transaction that publishes the data. In-process caches whose entries
+depend on table contents (e.g. EXPLAIN plans in cost_guard) include the
+current version in their keys, so a new load invalidates them without a
+restart. The version is read at most once per DATA_VERSION_TTL seconds.
+"""
+
+from threading import Lock
+from typing import Optional
+import os
+import time
+
+from sqlalchemy import text
+
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "5"))
+
+_lock = Lock()
+_cached = {"version": 0, "checked": float("-inf")}
+
+
+def ensure_data_version_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS data_version (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT now(),
+            source TEXT,
+            rows BIGINT
+        )
+    """))
+
+
+def bump_data_version(conn, source: str, rows: Optional[int] = None) -> int:
+    """Increment the counter inside the caller's transaction; returns the new version."""
+    ensure_data_version_table(conn)
+    version = conn.execute(text("""
+        INSERT INTO data_version (id, version, updated_at, source, rows)
+        VALUES (TRUE, 1, now(), :source, :rows)
+        ON CONFLICT (id) DO UPDATE
+        SET version = data_version.version + 1, updated_at = EXCLUDED.updated_at,
+            source = EXCLUDED.source, rows = EXCLUDED.rows
+        RETURNING version
+    """), {"source": source, "rows": rows}).scalar()
+    print(f"[Data Version] {source}: now at version {version}")
+    return version
+
+
+def current_data_version(session) -> int:
+    """Latest data version (0 before the first versioned load), cached for DATA_VERSION_TTL seconds."""
+    now = time.monotonic()
+    with _lock:
+        if now - _cached["checked"] < DATA_VERSION_TTL:
+            return _cached["version"]
+    version = 0
+    if session.execute(text("SELECT to_regclass('data_version')")).scalar():
+        version = session.execute(text("SELECT COALESCE(MAX(version), 0) FROM data_version")).scalar()
+    with _lock:
+        _cached.update(version=int(version), checked=now)
+    return int(version)
@@ -0,0 +1,267 @@
+# backend/app/db/export.py
+"""
+Full-result export of a validated query, streamed through COPY TO STDOUT.
+
+/api/query caps results at MAX_QUERY_ROWS because they are materialized as
+Python dicts and serialized to JSON. An export instead runs
+
+    COPY (<sql>) TO STDOUT WITH (FORMAT csv, HEADER)
+
+in a READ ONLY transaction with its own statement timeout, and forwards the
+server's CSV bytes as they arrive, so memory stays constant however many rows
+there are and no row becomes a Python object. Parquet is produced by feeding
+that CSV stream through pyarrow's streaming CSV reader and writing each
+record batch as a row group (pyarrow is optional).
+"""
+
+from typing import Any, Dict, Iterator, List, Optional
+import io
+import os
+import queue
+import re
+import threading
+
+from sqlalchemy import text
+
+from .database import engine
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    from pyarrow import parquet as pq
+except ImportError:  # optional: Parquet export
+    pa = None
+
+EXPORT_TIMEOUT_MS = int(os.getenv("EXPORT_TIMEOUT_MS", "300000"))
+# CSV bytes per Arrow record batch (one Parquet row group each)
+EXPORT_BATCH_BYTES = int(os.getenv("EXPORT_BATCH_BYTES", str(8 << 20)))
+# COPY OUT arrives one row per message; rows are passed on in chunks of about this size
+COPY_CHUNK_BYTES = 256 << 10
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Postgres type OIDs -> Arrow types for the Parquet schema (anything else is a string column)
+_ARROW_TYPES = {
+    16: "bool", 20: "int64", 21: "int16", 23: "int32", 700: "float32", 701: "float64",
+    1700: "float64", 1082: "date32", 1114: "timestamp",
+}
+
+
+class ExportUnavailable(RuntimeError):
+    pass
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def inline_params(sql: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Render bound parameters as SQL literals: COPY (query) cannot take bind parameters."""
+    sql = re.sub(r';\s*$', '', sql.strip())
+    used = {k: v for k, v in (params or {}).items() if re.search(rf":{re.escape(k)}\b", sql)}
+    if not used:
+        return sql
+    stmt = text(sql).bindparams(**used)
+    return str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def _begin_read_only(cur, timeout_ms: int):
+    cur.execute("SET TRANSACTION READ ONLY")
+    cur.execute(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+def _copy_out(cur, statement: str) -> Iterator[bytes]:
+    """COPY ... TO STDOUT as a stream of byte chunks on a psycopg 3 or psycopg2 cursor."""
+    if hasattr(cur, "copy"):
+        # The server sends one message per row: hand them on in COPY_CHUNK_BYTES chunks.
+        # Closing the generator early exits the block, and psycopg cancels the COPY itself.
+        with cur.copy(statement) as copy:
+            parts, size = [], 0
+            for row in copy:
+                parts.append(bytes(row))
+                size += len(row)
+                if size >= COPY_CHUNK_BYTES:
+                    yield b"".join(parts)
+                    parts, size = [], 0
+            if parts:
+                yield b"".join(parts)
+        return
+
+    # psycopg2 only writes into a file object: pump it through a bounded queue
+    chunks: "queue.Queue" = queue.Queue(maxsize=16)
+    done = object()
+    stop = threading.Event()
+
+    def put(item):
+        # Never block for good: the consumer may be gone (client disconnected)
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise RuntimeError("Export cancelled")
+
+    class _Writer:
+        def __init__(self):
+            self.parts: List[bytes] = []
+            self.size = 0
+
+        def write(self, data):
+            data = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+            self.parts.append(data)
+            self.size += len(data)
+            if self.size >= COPY_CHUNK_BYTES:
+                self.flush()
+
+        def flush(self):
+            if self.parts:
+                put(b"".join(self.parts))
+                self.parts, self.size = [], 0
+
+    def run():
+        try:
+            writer = _Writer()
+            cur.copy_expert(statement, writer)
+            writer.flush()
+            put(done)
+        except Exception as e:  # re-raised in the consumer
+            if not stop.is_set():
+                put(e)
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    finished = False
+    try:
+        while True:
+            item = chunks.get()
+            if item is done:
+                finished = True
+                break
+            if isinstance(item, Exception):
+                finished = True
+                raise item
+            yield item
+    finally:
+        if not finished:
+            # Stopped early: cancel the server-side COPY and unblock the writer
+            # before the caller rolls back and closes the connection
+            stop.set()
+            cur.connection.cancel()
+            while worker.is_alive():
+                try:
+                    chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        worker.join()
+
+
+def export_csv(sql: str, params: Optional[Dict[str, Any]] = None,
+               timeout_ms: int = EXPORT_TIMEOUT_MS) -> Iterator[bytes]:
+    """Stream the full result of a validated SELECT as CSV (with header)."""
+    statement = f"COPY ({inline_params(sql, params)}) TO STDOUT WITH (FORMAT csv, HEADER)"
+    raw_conn = engine.raw_connection()
+    try:
+        cur = raw_conn.cursor()
+        _begin_read_only(cur, timeout_ms)
+        yield from _copy_out(cur, statement)
+    finally:
+        raw_conn.rollback()
+        raw_conn.close()
+
+
+def result_columns(sql: str, params: Optional[Dict[str, Any]] = None) -> List[tuple]:
+    """(name, type OID) of the query's result columns, from a LIMIT 0 run."""
+    raw_conn = engine.raw_connection()
+    try:
+        cur = raw_conn.cursor()
+        _begin_read_only(cur, EXPORT_TIMEOUT_MS)
+        cur.execute(f"SELECT * FROM ({inline_params(sql, params)}) AS _export LIMIT 0")
+        return [(col[0], col[1]) for col in cur.description]
+    finally:
+        raw_conn.rollback()
+        raw_conn.close()
+
+
+class _ChunkStream(io.RawIOBase):
+    """Readable file over an iterator of byte chunks (pulls lazily)."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b""
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+class _ChunkSink(io.RawIOBase):
+    """Writable file that hands written bytes back out via drain()."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _arrow_type(type_code: Any):
+    name = _ARROW_TYPES.get(type_code)
+    if name == "timestamp":
+        return pa.timestamp("us")
+    return getattr(pa, name)() if name else pa.string()
+
+
+def export_parquet(sql: str, params: Optional[Dict[str, Any]] = None,
+                   timeout_ms: int = EXPORT_TIMEOUT_MS) -> Iterator[bytes]:
+    """Stream the full result as Parquet, one row group per CSV batch of EXPORT_BATCH_BYTES."""
+    if pa is None:
+        raise ExportUnavailable("Parquet export needs pyarrow (pip install pyarrow)")
+    columns = result_columns(sql, params)
+    names = [name for name, _ in columns]
+    convert = pa_csv.ConvertOptions(
+        column_types={name: _arrow_type(type_code) for name, type_code in columns},
+        # COPY writes NULL as an empty unquoted field and '' as ""
+        strings_can_be_null=True, quoted_strings_can_be_null=False,
+    )
+    reader = pa_csv.open_csv(
+        io.BufferedReader(_ChunkStream(export_csv(sql, params, timeout_ms)), EXPORT_BATCH_BYTES),
+        read_options=pa_csv.ReadOptions(block_size=EXPORT_BATCH_BYTES, column_names=names, skip_rows=1),
+        convert_options=convert,
+    )
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, reader.schema)
+    try:
+        for batch in reader:
+            writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
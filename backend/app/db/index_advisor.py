@@ -0,0 +1,261 @@
+# backend/app/db/index_advisor.py
+"""
+Workload-driven index advisor.
+
+Reads the executed SQL from the query history (QUERY_HISTORY_PATH, written
+by the /query route), groups statements by fingerprint, extracts the
+filter / join / ORDER BY columns of each, and ranks candidate indexes by the
+time they would save across the recorded workload:
+
+  * hypopg available: each candidate is created as a hypothetical index and
+    the affected queries are re-EXPLAINed; savings = planner cost delta x
+    query frequency.
+  * otherwise: a heuristic model weights each query's logged time by how the
+    column is used (filter selectivity from pg_stats, join, ORDER BY + LIMIT)
+    and skips tables too small to benefit.
+
+    python -m app.db.index_advisor [--history query_history.db] [--top 10] [--method auto|hypopg|heuristic]
+"""
+
+from typing import Dict, Any, List, Optional, Set, Tuple
+import argparse
+import json
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+
+from app.db.database import engine
+from app.utils.query_history import QUERY_HISTORY_PATH, read_history
+from app.utils.sql_shape import analyze_sql, fingerprint_sql
+
+# Tables below this many rows are cheaper to scan than to index
+MIN_TABLE_ROWS = int(os.getenv("ADVISOR_MIN_TABLE_ROWS", "1000"))
+
+# Heuristic: share of a query's time an index on a column of this kind can save
+JOIN_WEIGHT = 0.5
+ORDER_WEIGHT_WITH_LIMIT = 0.4
+ORDER_WEIGHT = 0.1
+
+
+def collect_workload(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Group logged queries by fingerprint with frequency and total time."""
+    workload: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        shape = analyze_sql(record["sql"])
+        if not shape["is_select"]:
+            continue
+        key = fingerprint_sql(record["sql"])
+        entry = workload.setdefault(key, {
+            "sql": record["sql"],
+            "params": record.get("params") or {},
+            "shape": shape,
+            "count": 0,
+            "total_ms": 0.0,
+        })
+        entry["count"] += 1
+        entry["total_ms"] += float(record.get("execution_time_ms") or 0)
+    return workload
+
+
+def column_usage(workload: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per 'table.column': how often it is filtered / joined / ordered on, and the time of those queries."""
+    usage: Dict[str, Dict[str, Any]] = {}
+    for key, entry in workload.items():
+        shape = entry["shape"]
+        for kind in ("filter", "join", "order"):
+            for column in shape[f"{kind}_columns"]:
+                if column.startswith("?."):
+                    continue
+                stats = usage.setdefault(column, {"filter": 0, "join": 0, "order": 0, "total_ms": 0.0, "queries": set()})
+                stats[kind] += entry["count"]
+                if key not in stats["queries"]:
+                    stats["queries"].add(key)
+                    stats["total_ms"] += entry["total_ms"]
+    return usage
+
+
+def _table_stats(conn) -> Dict[str, Dict[str, Any]]:
+    """Row estimates, distinct counts and already-indexed leading columns per table."""
+    tables: Dict[str, Dict[str, Any]] = {}
+    for name, rows in conn.execute(text(
+        "SELECT relname, reltuples FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')"
+    )):
+        tables[name] = {"rows": max(float(rows), 0.0), "n_distinct": {}, "indexed": set()}
+
+    for table, column, n_distinct in conn.execute(text(
+        "SELECT tablename, attname, n_distinct FROM pg_stats WHERE schemaname = 'public'"
+    )):
+        if table in tables:
+            tables[table]["n_distinct"][column] = float(n_distinct)
+
+    for table, column in conn.execute(text("""
+        SELECT t.relname, a.attname
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = i.indkey[0]
+        WHERE i.indpred IS NULL
+    """)):
+        if table in tables:
+            tables[table]["indexed"].add(column)
+    return tables
+
+
+def candidate_indexes(workload: Dict[str, Dict[str, Any]], tables: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Single-column indexes on used columns, plus (filter, order) pairs on the same table."""
+    candidates: Dict[Tuple[str, Tuple[str, ...]], Set[str]] = {}
+
+    def add(table: str, columns: Tuple[str, ...], key: str):
+        info = tables.get(table)
+        if not info or columns[0] in info["indexed"]:
+            return
+        candidates.setdefault((table, columns), set()).add(key)
+
+    for key, entry in workload.items():
+        shape = entry["shape"]
+        split = lambda cols: [tuple(c.split(".", 1)) for c in cols if not c.startswith("?.")]
+        filters, joins, orders = split(shape["filter_columns"]), split(shape["join_columns"]), split(shape["order_columns"])
+        for table, column in filters + joins + orders:
+            add(table, (column,), key)
+        for f_table, f_column in filters:
+            for o_table, o_column in orders:
+                if f_table == o_table and f_column != o_column:
+                    add(f_table, (f_column, o_column), key)
+
+    return [{"table": t, "columns": cols, "queries": keys} for (t, cols), keys in candidates.items()]
+
+
+def _selectivity(info: Dict[str, Any], column: str) -> float:
+    """Fraction of rows an equality filter on this column keeps (pg_stats n_distinct)."""
+    n_distinct = info["n_distinct"].get(column)
+    if not n_distinct:
+        return 0.1
+    distinct = -n_distinct * info["rows"] if n_distinct < 0 else n_distinct
+    return 1.0 / max(distinct, 1.0)
+
+
+def evaluate_heuristic(workload, candidates, tables) -> List[Dict[str, Any]]:
+    """Estimated ms saved over the logged workload, from usage kind and selectivity."""
+    for cand in candidates:
+        info = tables[cand["table"]]
+        savings = 0.0
+        if info["rows"] >= MIN_TABLE_ROWS:
+            column = f"{cand['table']}.{cand['columns'][0]}"
+            for key in cand["queries"]:
+                entry = workload[key]
+                shape = entry["shape"]
+                weight = 0.0
+                if column in shape["filter_columns"]:
+                    weight = max(weight, 1.0 - _selectivity(info, cand["columns"][0]))
+                if column in shape["join_columns"]:
+                    weight = max(weight, JOIN_WEIGHT)
+                if column in shape["order_columns"] or (len(cand["columns"]) > 1 and shape["limit"] is not None):
+                    weight = max(weight, ORDER_WEIGHT_WITH_LIMIT if shape["limit"] is not None else ORDER_WEIGHT)
+                # the index only speeds up this table's share of the query
+                savings += entry["total_ms"] * weight / max(len(shape["tables"]), 1)
+        cand["savings"] = savings
+        cand["unit"] = "ms"
+    return candidates
+
+
+def hypopg_available(conn) -> bool:
+    try:
+        if not conn.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'hypopg'")).first():
+            return False
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS hypopg"))
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"[Index Advisor] hypopg unavailable: {e}")
+        return False
+
+
+def _plan_cost(conn, entry: Dict[str, Any]) -> Optional[float]:
+    try:
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {entry['sql']}"), entry["params"]).scalar()
+    except Exception:
+        conn.rollback()
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+def evaluate_hypopg(conn, workload, candidates) -> List[Dict[str, Any]]:
+    """Planner cost saved (x frequency) with each candidate created as a hypothetical index."""
+    baseline = {key: _plan_cost(conn, entry) for key, entry in workload.items()}
+    for cand in candidates:
+        conn.execute(text("SELECT * FROM hypopg_create_index(:ddl)"),
+                     {"ddl": f"CREATE INDEX ON {cand['table']} ({', '.join(cand['columns'])})"})
+        savings = 0.0
+        for key in cand["queries"]:
+            before = baseline.get(key)
+            after = _plan_cost(conn, workload[key])
+            if before is not None and after is not None and after < before:
+                savings += (before - after) * workload[key]["count"]
+        conn.execute(text("SELECT hypopg_reset()"))
+        cand["savings"] = savings
+        cand["unit"] = "cost"
+    return candidates
+
+
+def recommend(records: List[Dict[str, Any]], method: str = "auto", top: int = 10) -> Dict[str, Any]:
+    """
+    Rank index candidates for the recorded queries.
+
+    Returns:
+        {"method", "queries", "usage", "recommendations": [{"ddl", "table", "columns", "savings", "unit", "queries"}]}
+    """
+    workload = collect_workload(records)
+    with engine.connect() as conn:
+        tables = _table_stats(conn)
+        candidates = candidate_indexes(workload, tables)
+        if method == "auto":
+            method = "hypopg" if hypopg_available(conn) else "heuristic"
+        if method == "hypopg":
+            candidates = evaluate_hypopg(conn, workload, candidates)
+        else:
+            candidates = evaluate_heuristic(workload, candidates, tables)
+
+    ranked = sorted((c for c in candidates if c["savings"] > 0), key=lambda c: c["savings"], reverse=True)[:top]
+    for cand in ranked:
+        name = f"idx_{cand['table']}_{'_'.join(cand['columns'])}"
+        cand["ddl"] = f"CREATE INDEX IF NOT EXISTS {name} ON {cand['table']} ({', '.join(cand['columns'])})"
+        cand["queries"] = len(cand["queries"])
+    return {"method": method, "queries": len(workload), "usage": column_usage(workload), "recommendations": ranked}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Propose indexes from the executed queries in the query history")
+    parser.add_argument("--history", default=QUERY_HISTORY_PATH, help="SQLite query history (QUERY_HISTORY_PATH)")
+    parser.add_argument("--top", type=int, default=10, help="Number of indexes to propose")
+    parser.add_argument("--method", choices=["auto", "hypopg", "heuristic"], default="auto")
+    args = parser.parse_args()
+
+    records = read_history(args.history, with_sql=True)
+    if not records:
+        print(f"❌ No executed queries found in '{args.history}'. Set QUERY_HISTORY_PATH and run some queries first.")
+        sys.exit(1)
+
+    result = recommend(records, args.method, args.top)
+    print("=" * 60)
+    print("🧭 INDEX ADVISOR")
+    print("=" * 60)
+    print(f"   {len(records)} logged executions, {result['queries']} distinct queries, method: {result['method']}")
+
+    print("\n📊 Column usage (executions):")
+    print(f"   {'column':40} {'filter':>7} {'join':>7} {'order':>7} {'time ms':>10}")
+    for column, stats in sorted(result["usage"].items(), key=lambda kv: kv[1]["total_ms"], reverse=True)[:20]:
+        print(f"   {column:40} {stats['filter']:>7} {stats['join']:>7} {stats['order']:>7} {stats['total_ms']:>10.0f}")
+
+    print("\n💡 Recommended indexes:")
+    if not result["recommendations"]:
+        print("   None: existing indexes already cover the logged workload.")
+    for i, rec in enumerate(result["recommendations"], 1):
+        print(f"   {i:>2}. {rec['ddl']};")
+        print(f"       est. savings {rec['savings']:,.1f} {rec['unit']} across {rec['queries']} query shape(s)")
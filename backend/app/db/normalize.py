@@ -0,0 +1,145 @@
+# backend/app/db/normalize.py
+"""
+Vectorized transforms from the raw transactions CSV to the 4 normalized tables.
+
+Every step is a column operation or a single groupby, so transform time grows
+linearly with the number of line items: line totals are computed once as a
+column, all order aggregates come from one named-aggregation groupby, and
+customer / product dedup uses duplicated() on the key column instead of
+copying and deduplicating whole frames.
+"""
+
+from typing import Dict, List
+
+import pandas as pd
+
+# Defaults for columns the source CSV does not have (demo purposes)
+DEFAULT_REGISTRATION_DATE = "2010-01-01"
+DEFAULT_CATEGORY = "General"
+DEFAULT_SUPPLIER = "Default Supplier"
+
+# Explicit source dtypes for chunked reads: per-chunk inference would give
+# StockCode / Quantity different types in different chunks
+SOURCE_DTYPES = {
+    'InvoiceNo': str,
+    'StockCode': str,
+    'Description': str,
+    'Quantity': 'Int64',
+    'InvoiceDate': str,
+    'UnitPrice': 'float64',
+    'CustomerID': 'float64',
+    'Country': str,
+}
+
+# Per-invoice aggregates; 'first' and 'sum' both combine across partial results
+ORDER_AGGREGATES = {
+    'customer_id': ('CustomerID', 'first'),
+    'order_date': ('InvoiceDate', 'first'),
+    'total_quantity': ('Quantity', 'sum'),
+    'total_amount': ('line_total', 'sum'),
+}
+
+
+def clean_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop non-customer rows and cancellations, coerce numerics, add line_total."""
+    # Remove rows with missing CustomerID (they represent non-customer transactions)
+    # and cancelled orders (InvoiceNo starts with 'C')
+    keep = df['CustomerID'].notna() & ~df['InvoiceNo'].astype(str).str.startswith('C')
+    clean = df.loc[keep].copy()
+
+    clean['CustomerID'] = clean['CustomerID'].astype(str).str.strip()
+    # Negative quantities (returns) are kept; non-numeric values become NaN
+    clean['Quantity'] = pd.to_numeric(clean['Quantity'], errors='coerce')
+    clean['UnitPrice'] = pd.to_numeric(clean['UnitPrice'], errors='coerce')
+    clean['line_total'] = clean['Quantity'] * clean['UnitPrice']
+    return clean
+
+
+def build_customers(clean: pd.DataFrame) -> pd.DataFrame:
+    """One row per CustomerID (first occurrence wins)."""
+    first = ~clean['CustomerID'].duplicated()
+    customers = pd.DataFrame({
+        'customer_id': clean.loc[first, 'CustomerID'].array,
+        'country': clean.loc[first, 'Country'].array,
+    })
+    customers['name'] = 'Customer_' + customers['customer_id']
+    customers['email'] = customers['customer_id'] + '@example.com'
+    customers['registration_date'] = pd.to_datetime(DEFAULT_REGISTRATION_DATE)
+    return customers
+
+
+def build_products(clean: pd.DataFrame) -> pd.DataFrame:
+    """One row per StockCode (first occurrence wins)."""
+    first = ~clean['StockCode'].duplicated()
+    products = pd.DataFrame({
+        'product_id': clean.loc[first, 'StockCode'].array,
+        'name': clean.loc[first, 'Description'].array,
+        'unit_price': clean.loc[first, 'UnitPrice'].array,
+    })
+    products['category'] = DEFAULT_CATEGORY
+    products['supplier'] = DEFAULT_SUPPLIER
+    return products
+
+
+def order_partials(clean: pd.DataFrame) -> pd.DataFrame:
+    """Per-invoice aggregates of one batch of line items (indexed by InvoiceNo)."""
+    return clean.groupby('InvoiceNo', sort=False).agg(**ORDER_AGGREGATES)
+
+
+def combine_order_partials(partials: List[pd.DataFrame]) -> pd.DataFrame:
+    """Merge partial aggregates of batches read in order (invoices may span batches)."""
+    return pd.concat(partials).groupby(level=0, sort=False).agg(
+        {column: how for column, (_, how) in ORDER_AGGREGATES.items()}
+    )
+
+
+def finish_orders(partials: pd.DataFrame) -> pd.DataFrame:
+    """Final orders frame from (combined) partial aggregates."""
+    orders = partials.sort_index().reset_index().rename(columns={'InvoiceNo': 'order_id'})
+    orders['order_date'] = pd.to_datetime(orders['order_date'], errors='coerce')
+    # Simplified: every non-cancelled invoice is 'completed'
+    orders['status'] = 'completed'
+    return orders
+
+
+def build_orders(clean: pd.DataFrame) -> pd.DataFrame:
+    """One row per InvoiceNo, all aggregates from a single groupby."""
+    return finish_orders(order_partials(clean))
+
+
+def build_order_items(clean: pd.DataFrame, orders: pd.DataFrame = None, start_id: int = 1,
+                      with_order_date: bool = False) -> pd.DataFrame:
+    """
+    Line items of known orders (any invoice if orders is None), numbered from start_id.
+
+    with_order_date adds the order's order_date (the partition key of the
+    partitioned schema); it needs the orders frame.
+    """
+    known = clean['InvoiceNo'].isin(orders['order_id']) if orders is not None else clean['InvoiceNo'].notna()
+    items = clean.loc[known, ['InvoiceNo', 'StockCode', 'Quantity', 'UnitPrice']]
+    order_items = pd.DataFrame({
+        'order_item_id': range(start_id, start_id + len(items)),
+        'order_id': items['InvoiceNo'].array,
+        'product_id': items['StockCode'].array,
+        'quantity': items['Quantity'].array,
+        'unit_price': items['UnitPrice'].array,
+    })
+    if with_order_date:
+        order_items['order_date'] = order_items['order_id'].map(orders.set_index('order_id')['order_date'])
+    return order_items
+
+
+def normalize_transactions(df: pd.DataFrame, partitioned: bool = False) -> Dict[str, pd.DataFrame]:
+    """
+    Raw transactions → {'customers', 'products', 'orders', 'order_items'} frames.
+
+    partitioned: order_items also carries order_date (see partitions.py).
+    """
+    clean = clean_transactions(df)
+    orders = build_orders(clean)
+    return {
+        'customers': build_customers(clean),
+        'products': build_products(clean),
+        'orders': orders,
+        'order_items': build_order_items(clean, orders, with_order_date=partitioned),
+    }
@@ -0,0 +1,87 @@
+# backend/app/db/partitions.py
+"""
+Monthly range partitioning of the fact tables on order_date.
+
+With PARTITION_FACT_TABLES (or --partitioned) the loaders create orders and
+order_items as `PARTITION BY RANGE (order_date)` with one partition per
+calendar month (<table>_pYYYYMM) plus a DEFAULT partition for rows without
+a date. order_items carries a copy of its order's order_date so both tables
+can be pruned. Partitions for every month in the data are created on ingest;
+a query filtering on order_date then only scans the months it covers,
+however much history the tables hold.
+
+PostgreSQL requires the partition key in every unique constraint, so the
+orders primary key becomes (order_id, order_date) and order_items references
+orders on both columns (see schema_setup).
+"""
+
+from typing import Iterable, List
+import os
+
+import pandas as pd
+from sqlalchemy import text
+
+PARTITION_FACT_TABLES = os.getenv("PARTITION_FACT_TABLES", "false").lower() in ("1", "true", "yes")
+
+PARTITION_KEY = "order_date"
+PARTITIONED_TABLES = ["orders", "order_items"]
+
+DEFAULT_PARTITION_SUFFIX = "_pdefault"
+
+
+def month_starts(dates: Iterable) -> List[pd.Timestamp]:
+    """Every month start from the earliest to the latest date (gaps included, so ranges stay contiguous)."""
+    dates = pd.to_datetime(pd.Series(dates), errors='coerce').dropna()
+    if dates.empty:
+        return []
+    return list(pd.date_range(dates.min().to_period('M').start_time,
+                              dates.max().to_period('M').start_time, freq='MS'))
+
+
+def partition_name(table: str, month: pd.Timestamp) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def partition_statements(table: str, months: Iterable[pd.Timestamp], unlogged: bool = False) -> List[str]:
+    """CREATE statements for the monthly partitions of `table` (and its DEFAULT partition), idempotent."""
+    persistence = "UNLOGGED " if unlogged else ""
+    statements = [f"CREATE {persistence}TABLE IF NOT EXISTS {table}{DEFAULT_PARTITION_SUFFIX} "
+                  f"PARTITION OF {table} DEFAULT"]
+    for month in months:
+        statements.append(
+            f"CREATE {persistence}TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{month + pd.offsets.MonthBegin(1):%Y-%m-%d}')"
+        )
+    return statements
+
+
+def create_partitioned_table(raw_conn, table: str, columns: str, months: Iterable[pd.Timestamp]):
+    """Create `table` (column DDL given) partitioned by month, with UNLOGGED partitions for staging loads."""
+    with raw_conn.cursor() as cur:
+        cur.execute(f"CREATE TABLE {table} ({columns}) PARTITION BY RANGE ({PARTITION_KEY})")
+        for statement in partition_statements(table, months, unlogged=True):
+            cur.execute(statement)
+
+
+def ensure_month_partitions(conn, table: str, dates: Iterable) -> int:
+    """Create any missing monthly partitions of a live table for `dates` (SQLAlchemy connection)."""
+    months = month_starts(dates)
+    before = len(partitions_of(conn, table))
+    for statement in partition_statements(table, months):
+        conn.execute(text(statement))
+    created = len(partitions_of(conn, table)) - before
+    if created:
+        print(f"[Partitions] {table}: created {created} partition(s)")
+    return created
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"
+    ), {"table": table}).first())
+
+
+def partitions_of(conn, table: str) -> List[str]:
+    return [row[0] for row in conn.execute(text(
+        "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(:table) ORDER BY 1"
+    ), {"table": table})]
@@ -0,0 +1,559 @@
+# backend/app/db/rollups.py
+"""
+Pre-aggregated rollups for the hottest query shapes.
+
+Three rollup tables cover the grains listed in the sql_generator templates
+and schema_builder common_queries:
+
+    rollup_monthly_country_revenue  (country, month)   completed-order revenue
+    rollup_product_sales            (product, month)   quantity and revenue
+    rollup_customer_ltv             (customer)         lifetime value
+
+Maintenance is incremental: rollup_watermark records the highest
+orders.order_date each rollup has seen. An update finds the buckets touched
+by orders at or after the watermark, re-aggregates only those buckets from
+the base tables and upserts them, so refresh cost follows the new data, not
+the history. A full rebuild is used the first time and after a reload.
+
+match_rollup() rewrites a query to read from a rollup instead of
+re-aggregating order_items: fast-path intents are rewritten from their slots
+(only when every filter lines up with the rollup grain), and generated SQL is
+rewritten when it fingerprint-matches one of the known template queries.
+Anything else runs against the base tables unchanged.
+
+Update after each ingest:  python -m app.db.rollups [--full] [--since 2011-12-01]
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+from sqlparse import tokens as T
+
+from app.db.database import engine
+from app.db.data_version import ensure_data_version_table
+from app.llm.fast_path import GRAIN_ADJECTIVES, MAX_ROWS_DEFAULT
+from app.utils.sql_shape import analyze_sql, fingerprint_sql, parse_sql
+
+ROLLUPS_ENABLED = os.getenv("ENABLE_ROLLUPS", "true").lower() == "true"
+# How long a rollup freshness check is trusted before asking the database again
+ROLLUP_CHECK_TTL = float(os.getenv("ROLLUP_CHECK_TTL", "5"))
+
+logger = logging.getLogger(__name__)
+
+# select/source/group_by make up the full aggregate; key_exprs are the bucket
+# key as computed from the base tables (same order as "key")
+ROLLUPS = {
+    "rollup_monthly_country_revenue": {
+        "key": ["country", "month"],
+        "key_exprs": ["c.country", "DATE_TRUNC('month', o.order_date)"],
+        "select": """c.country,
+       DATE_TRUNC('month', o.order_date) AS month,
+       COUNT(DISTINCT o.order_id) AS order_count,
+       SUM(oi.quantity * oi.unit_price) AS revenue""",
+        "source": """customers c
+JOIN orders o ON c.customer_id = o.customer_id
+JOIN order_items oi ON o.order_id = oi.order_id""",
+        "group_by": "c.country, DATE_TRUNC('month', o.order_date)",
+        "monthly": True,
+    },
+    "rollup_product_sales": {
+        "key": ["product_id", "month"],
+        "key_exprs": ["p.product_id", "DATE_TRUNC('month', o.order_date)"],
+        "select": """p.product_id,
+       p.name,
+       p.category,
+       DATE_TRUNC('month', o.order_date) AS month,
+       SUM(oi.quantity) AS total_quantity,
+       SUM(oi.quantity * oi.unit_price) AS revenue""",
+        "source": """products p
+JOIN order_items oi ON p.product_id = oi.product_id
+JOIN orders o ON oi.order_id = o.order_id""",
+        "group_by": "p.product_id, p.name, p.category, DATE_TRUNC('month', o.order_date)",
+        "monthly": True,
+    },
+    "rollup_customer_ltv": {
+        "key": ["customer_id"],
+        "key_exprs": ["c.customer_id"],
+        "select": """c.customer_id,
+       c.name,
+       c.country,
+       COUNT(DISTINCT o.order_id) AS total_orders,
+       SUM(o.total_amount) AS lifetime_value,
+       MIN(o.order_date) AS first_order_date,
+       MAX(o.order_date) AS last_order_date""",
+        "source": """customers c
+JOIN orders o ON c.customer_id = o.customer_id""",
+        "group_by": "c.customer_id, c.name, c.country",
+        "monthly": False,
+    },
+}
+
+# Materialized views used before rollups were maintained incrementally
+LEGACY_VIEWS = ["mv_monthly_country_revenue", "mv_product_sales", "mv_customer_ltv"]
+
+# Grains that can be re-aggregated from monthly buckets
+MONTH_ALIGNED_GRAINS = ("month", "quarter", "year")
+
+_available: Dict[str, Any] = {}
+
+
+def _definition(name: str, extra_filter: str = "") -> str:
+    rollup = ROLLUPS[name]
+    return (f"SELECT {rollup['select']}\nFROM {rollup['source']}\n"
+            f"WHERE o.status = 'completed'{extra_filter}\nGROUP BY {rollup['group_by']}")
+
+
+def create_rollups(conn):
+    """Create any missing rollup tables, their unique keys and the watermark table."""
+    for view in LEGACY_VIEWS:
+        conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {view}"))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS rollup_watermark (
+            rollup TEXT PRIMARY KEY,
+            high_water TIMESTAMP,
+            updated_at TIMESTAMP NOT NULL DEFAULT now(),
+            mode TEXT,
+            buckets INTEGER
+        )
+    """))
+    conn.execute(text("ALTER TABLE rollup_watermark ADD COLUMN IF NOT EXISTS data_version BIGINT"))
+    ensure_data_version_table(conn)
+    for name, rollup in ROLLUPS.items():
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} AS\n{_definition(name)}\nWITH NO DATA"))
+        conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_key ON {name} ({', '.join(rollup['key'])})"))
+
+
+def drop_rollups(eng=None):
+    """Drop the rollup tables and their watermarks."""
+    with (eng or engine).begin() as conn:
+        for name in list(ROLLUPS) + ["rollup_watermark"]:
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        for view in LEGACY_VIEWS:
+            conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {view}"))
+    _available.clear()
+
+
+def _set_watermark(conn, name: str, high_water, mode: str, buckets: int):
+    conn.execute(text("""
+        INSERT INTO rollup_watermark (rollup, high_water, updated_at, mode, buckets)
+        VALUES (:name, :high_water, now(), :mode, :buckets)
+        ON CONFLICT (rollup) DO UPDATE
+        SET high_water = EXCLUDED.high_water, updated_at = EXCLUDED.updated_at,
+            mode = EXCLUDED.mode, buckets = EXCLUDED.buckets
+    """), {"name": name, "high_water": high_water, "mode": mode, "buckets": buckets})
+
+
+def _rebuild(conn, name: str, high_water) -> int:
+    """Recompute a rollup from scratch (recreated, so it follows base column type changes)."""
+    conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    buckets = conn.execute(text(f"CREATE TABLE {name} AS\n{_definition(name)}")).rowcount
+    conn.execute(text(f"CREATE UNIQUE INDEX {name}_key ON {name} ({', '.join(ROLLUPS[name]['key'])})"))
+    _set_watermark(conn, name, high_water, "full", buckets)
+    return buckets
+
+
+def _update_incremental(conn, name: str, since, high_water) -> int:
+    """
+    Re-aggregate only the buckets touched by orders dated at or after `since`
+    and merge them into the rollup. Buckets that no longer have completed
+    orders are deleted.
+    """
+    rollup = ROLLUPS[name]
+    key, key_exprs = rollup["key"], rollup["key_exprs"]
+    key_cols = ", ".join(key)
+
+    # 1. bucket keys of the new orders (any status: a bucket can also shrink)
+    conn.execute(text(f"""
+        CREATE TEMP TABLE _affected ON COMMIT DROP AS
+        SELECT DISTINCT {', '.join(f'{expr} AS {col}' for expr, col in zip(key_exprs, key))}
+        FROM {rollup['source']}
+        WHERE o.order_date >= :since
+    """), {"since": since})
+    # Temp tables have no statistics; without them a wide back-fill plans nested loops
+    conn.execute(text("ANALYZE _affected"))
+
+    # 2. re-aggregate just those buckets. Monthly rollups aggregate from a sargable
+    #    date bound and filter on the bucket key afterwards: a (product, month) IN
+    #    filter below the joins gets planned as a month-only join that fans out
+    if rollup["monthly"]:
+        recompute = (f"SELECT r.* FROM (\n{_definition(name, ' AND o.order_date >= (SELECT MIN(month) FROM _affected)')}\n) r"
+                     f"\nWHERE ({key_cols}) IN (SELECT {key_cols} FROM _affected)")
+    else:
+        recompute = _definition(name, f"\n  AND ({', '.join(key_exprs)}) IN (SELECT {key_cols} FROM _affected)")
+    conn.execute(text(f"CREATE TEMP TABLE _recomputed ON COMMIT DROP AS\n{recompute}"))
+    conn.execute(text("ANALYZE _recomputed"))
+
+    # 3. upsert recomputed buckets, drop emptied ones
+    value_cols = [col for col in conn.execute(text("SELECT * FROM _recomputed LIMIT 0")).keys() if col not in key]
+    updates = ", ".join(f"{col} = EXCLUDED.{col}" for col in value_cols)
+    buckets = conn.execute(text(f"""
+        INSERT INTO {name} SELECT * FROM _recomputed
+        ON CONFLICT ({key_cols}) DO UPDATE SET {updates}
+    """)).rowcount
+    conn.execute(text(f"""
+        DELETE FROM {name} r
+        USING _affected a
+        WHERE ({', '.join(f'r.{col}' for col in key)}) = ({', '.join(f'a.{col}' for col in key)})
+          AND NOT EXISTS (
+              SELECT 1 FROM _recomputed n
+              WHERE ({', '.join(f'n.{col}' for col in key)}) = ({', '.join(f'a.{col}' for col in key)})
+          )
+    """))
+
+    _set_watermark(conn, name, high_water, "incremental", buckets)
+    return buckets
+
+
+def refresh_rollups(eng=None, full: bool = False, since: Optional[datetime] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Bring every rollup up to date. Call after each ingest.
+
+    Args:
+        eng: engine to use (defaults to the app engine)
+        full: rebuild from scratch (use after the base tables were replaced)
+        since: re-aggregate buckets touched by orders from this date instead
+               of the stored watermark (e.g. to pick up back-dated orders)
+
+    Returns:
+        {rollup_name: {"mode", "buckets", "seconds"}}
+    """
+    eng = eng or engine
+    with eng.begin() as conn:
+        create_rollups(conn)
+        watermarks = dict(conn.execute(text("SELECT rollup, high_water FROM rollup_watermark")).fetchall())
+
+    stats = {}
+    for name in ROLLUPS:
+        start = time.perf_counter()
+        with eng.begin() as conn:
+            # Read the new high-water mark and data version first, so data landing
+            # during the update is picked up next time (and the rollup counts as stale until then)
+            high_water = conn.execute(text("SELECT MAX(order_date) FROM orders")).scalar()
+            version = conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM data_version")).scalar()
+            mark = since or watermarks.get(name)
+            if full or mark is None:
+                mode, buckets = "full", _rebuild(conn, name, high_water)
+            else:
+                mode, buckets = "incremental", _update_incremental(conn, name, mark, high_water)
+            conn.execute(text("UPDATE rollup_watermark SET data_version = :version WHERE rollup = :name"),
+                         {"version": version, "name": name})
+            conn.execute(text(f"ANALYZE {name}"))
+        seconds = time.perf_counter() - start
+        stats[name] = {"mode": mode, "buckets": buckets, "seconds": seconds}
+        print(f"[Rollups] {mode} update of {name}: {buckets} bucket(s) in {seconds * 1000:.0f} ms")
+
+    _available.clear()
+    return stats
+
+
+def rollups_available() -> bool:
+    """
+    True when every rollup is built and current: its last refresh saw the
+    latest data version and the latest order. Re-checked at most every
+    ROLLUP_CHECK_TTL seconds, so rollups built, dropped or left behind by
+    another process are noticed without a restart; stale rollups mean the
+    base tables are queried instead.
+    """
+    now = time.monotonic()
+    if now - _available.get("checked", float("-inf")) < ROLLUP_CHECK_TTL:
+        return _available["current"]
+    try:
+        with engine.connect() as conn:
+            current = False
+            if conn.execute(text("SELECT to_regclass('rollup_watermark') IS NOT NULL")).scalar():
+                version = 0
+                if conn.execute(text("SELECT to_regclass('data_version') IS NOT NULL")).scalar():
+                    version = conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM data_version")).scalar()
+                up_to_date = conn.execute(text("""
+                    SELECT COUNT(*) FROM rollup_watermark w
+                    WHERE w.rollup = ANY(:names)
+                      AND w.data_version >= :version
+                      AND w.high_water >= (SELECT MAX(order_date) FROM orders)
+                """), {"names": list(ROLLUPS), "version": version}).scalar()
+                current = up_to_date == len(ROLLUPS)
+    except Exception as e:
+        # e.g. a watermark table from before data versions: stale until the next refresh
+        if _available.get("current", True):
+            logger.warning("Rollup availability check failed: %s", e)
+        current = False
+    if current != _available.get("current", current):
+        logger.info("Rollups %s", "are current" if current else "are stale or missing; using the base tables")
+    _available.update(current=current, checked=now)
+    return current
+
+
+# ---------------------------------------------------------------------------
+# Fast-path intents
+# ---------------------------------------------------------------------------
+
+def _month_filter(slots: Dict[str, Any], params: Dict[str, Any], where: List[str]) -> bool:
+    """
+    Translate the period slot to a filter on the rollup's month column.
+    Only whole-month absolute periods can be answered from monthly buckets.
+    """
+    period = slots.get("period")
+    if not period:
+        return True
+    if period["kind"] != "absolute" or period["start"].day != 1 or period["end"].day != 1:
+        return False
+    params["start_date"] = period["start"]
+    params["end_date"] = period["end"]
+    where.append("r.month >= :start_date AND r.month < :end_date")
+    return True
+
+
+def _where(conditions: List[str]) -> str:
+    return "\nWHERE " + "\n  AND ".join(conditions) if conditions else ""
+
+
+def rollup_for_intent(intent: str, slots: Dict[str, Any], base_sql: str = "",
+                      base_params: Optional[Dict[str, Any]] = None) -> Optional[Tuple[str, Dict[str, Any], str]]:
+    """
+    Rollup equivalent of a fast-path template, or None if the slots need the base tables.
+    The template's own LIMIT and ORDER BY are kept so both return the same rows.
+
+    Returns:
+        (sql, params, rollup_name)
+    """
+    params: Dict[str, Any] = {"limit": (base_params or {}).get("limit", MAX_ROWS_DEFAULT)}
+    where: List[str] = []
+    grain = slots.get("grain")
+
+    if intent == "revenue_by_country":
+        if not _month_filter(slots, params, where):
+            return None
+        if grain:
+            if grain not in MONTH_ALIGNED_GRAINS:
+                return None
+            revenue = f"{GRAIN_ADJECTIVES[grain]}_revenue"
+            sql = f"""SELECT r.country,
+       DATE_TRUNC('{grain}', r.month) AS {grain},
+       SUM(r.order_count)::bigint AS order_count,
+       SUM(r.revenue) AS {revenue}
+FROM rollup_monthly_country_revenue r{_where(where)}
+GROUP BY r.country, DATE_TRUNC('{grain}', r.month)
+ORDER BY {grain} DESC, {revenue} DESC
+LIMIT :limit"""
+        else:
+            sql = f"""SELECT r.country,
+       SUM(r.order_count)::bigint AS order_count,
+       SUM(r.revenue) AS total_revenue
+FROM rollup_monthly_country_revenue r{_where(where)}
+GROUP BY r.country
+ORDER BY total_revenue DESC
+LIMIT :limit"""
+        return sql, params, "rollup_monthly_country_revenue"
+
+    if intent == "revenue_time_series":
+        grain = grain or "month"
+        if grain not in MONTH_ALIGNED_GRAINS or not _month_filter(slots, params, where):
+            return None
+        if "country" in slots:
+            params["country"] = slots["country"]
+            where.append("r.country = :country")
+        sql = f"""SELECT DATE_TRUNC('{grain}', r.month) AS {grain},
+       SUM(r.order_count)::bigint AS order_count,
+       SUM(r.revenue) AS revenue
+FROM rollup_monthly_country_revenue r{_where(where)}
+GROUP BY DATE_TRUNC('{grain}', r.month)
+ORDER BY {grain}
+LIMIT :limit"""
+        return sql, params, "rollup_monthly_country_revenue"
+
+    if intent == "top_products":
+        # product_sales has no country dimension
+        if "country" in slots or not _month_filter(slots, params, where):
+            return None
+        order_by = analyze_sql(base_sql)["order_by"] if base_sql else ()
+        order_col = "total_quantity_sold" if order_by and order_by[0].startswith("total_quantity_sold") else "total_revenue"
+        sql = f"""SELECT r.product_id,
+       r.name,
+       r.category,
+       SUM(r.total_quantity) AS total_quantity_sold,
+       SUM(r.revenue) AS total_revenue
+FROM rollup_product_sales r{_where(where)}
+GROUP BY r.product_id, r.name, r.category
+ORDER BY {order_col} DESC
+LIMIT :limit"""
+        return sql, params, "rollup_product_sales"
+
+    if intent == "top_customers":
+        # lifetime value has no time dimension
+        if "period" in slots:
+            return None
+        if "country" in slots:
+            params["country"] = slots["country"]
+            where.append("r.country = :country")
+        order_by = analyze_sql(base_sql)["order_by"] if base_sql else ()
+        by_orders = bool(order_by) and order_by[0].startswith("total_orders")
+        order_sql = "r.total_orders DESC, r.lifetime_value DESC" if by_orders else "r.lifetime_value DESC"
+        sql = f"""SELECT r.customer_id,
+       r.name,
+       r.country,
+       r.total_orders,
+       r.lifetime_value,
+       r.first_order_date,
+       r.last_order_date
+FROM rollup_customer_ltv r{_where(where)}
+ORDER BY {order_sql}
+LIMIT :limit"""
+        return sql, params, "rollup_customer_ltv"
+
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Generated SQL
+# ---------------------------------------------------------------------------
+
+# Known full-table template queries (sql_generator prompt templates and local
+# fallbacks) and the rollup query that returns the same rows
+TEMPLATE_REWRITES = [
+    (
+        """SELECT c.country, DATE_TRUNC('month', o.order_date) as month,
+               COUNT(DISTINCT o.order_id) as order_count,
+               SUM(oi.quantity * oi.unit_price) as monthly_revenue
+        FROM customers c
+        JOIN orders o ON c.customer_id = o.customer_id
+        JOIN order_items oi ON o.order_id = oi.order_id
+        WHERE o.status = 'completed'
+        GROUP BY c.country, DATE_TRUNC('month', o.order_date)
+        ORDER BY month DESC, monthly_revenue DESC""",
+        """SELECT r.country, r.month, r.order_count, r.revenue AS monthly_revenue
+FROM rollup_monthly_country_revenue r
+ORDER BY r.month DESC, monthly_revenue DESC""",
+        "rollup_monthly_country_revenue",
+    ),
+    (
+        """SELECT p.product_id, p.name, p.category,
+               SUM(oi.quantity) as total_quantity_sold,
+               SUM(oi.quantity * oi.unit_price) as total_revenue
+        FROM products p
+        JOIN order_items oi ON p.product_id = oi.product_id
+        JOIN orders o ON oi.order_id = o.order_id
+        WHERE o.status = 'completed'
+        GROUP BY p.product_id, p.name, p.category
+        ORDER BY total_revenue DESC""",
+        """SELECT r.product_id, r.name, r.category,
+       SUM(r.total_quantity) AS total_quantity_sold,
+       SUM(r.revenue) AS total_revenue
+FROM rollup_product_sales r
+GROUP BY r.product_id, r.name, r.category
+ORDER BY total_revenue DESC""",
+        "rollup_product_sales",
+    ),
+    (
+        """SELECT p.product_id, p.name, p.category,
+               SUM(oi.quantity) as total_quantity,
+               SUM(oi.quantity * oi.unit_price) as total_revenue
+        FROM products p
+        JOIN order_items oi ON p.product_id = oi.product_id
+        JOIN orders o ON oi.order_id = o.order_id
+        WHERE o.status = 'completed'
+        GROUP BY p.product_id, p.name, p.category
+        ORDER BY total_revenue DESC""",
+        """SELECT r.product_id, r.name, r.category,
+       SUM(r.total_quantity) AS total_quantity,
+       SUM(r.revenue) AS total_revenue
+FROM rollup_product_sales r
+GROUP BY r.product_id, r.name, r.category
+ORDER BY total_revenue DESC""",
+        "rollup_product_sales",
+    ),
+    (
+        """SELECT c.customer_id, c.name, c.country,
+               COUNT(DISTINCT o.order_id) as total_orders,
+               SUM(o.total_amount) as lifetime_value,
+               MIN(o.order_date) as first_order_date,
+               MAX(o.order_date) as last_order_date
+        FROM customers c
+        JOIN orders o ON c.customer_id = o.customer_id
+        WHERE o.status = 'completed'
+        GROUP BY c.customer_id, c.name, c.country
+        ORDER BY lifetime_value DESC""",
+        """SELECT r.customer_id, r.name, r.country, r.total_orders, r.lifetime_value,
+       r.first_order_date, r.last_order_date
+FROM rollup_customer_ltv r
+ORDER BY r.lifetime_value DESC""",
+        "rollup_customer_ltv",
+    ),
+]
+
+
+def _split_limit(sql: str) -> Tuple[str, Optional[str]]:
+    """Strip a trailing ';' and top-level LIMIT <n> so templates match at any row cap."""
+    sql = re.sub(r";\s*$", "", sql.strip())
+    m = re.search(r"\s+LIMIT\s+(\d+)\s*$", sql, re.IGNORECASE)
+    if m:
+        return sql[:m.start()], m.group(1)
+    return sql, None
+
+
+def _template_key(sql: str) -> Tuple[str, Tuple[str, ...]]:
+    """Fingerprint plus the string literals: the fingerprint alone ignores e.g. the status value."""
+    literals = tuple(
+        leaf.value for statement in parse_sql(sql) for leaf in statement.flatten()
+        if leaf.ttype in T.Literal.String
+    )
+    return fingerprint_sql(sql), literals
+
+_TEMPLATE_INDEX = {_template_key(base): (rollup_sql, name) for base, rollup_sql, name in TEMPLATE_REWRITES}
+
+
+def rollup_for_sql(sql: str) -> Optional[Tuple[str, Dict[str, Any], str]]:
+    """Rollup equivalent of a generated query that matches a known template, else None."""
+    body, limit = _split_limit(sql)
+    hit = _TEMPLATE_INDEX.get(_template_key(body))
+    if not hit:
+        return None
+    rollup_sql, name = hit
+    return (f"{rollup_sql}\nLIMIT {limit}" if limit else rollup_sql), {}, name
+
+
+def match_rollup(sql: str, params: Optional[Dict[str, Any]] = None,
+                 fast: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Find a rollup that answers this query with identical rows.
+
+    Args:
+        sql: query about to run (template or generated)
+        params: its bound parameters
+        fast: compiled fast-path match, if the query came from the fast path
+
+    Returns:
+        {"sql", "params", "rollup"} or None to run against the base tables
+    """
+    if not ROLLUPS_ENABLED or not rollups_available():
+        return None
+
+    if fast:
+        hit = rollup_for_intent(fast["intent"], fast["slots"], fast["sql"], fast["params"])
+    elif not params:
+        hit = rollup_for_sql(sql)
+    else:
+        hit = None
+
+    if not hit:
+        return None
+    rollup_sql, rollup_params, name = hit
+    logger.info("Serving from rollup %s", name)
+    return {"sql": rollup_sql, "params": rollup_params, "rollup": name}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the rollup tables from the orders watermark")
+    parser.add_argument("--full", action="store_true", help="Rebuild every rollup from scratch")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None,
+                        help="Re-aggregate buckets touched by orders from this date (ISO format)")
+    args = parser.parse_args()
+    refresh_rollups(full=args.full, since=args.since)
@@ -0,0 +1,248 @@
+# backend/app/db/schema_setup.py
+"""
+Physical schema setup for the normalized tables.
+
+pandas to_sql() creates bare heap tables: no primary keys and no indexes, so
+every join on order_items.order_id / order_items.product_id /
+orders.customer_id is a hash join over full scans. This module adds the
+primary keys (when the data allows), indexes on the FK columns, an index on
+orders.order_date, a partial index over completed orders, and refreshes the
+planner statistics.
+
+    python -m app.db.schema_setup           # create what is missing, report timings
+    python -m app.db.schema_setup --reset   # drop managed indexes first (benchmark from scratch)
+"""
+
+from typing import Dict, List, Tuple
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+
+from app.db.database import engine
+from app.db.partitions import is_partitioned
+
+# btree serves range filters and ORDER BY order_date; brin is tiny but only
+# helps while orders are stored in date order (append-only loads)
+ORDER_DATE_INDEX_TYPE = os.getenv("ORDER_DATE_INDEX_TYPE", "btree").lower()
+
+TABLES = ["customers", "products", "orders", "order_items"]
+
+PRIMARY_KEYS = {
+    "customers": "customer_id",
+    "products": "product_id",
+    "orders": "order_id",
+}
+
+# Unique constraints on a partitioned table must include the partition key (partitions.py)
+PARTITIONED_PRIMARY_KEYS = {
+    "orders": "order_id, order_date",
+}
+
+# (table, constraint, definition) added by create_normalized_tables.py / fix_foreign_keys.py
+FOREIGN_KEYS = [
+    ("orders", "fk_orders_customers", "FOREIGN KEY (customer_id) REFERENCES customers(customer_id)"),
+    ("order_items", "fk_order_items_orders", "FOREIGN KEY (order_id) REFERENCES orders(order_id)"),
+    ("order_items", "fk_order_items_products", "FOREIGN KEY (product_id) REFERENCES products(product_id)"),
+]
+
+# Replacement definitions when orders is partitioned: order_items carries order_date
+PARTITIONED_FOREIGN_KEYS = {
+    "fk_order_items_orders": "FOREIGN KEY (order_id, order_date) REFERENCES orders(order_id, order_date)",
+}
+
+# (index name, CREATE INDEX body)
+INDEXES: List[Tuple[str, str]] = [
+    ("idx_order_items_order_id", "order_items (order_id)"),
+    ("idx_order_items_product_id", "order_items (product_id)"),
+    ("idx_orders_customer_id", "orders (customer_id)"),
+    ("idx_orders_order_date", f"orders USING {'brin' if ORDER_DATE_INDEX_TYPE == 'brin' else 'btree'} (order_date)"),
+    # Revenue queries only read completed orders; INCLUDE allows index-only joins
+    ("idx_orders_completed", "orders (order_date) INCLUDE (order_id, customer_id, total_amount) "
+                             "WHERE status = 'completed'"),
+]
+
+# Sample queries from verify_normalized_db.py, used for before/after timings
+TEMPLATE_QUERIES: Dict[str, str] = {
+    "customers_by_country": """
+        SELECT country, COUNT(*) as customer_count
+        FROM customers
+        GROUP BY country
+        ORDER BY customer_count DESC
+        LIMIT 5;
+    """,
+    "top_products": """
+        SELECT p.name, SUM(oi.quantity) as total_quantity
+        FROM products p
+        JOIN order_items oi ON p.product_id = oi.product_id
+        JOIN orders o ON oi.order_id = o.order_id
+        WHERE o.status = 'completed'
+        GROUP BY p.product_id, p.name
+        ORDER BY total_quantity DESC
+        LIMIT 5;
+    """,
+    "top_customers": """
+        SELECT c.customer_id, c.country,
+               SUM(o.total_amount) as total_spent,
+               COUNT(o.order_id) as order_count
+        FROM customers c
+        JOIN orders o ON c.customer_id = o.customer_id
+        WHERE o.status = 'completed'
+        GROUP BY c.customer_id, c.country
+        ORDER BY total_spent DESC
+        LIMIT 5;
+    """,
+    "four_table_join": """
+        SELECT c.customer_id, c.country,
+               o.order_id, o.order_date,
+               p.name as product_name,
+               oi.quantity, oi.unit_price,
+               (oi.quantity * oi.unit_price) as line_total
+        FROM customers c
+        JOIN orders o ON c.customer_id = o.customer_id
+        JOIN order_items oi ON o.order_id = oi.order_id
+        JOIN products p ON oi.product_id = p.product_id
+        WHERE o.status = 'completed'
+        ORDER BY o.order_date DESC
+        LIMIT 3;
+    """,
+}
+
+
+def ensure_primary_keys(eng=None) -> List[str]:
+    """Add missing primary keys; each in its own transaction so bad data only skips that table."""
+    eng = eng or engine
+    added = []
+    for table, column in PRIMARY_KEYS.items():
+        with eng.connect() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM pg_index WHERE indrelid = CAST(:table AS regclass) AND indisprimary"
+            ), {"table": table}).first()
+            if not exists and is_partitioned(conn, table):
+                column = PARTITIONED_PRIMARY_KEYS.get(table, column)
+        if exists:
+            continue
+        try:
+            with eng.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY ({column})"))
+            added.append(table)
+            print(f"   ✅ Primary key {table}({column})")
+        except Exception as e:
+            print(f"   ⚠️ Could not add primary key on {table}({column}): {str(e).splitlines()[0]}")
+    return added
+
+
+def create_indexes(eng=None) -> List[str]:
+    """Create the FK / date / partial indexes that do not exist yet, then ANALYZE."""
+    eng = eng or engine
+    created = []
+    with eng.begin() as conn:
+        existing = {row[0] for row in conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public'"
+        ))}
+        for name, body in INDEXES:
+            if name in existing:
+                continue
+            start = time.perf_counter()
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {body}"))
+            created.append(name)
+            print(f"   ✅ {name} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    analyze_tables(eng)
+    return created
+
+
+def drop_indexes(eng=None):
+    """Drop the indexes managed here (primary keys are left alone)."""
+    with (eng or engine).begin() as conn:
+        for name, _ in INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def add_foreign_keys(eng=None) -> bool:
+    """Add the FK constraints in one transaction; needs the primary keys from ensure_primary_keys()."""
+    try:
+        with (eng or engine).begin() as conn:
+            partitioned = is_partitioned(conn, "orders")
+            for table, constraint, definition in FOREIGN_KEYS:
+                if partitioned:
+                    definition = PARTITIONED_FOREIGN_KEYS.get(constraint, definition)
+                conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}"))
+                conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {constraint} {definition}"))
+        print("   ✅ Foreign key constraints added")
+        return True
+    except Exception as e:
+        print(f"   ⚠️ Could not add foreign keys: {str(e).splitlines()[0]}")
+        return False
+
+
+def drop_foreign_keys(eng=None):
+    """Drop the FK constraints so the tables can be replaced (to_sql if_exists='replace')."""
+    with (eng or engine).begin() as conn:
+        for table, constraint, _ in FOREIGN_KEYS:
+            if conn.execute(text("SELECT to_regclass(:table)"), {"table": table}).scalar():
+                conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}"))
+
+
+def analyze_tables(eng=None):
+    """Refresh planner statistics for the base tables."""
+    with (eng or engine).begin() as conn:
+        for table in TABLES:
+            conn.execute(text(f"ANALYZE {table}"))
+
+
+def time_template_queries(eng=None, repeat: int = 5) -> Dict[str, float]:
+    """Best-of-N wall time (ms) for each template query."""
+    eng = eng or engine
+    timings = {}
+    with eng.connect() as conn:
+        for name, sql in TEMPLATE_QUERIES.items():
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(text(sql)).fetchall()
+                best = min(best, (time.perf_counter() - start) * 1000)
+            timings[name] = best
+    return timings
+
+
+def setup_schema(eng=None, report: bool = True) -> Dict[str, Tuple[float, float]]:
+    """
+    Create primary keys and indexes, ANALYZE, and report template query timings.
+
+    Returns:
+        {query_name: (before_ms, after_ms)} when report is True, else {}
+    """
+    eng = eng or engine
+    before = time_template_queries(eng) if report else {}
+
+    print("\n🗂️ Setting up keys and indexes...")
+    ensure_primary_keys(eng)
+    create_indexes(eng)
+
+    if not report:
+        return {}
+
+    after = time_template_queries(eng)
+    print("\n⏱️ Template query timings (best of 5):")
+    print(f"   {'query':22} {'before':>10} {'after':>10} {'speedup':>8}")
+    for name in TEMPLATE_QUERIES:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"   {name:22} {before[name]:8.1f}ms {after[name]:8.1f}ms {speedup:7.1f}x")
+    return {name: (before[name], after[name]) for name in TEMPLATE_QUERIES}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create keys and indexes for the normalized tables")
+    parser.add_argument("--reset", action="store_true", help="Drop managed indexes first to measure from scratch")
+    args = parser.parse_args()
+
+    if args.reset:
+        drop_indexes()
+        analyze_tables()
+    setup_schema()
@@ -0,0 +1,139 @@
+# backend/app/db/stream_ingest.py
+"""
+Chunked, streaming ingest of the transactions CSV.
+
+The in-memory path reads the whole CSV, copies it and derives four frames,
+so peak memory is several times the file size. Here the CSV is read in
+fixed-size chunks with explicit dtypes, and each chunk is normalized and
+streamed to the COPY staging tables straight away:
+
+  * customers / products: running sets of seen keys, only new keys are copied
+  * order_items: copied per chunk with a running order_item_id
+  * orders: per-invoice partial aggregates, merged as chunks arrive and
+    copied at the end (invoices may span chunks)
+
+Memory is bounded by the chunk size plus one small entry per distinct
+customer, product and invoice, independent of the number of line items.
+The staging tables are swapped in atomically like the bulk loader does.
+"""
+
+from typing import Dict, List, Optional
+import os
+import time
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .bulk_load import LOAD_ORDER, column_types, copy_dataframe, create_staging, publish_staging
+from .normalize import (SOURCE_DTYPES, build_customers, build_order_items, build_products,
+                        clean_transactions, combine_order_partials, finish_orders, order_partials)
+
+CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "100000"))
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if peak > 1 << 32 else peak / 1024
+
+
+class _OrderAccumulator:
+    """Per-invoice partial aggregates, compacted when pending partials outgrow the merged set."""
+
+    def __init__(self):
+        self.merged: Optional[pd.DataFrame] = None
+        self.pending: List[pd.DataFrame] = []
+        self.pending_rows = 0
+
+    def add(self, partial: pd.DataFrame):
+        self.pending.append(partial)
+        self.pending_rows += len(partial)
+        # Amortized: each compaction at least doubles the work already merged
+        if self.pending_rows > (len(self.merged) if self.merged is not None else 0):
+            self.compact()
+
+    def compact(self) -> pd.DataFrame:
+        if self.pending:
+            parts = ([self.merged] if self.merged is not None else []) + self.pending
+            self.merged = combine_order_partials(parts)
+            self.pending, self.pending_rows = [], 0
+        return self.merged
+
+
+def stream_ingest(eng, csv_path: str, chunksize: int = CHUNK_ROWS, fmt: str = "csv") -> Dict[str, int]:
+    """
+    Normalize and load the CSV chunk by chunk, then swap the tables in.
+
+    Returns:
+        {table: rows loaded}
+    """
+    print(f"\n🌊 Streaming {csv_path} in chunks of {chunksize:,} rows via COPY ({fmt})...")
+    total_bytes = os.path.getsize(csv_path)
+    seen_customers, seen_products = set(), set()
+    orders_acc = _OrderAccumulator()
+    counts = {table: 0 for table in LOAD_ORDER}
+    staging: Dict[str, str] = {}
+    rows_read = 0
+    start = time.perf_counter()
+
+    raw_conn = eng.raw_connection()
+    try:
+        with open(csv_path, 'rb') as fh:
+            reader = pd.read_csv(fh, encoding='ISO-8859-1', dtype=SOURCE_DTYPES, chunksize=chunksize)
+            for i, chunk in enumerate(reader):
+                rows_read += len(chunk)
+                clean = clean_transactions(chunk)
+
+                customers = build_customers(clean)
+                customers = customers[~customers['customer_id'].isin(seen_customers)]
+                seen_customers.update(customers['customer_id'])
+
+                products = build_products(clean)
+                products = products[~products['product_id'].isin(seen_products)]
+                seen_products.update(products['product_id'])
+
+                order_items = build_order_items(clean, start_id=counts['order_items'] + 1)
+                partial = order_partials(clean)
+
+                frames = {'customers': customers, 'products': products, 'order_items': order_items}
+                if not staging:
+                    # Column types are fixed by SOURCE_DTYPES, so the first chunk defines them
+                    frames_for_types = {**frames, 'orders': finish_orders(partial)}
+                    for table in LOAD_ORDER:
+                        staging[table] = create_staging(raw_conn, table, column_types(frames_for_types[table]))
+
+                for table, frame in frames.items():
+                    counts[table] += copy_dataframe(raw_conn, staging[table], frame, fmt)
+                orders_acc.add(partial)
+                raw_conn.commit()
+
+                elapsed = time.perf_counter() - start
+                peak = _peak_rss_mb()
+                print(f"   📥 chunk {i + 1}: {rows_read:,} rows ({min(fh.tell() / total_bytes, 1):.0%}), "
+                      f"{rows_read / elapsed if elapsed else 0:,.0f} rows/s"
+                      + (f", peak RSS {peak:.0f} MB" if peak is not None else ""))
+
+        if not staging:
+            raise ValueError(f"No rows in {csv_path}")
+
+        orders = finish_orders(orders_acc.compact())
+        counts['orders'] = copy_dataframe(raw_conn, staging['orders'], orders, fmt)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"   ✅ {rows_read:,} source rows → " + ", ".join(f"{t} {n:,}" for t, n in counts.items())
+          + f" in {elapsed:.2f}s ({rows_read / elapsed if elapsed else 0:,.0f} rows/s)")
+
+    publish_staging(eng, LOAD_ORDER, sum(counts.values()))
+    return counts
@@ -4,63 +4,90 @@ Format SQL results into natural language answers with business insights.
 Handles multi-table query results intelligently.
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from textwrap import dedent
 import json
+import logging
 import os
 import sys
 from datetime import datetime
+from decimal import Decimal
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
+from app.llm.answer_templates import render_template_answer
 from app.llm.groq_client import call_groq_chat
+from app.utils.result_profile import describe_profile, profile_rows
 from app.utils.schema_builder import get_detailed_schema
+from app.utils.sql_shape import analyze_sql
 
 DEFAULT_MAX_TOKENS = int(os.getenv("LLM_ANSWER_MAX_TOKENS", "512"))
 USE_LOCAL_FALLBACK = os.getenv("USE_LOCAL_FALLBACK", "false").lower() == "true"
 
+logger = logging.getLogger(__name__)
+
+def _shape_flags(sql: str) -> Dict[str, bool]:
+    """Entity and aggregation flags read from the parsed query shape."""
+    shape = analyze_sql(sql)
+    tables = shape["tables"]
+    columns = " ".join(shape["columns"])
+    return {
+        "joins": shape["joins"],
+        "customers": "customers" in tables,
+        "products": "products" in tables,
+        "orders": "orders" in tables or "order_items" in tables,
+        "items": "order_items" in tables,
+        "sum": "SUM" in shape["aggregates"],
+        "count": "COUNT" in shape["aggregates"],
+        "revenue": "revenue" in columns,
+        "total": "total" in columns,
+        "grouped": bool(shape["group_by"]),
+        "time": "DATE_TRUNC" in shape["functions"] or "EXTRACT" in shape["functions"]
+                or any(word in columns for word in ("month", "year")),
+    }
+
 def detect_query_type(sql: str, question: str) -> str:
     """
     Detect the type of query to format answer appropriately.
     """
-    sql_upper = sql.upper()
-    question_lower = question.lower()
+    f = _shape_flags(sql)
     
-    if "JOIN" in sql_upper:
+    if f["joins"]:
         # Multi-table query
-        if "CUSTOMER" in sql_upper and "PRODUCT" in sql_upper:
+        if f["customers"] and f["products"]:
             return "customer_product_relationship"
-        elif "CUSTOMER" in sql_upper and "ORDER" in sql_upper:
-            if "REVENUE" in sql_upper or "SUM" in sql_upper:
+        elif f["customers"] and f["orders"]:
+            if f["revenue"] or f["sum"]:
                 return "customer_revenue"
             else:
                 return "customer_orders"
-        elif "PRODUCT" in sql_upper and ("SUM" in sql_upper or "COUNT" in sql_upper):
+        elif f["products"] and (f["sum"] or f["count"]):
             return "product_sales"
-        elif "DATE_TRUNC" in sql_upper or "MONTH" in sql_upper or "YEAR" in sql_upper:
+        elif f["time"]:
             return "time_series"
         else:
             return "multi_table_general"
     
     # Single table queries
-    elif "CUSTOMER" in sql_upper:
+    elif f["customers"]:
         return "customer_list"
-    elif "PRODUCT" in sql_upper:
+    elif f["products"]:
         return "product_list"
-    elif "ORDER" in sql_upper:
-        if "ITEM" in sql_upper:
+    elif f["orders"]:
+        if f["items"]:
             return "order_details"
         else:
             return "order_list"
-    elif "REVENUE" in sql_upper or "SUM" in sql_upper or "TOTAL" in sql_upper:
+    elif f["revenue"] or f["sum"] or f["total"]:
         return "aggregate"
     
     return "general"
 
-def prepare_business_context(query_type: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+def prepare_business_context(query_type: str, rows: List[Dict[str, Any]],
+                             profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
-    Extract business context from query results.
+    Extract business context from query results (columnar profile, see result_profile.py).
     """
     context = {
         "has_data": len(rows) > 0,
@@ -73,75 +100,48 @@ def prepare_business_context(query_type: str, rows: List[Dict[str, Any]]) -> Dic
     if not rows:
         return context
     
-    # Extract sample columns
-    sample_row = rows[0]
-    columns = list(sample_row.keys())
-    context["columns"] = columns
+    profile = profile or profile_rows(rows)
+    context["columns"] = profile["columns"]
+    context["profile"] = profile
+    numeric = profile["numeric"]
     
     # Extract key metrics based on query type
     try:
         if query_type in ["customer_revenue", "aggregate", "product_sales"]:
-            # Look for numeric columns
-            numeric_cols = []
-            for col in columns:
-                if any(keyword in col.lower() for keyword in ['total', 'sum', 'count', 'revenue', 'amount', 'value', 'quantity', 'avg', 'average']):
-                    if isinstance(sample_row.get(col), (int, float)):
-                        numeric_cols.append(col)
+            # Numeric columns (Decimal included) named like measures
+            numeric_cols = [col for col in numeric
+                            if any(keyword in col.lower() for keyword in ['total', 'sum', 'count', 'revenue', 'amount', 'value', 'quantity', 'avg', 'average'])]
+            for col in numeric_cols[:2]:  # Top 2 numeric columns
+                context["key_metrics"][col] = numeric[col]["sum"]
             
-            if numeric_cols:
-                # Calculate totals
-                for col in numeric_cols[:2]:  # Top 2 numeric columns
-                    try:
-                        total = sum(float(row.get(col, 0) or 0) for row in rows)
-                        context["key_metrics"][col] = total
-                    except:
-                        pass
+            # Concentration: share of the main measure held by the top category
+            for col, stats in profile["categorical"].items():
+                top = stats["top"][0]
+                if top.get("measure_share") is not None and stats["distinct"] > 1:
+                    context["insights"].append(
+                        f"Top {col}: {top['value']} accounts for {top['measure_share']:.1%} of {profile['measure']}"
+                    )
+                    break
         
         elif query_type == "time_series":
-            # Look for date and value columns
-            date_col = None
-            value_col = None
-            
-            for col in columns:
-                if any(keyword in col.lower() for keyword in ['date', 'month', 'year', 'time', 'period']):
-                    date_col = col
-                elif isinstance(sample_row.get(col), (int, float)):
-                    value_col = col
-            
-            if date_col and value_col and len(rows) >= 2:
-                # Try to detect trend
-                sorted_rows = sorted(rows, key=lambda x: str(x.get(date_col, "")))
-                if len(sorted_rows) >= 2:
-                    first_val = float(sorted_rows[0].get(value_col, 0) or 0)
-                    last_val = float(sorted_rows[-1].get(value_col, 0) or 0)
-                    
-                    if first_val and last_val and first_val != last_val:
-                        trend_pct = ((last_val - first_val) / first_val) * 100
-                        direction = "increased" if trend_pct > 0 else "decreased"
-                        context["trends"].append(f"Overall trend: {direction} by {abs(trend_pct):.1f}%")
+            periods = profile["periods"]
+            if periods and profile["measure"] in periods["deltas"]:
+                delta = periods["deltas"][profile["measure"]]
+                if delta["overall_change_pct"]:
+                    direction = "increased" if delta["overall_change_pct"] > 0 else "decreased"
+                    context["trends"].append(f"Overall trend: {direction} by {abs(delta['overall_change_pct']):.1f}%")
+                if delta["last_change_pct"] is not None:
+                    context["trends"].append(
+                        f"Latest period ({periods['last_period']}): {delta['last_change_pct']:+.1f}% vs previous"
+                    )
+                context["trends"].append(f"Peak: {delta['peak_period']}, low: {delta['low_period']}")
         
         elif query_type in ["customer_product_relationship", "multi_table_general"]:
-            # Look for relationship indicators
-            if len(rows) > 0:
-                # Find categorical columns for grouping insights
-                categorical_cols = []
-                for col in columns:
-                    val = sample_row.get(col)
-                    if isinstance(val, str) and len(val) < 50:  # Reasonable string length
-                        categorical_cols.append(col)
-                
-                if categorical_cols:
-                    # Find most common values in first categorical column
-                    col = categorical_cols[0]
-                    value_counts = {}
-                    for row in rows[:20]:  # Sample first 20 rows
-                        val = row.get(col)
-                        if val:
-                            value_counts[val] = value_counts.get(val, 0) + 1
-                    
-                    if value_counts:
-                        top_value = max(value_counts.items(), key=lambda x: x[1])
-                        context["insights"].append(f"Most common {col}: {top_value[0]} ({top_value[1]} occurrences)")
+            # Most common value of the first categorical column, over all rows
+            for col, stats in profile["categorical"].items():
+                top = max(stats["top"], key=lambda entry: entry["count"])
+                context["insights"].append(f"Most common {col}: {top['value']} ({top['count']} occurrences)")
+                break
     
     except Exception as e:
         # Silently fail - context extraction is optional
@@ -154,7 +154,8 @@ async def format_answer(
     sql: str,
     rows: List[Dict[str, Any]],
     schema_summary: Dict[str, Any],
-    max_tokens: int = DEFAULT_MAX_TOKENS
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    query_type: Optional[str] = None
 ) -> str:
     """
     Convert SQL results into insightful business answers.
@@ -165,17 +166,28 @@ async def format_answer(
         rows: Query results
         schema_summary: Database schema information
         max_tokens: Maximum response length
+        query_type: Answer prompt chosen by the intent router (skips detection)
         
     Returns:
         Natural language answer
     """
+    # One columnar pass over the rows feeds the prompt and the local answer
+    profile = profile_rows(rows)
+    
+    # Simple result shapes (scalar, top-N, time series, breakdown) need no LLM call
+    templated = render_template_answer(user_question, sql, rows, profile)
+    if templated:
+        logger.info("Templated %s answer (LLM skipped)", templated["shape"])
+        return templated["answer"]
+    
     # Quick bypass for testing
     if USE_LOCAL_FALLBACK:
-        return generate_local_answer(user_question, sql, rows)
+        return generate_local_answer(user_question, sql, rows, profile)
     
-    # Detect query type and prepare context
-    query_type = detect_query_type(sql, user_question)
-    business_context = prepare_business_context(query_type, rows)
+    # Detect query type (unless the router already chose one) and prepare context
+    if not query_type:
+        query_type = detect_query_type(sql, user_question)
+    business_context = prepare_business_context(query_type, rows, profile)
     
     # Get schema for additional context
     try:
@@ -313,7 +325,7 @@ async def format_answer(
                     # Simplify row display
                     simple_row = {}
                     for key, value in row.items():
-                        if isinstance(value, (int, float)):
+                        if isinstance(value, (int, float, Decimal)):
                             simple_row[key] = round(float(value), 2)
                         else:
                             simple_row[key] = str(value)[:30] + "..." if len(str(value)) > 30 else value
@@ -330,6 +342,12 @@ async def format_answer(
             else:
                 data_summary += f"\n• {metric}: {value:,}"
     
+    profile_lines = describe_profile(profile)
+    if profile_lines:
+        data_summary += f"\n\nColumn Profile (all {len(rows)} rows):"
+        for line in profile_lines:
+            data_summary += f"\n• {line}"
+    
     if business_context.get("trends"):
         data_summary += "\n\nTrends Identified:"
         for trend in business_context["trends"]:
@@ -381,7 +399,7 @@ async def format_answer(
     ]
     
     try:
-        print(f"[Answer Formatter] Formatting {query_type} answer...")
+        logger.debug("Formatting %s answer", query_type)
         answer = await call_groq_chat(
             messages=messages,
             max_tokens=max_tokens,
@@ -393,19 +411,20 @@ async def format_answer(
             answer = answer.strip()
             # Remove any trailing SQL references
             answer = re.sub(r'(?i)(sql|query|select|from|where).*$', '', answer)
-            print(f"[Answer Formatter] Generated answer: {answer[:100]}...")
+            logger.debug("Generated answer: %s", answer[:100])
             return answer
         else:
-            return generate_local_answer(user_question, sql, rows)
+            return generate_local_answer(user_question, sql, rows, profile)
             
     except Exception as e:
-        print(f"[Answer Formatter] Groq API error: {e}. Using local answer.")
-        return generate_local_answer(user_question, sql, rows)
+        logger.warning("Groq API error: %s. Using local answer.", e)
+        return generate_local_answer(user_question, sql, rows, profile)
 
-def generate_local_answer(user_question: str, sql: str, rows: List[Dict[str, Any]]) -> str:
+def generate_local_answer(user_question: str, sql: str, rows: List[Dict[str, Any]],
+                          profile: Optional[Dict[str, Any]] = None) -> str:
     """
     Generate a local fallback answer when LLM fails.
-    Enhanced for multi-table queries.
+    Enhanced for multi-table queries; totals come from the result profile.
     """
     if not rows:
         return "No matching records found for your query."
@@ -415,15 +434,27 @@ def generate_local_answer(user_question: str, sql: str, rows: List[Dict[str, Any
     
     # Try to extract meaningful information
     try:
+        profile = profile or profile_rows(rows)
+        numeric = profile["numeric"]
         sample_row = rows[0]
         columns = list(sample_row.keys())
         
         # Check query type for appropriate response
-        sql_upper = sql.upper()
-        
-        if "JOIN" in sql_upper:
+        f = _shape_flags(sql)
+        
+        # Time series: period-over-period summary of the main measure
+        periods = profile["periods"]
+        if f["time"] and periods and profile["measure"] in periods["deltas"]:
+            delta = periods["deltas"][profile["measure"]]
+            answer = (f"{profile['measure'].replace('_', ' ').capitalize()} went from {delta['first']:,.2f} in "
+                      f"{periods['first_period']} to {delta['last']:,.2f} in {periods['last_period']}")
+            if delta["overall_change_pct"] is not None:
+                answer += f" ({delta['overall_change_pct']:+.1f}%)"
+            return answer + f", peaking at {delta['peak']:,.2f} in {delta['peak_period']} across {periods['count']} periods."
+        
+        if f["joins"]:
             # Multi-table query response
-            if "CUSTOMER" in sql_upper and "PRODUCT" in sql_upper:
+            if f["customers"] and f["products"]:
                 # Customer-product relationship
                 if row_count > 0:
                     cust_col = next((c for c in columns if "customer" in c.lower() or "name" in c.lower()), columns[0])
@@ -434,44 +465,46 @@ def generate_local_answer(user_question: str, sql: str, rows: List[Dict[str, Any
                     
                     return f"Found {row_count} customer-product relationships. For example, {cust_val} purchased {prod_val}. This shows direct purchasing patterns between customers and products."
             
-            elif "CUSTOMER" in sql_upper and "ORDER" in sql_upper:
+            elif f["customers"] and f["orders"]:
                 # Customer orders
-                if "SUM" in sql_upper or "TOTAL" in sql_upper:
+                if f["sum"] or f["total"]:
                     # Customer revenue
                     amount_col = next((c for c in columns if "total" in c.lower() or "amount" in c.lower() or "revenue" in c.lower()), columns[-1])
-                    total_amount = sum(float(r.get(amount_col, 0) or 0) for r in rows)
+                    total_amount = numeric.get(amount_col, {}).get("sum", 0.0)
                     
                     return f"Customer order analysis shows {row_count} customer records with total value of ${total_amount:,.2f}. The data reveals customer spending patterns across the business."
                 else:
                     # Customer order list
                     return f"Found {row_count} customer orders in the system. Each order represents a purchase transaction with associated customer details and order information."
             
-            elif "PRODUCT" in sql_upper and ("SUM" in sql_upper or "COUNT" in sql_upper):
+            elif f["products"] and (f["sum"] or f["count"]):
                 # Product sales
                 qty_col = next((c for c in columns if "quantity" in c.lower() or "count" in c.lower()), None)
                 if qty_col:
-                    total_qty = sum(float(r.get(qty_col, 0) or 0) for r in rows)
+                    total_qty = numeric.get(qty_col, {}).get("sum", 0.0)
                     return f"Product sales analysis shows {row_count} product records with total quantity sold of {total_qty:,.0f} units. This indicates product performance and demand trends."
         
         # Single table or aggregate responses
-        if "CUSTOMER" in sql_upper:
+        if f["customers"]:
             return f"Customer database contains {row_count} customer records with details including contact information and geographic data."
         
-        elif "PRODUCT" in sql_upper:
+        elif f["products"]:
             return f"Product catalog includes {row_count} products with pricing, category, and supplier information for inventory management."
         
-        elif "ORDER" in sql_upper:
-            if "ITEM" in sql_upper:
+        elif f["orders"]:
+            if f["items"]:
                 return f"Order details show {row_count} line items with product quantities, prices, and extended totals for precise order tracking."
             else:
                 return f"Order system contains {row_count} orders with customer references, dates, amounts, and status information."
         
-        elif "REVENUE" in sql_upper or "SUM" in sql_upper or "TOTAL" in sql_upper:
+        elif f["revenue"] or f["sum"] or f["total"]:
             # Aggregate query
-            for col in columns:
-                if isinstance(sample_row.get(col), (int, float)):
-                    total = sum(float(r.get(col, 0) or 0) for r in rows)
-                    return f"Analysis shows total of {total:,.2f} across {row_count} records. This provides a high-level summary of business performance."
+            if profile["measure"]:
+                stats = numeric[profile["measure"]]
+                answer = f"Analysis shows total of {stats['sum']:,.2f} across {row_count} records"
+                if row_count > 1:
+                    answer += f" (average {stats['mean']:,.2f}, range {stats['min']:,.2f} to {stats['max']:,.2f})"
+                return answer + ". This provides a high-level summary of business performance."
         
         # Default response
         if row_count == 1 and len(columns) == 1:
@@ -487,7 +520,7 @@ def generate_local_answer(user_question: str, sql: str, rows: List[Dict[str, Any
     
 def detect_query_type_better(sql: str, question: str) -> str:
     """Enhanced query type detection for better answer formatting"""
-    sql_upper = sql.upper()
+    f = _shape_flags(sql)
     question_lower = question.lower()
     
     # Time series detection
@@ -496,29 +529,28 @@ def detect_query_type_better(sql: str, question: str) -> str:
     
     # Revenue/sales aggregates
     if any(word in question_lower for word in ["revenue", "sales", "income", "profit", "total", "sum", "average", "aggregate"]):
-        if "DATE_TRUNC" in sql_upper or "GROUP BY" in sql_upper:
+        if f["time"] or f["grouped"]:
             return "time_series"
         return "customer_revenue"
     
     # Customer-product relationships
-    if ("CUSTOMER" in sql_upper and "PRODUCT" in sql_upper) or \
-       ("CUSTOMERS" in sql_upper and "PRODUCTS" in sql_upper):
+    if f["customers"] and f["products"]:
         return "customer_product_relationship"
     
     # Customer lists
-    if "CUSTOMER" in sql_upper and "GROUP BY" in sql_upper and not "PRODUCT" in sql_upper:
+    if f["customers"] and f["grouped"] and not f["products"]:
         return "customer_list"
     
     # Product lists  
-    if "PRODUCT" in sql_upper and "GROUP BY" in sql_upper:
+    if f["products"] and f["grouped"]:
         return "product_list"
     
     # Multi-table general
-    if sql_upper.count("JOIN") >= 2:
+    if f["joins"] >= 2:
         return "multi_table_general"
     
     # Customer-orders
-    if "CUSTOMER" in sql_upper and "ORDER" in sql_upper and "JOIN" in sql_upper:
+    if f["customers"] and f["orders"] and f["joins"]:
         return "customer_orders"
     
     return "general"
@@ -0,0 +1,232 @@
+# backend/app/llm/answer_templates.py
+"""
+Deterministic answers for simple result shapes, rendered without an LLM call.
+
+The shape is read from the parsed SQL (sql_shape) and the result profile
+(result_profile):
+
+  * scalar       one row of one or a few numbers ("total revenue")
+  * ranking      ORDER BY <measure> ... LIMIT over a label column ("top 5 products", "bottom 3")
+  * time_series  a measure per period ("monthly revenue")
+  * breakdown    GROUP BY one category column with a measure ("revenue by country")
+
+Anything else, and questions asking for an explanation, return None so
+format_answer goes to the LLM as before.
+"""
+
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import re
+
+from app.utils.result_profile import profile_rows
+from app.utils.sql_shape import analyze_sql
+
+ANSWER_TEMPLATES_ENABLED = os.getenv("ANSWER_TEMPLATES_ENABLED", "true").lower() == "true"
+# Longest ranking / breakdown rendered as a list; longer results go to the LLM
+TEMPLATE_MAX_ROWS = int(os.getenv("TEMPLATE_MAX_ROWS", "25"))
+# Longest time series summarised by a template
+TEMPLATE_MAX_PERIODS = int(os.getenv("TEMPLATE_MAX_PERIODS", "120"))
+
+# Questions that want interpretation rather than numbers
+EXPLAIN_PATTERN = re.compile(
+    r"\b(explain|why|insights?|interpret|recommend\w*|suggest\w*|should|analy[sz]e|what does .* mean|reason)\b",
+    re.IGNORECASE,
+)
+
+CURRENCY_KEYWORDS = ('revenue', 'amount', 'spent', 'spend', 'sales', 'price', 'value', 'income', 'ltv')
+COUNT_KEYWORDS = ('count', 'quantity', 'qty', 'units', 'number', 'num_', 'orders', 'customers', 'products', 'items')
+PERCENT_KEYWORDS = ('pct', 'percent', 'share', 'rate', 'ratio')
+
+logger = logging.getLogger(__name__)
+
+
+def wants_explanation(question: str) -> bool:
+    return bool(EXPLAIN_PATTERN.search(question or ""))
+
+
+def humanize(column: str) -> str:
+    return column.replace('_', ' ').strip().capitalize()
+
+
+def format_value(column: str, value: Any) -> str:
+    """Currency / count / percent formatting chosen from the column name."""
+    if value is None:
+        return "n/a"
+    if isinstance(value, date):
+        return value.isoformat()
+    if not isinstance(value, (int, float, Decimal)) or isinstance(value, bool):
+        return str(value)
+    name = column.lower()
+    number = float(value)
+    if any(k in name for k in PERCENT_KEYWORDS):
+        return f"{number * 100 if abs(number) <= 1 else number:.1f}%"
+    if any(k in name for k in CURRENCY_KEYWORDS) and not any(k in name for k in COUNT_KEYWORDS):
+        return f"-${abs(number):,.2f}" if number < 0 else f"${number:,.2f}"
+    if number.is_integer():
+        return f"{number:,.0f}"
+    return f"{number:,.2f}"
+
+
+def format_period(value: Any) -> str:
+    """Month starts as 'Nov 2011', other dates as ISO dates, anything else as text."""
+    if isinstance(value, str):
+        try:
+            value = date.fromisoformat(value[:10])
+        except ValueError:
+            return value
+    if isinstance(value, date):
+        return value.strftime("%b %Y") if value.day == 1 else value.strftime("%Y-%m-%d")
+    return str(value)
+
+
+def _labels(profile: Dict[str, Any], rows: List[Dict[str, Any]]) -> List[str]:
+    """Row labels from the categorical columns: 'United Kingdom', '17850 (United Kingdom)'."""
+    columns = list(profile["categorical"])[:2]
+    labels = []
+    for row in rows:
+        parts = [str(row.get(col)) for col in columns]
+        labels.append(parts[0] + (f" ({parts[1]})" if len(parts) > 1 else ""))
+    return labels
+
+
+_ORDER_ITEM = re.compile(r'^(?:"?\w+"?\.)?"?(\w+)"?(?:\s+(asc|desc))?(?:\s+nulls\s+(?:first|last))?$', re.IGNORECASE)
+
+
+def ranking_order(sql: str, profile: Dict[str, Any]) -> Optional[tuple]:
+    """(numeric result column, "ASC" | "DESC") the query ranks by, or None when it sorts by anything else."""
+    order_by = analyze_sql(sql)["order_by"]
+    if not order_by:
+        return None
+    columns = list(profile["kinds"])
+    m = _ORDER_ITEM.match(order_by[0].strip())
+    if not m:
+        return None
+    name = m.group(1)
+    if name.isdigit():
+        position = int(name)
+        name = columns[position - 1] if 1 <= position <= len(columns) else None
+    else:
+        name = next((col for col in columns if col.lower() == name.lower()), None)
+    if name not in profile["numeric"]:
+        return None
+    return name, (m.group(2) or "asc").upper()
+
+
+def classify_shape(sql: str, profile: Dict[str, Any]) -> Optional[str]:
+    """scalar / ranking / time_series / breakdown, or None for shapes left to the LLM."""
+    shape = analyze_sql(sql)
+    kinds = profile["kinds"]
+    row_count = profile["row_count"]
+    numeric = list(profile["numeric"])
+    categorical = list(profile["categorical"])
+    temporal = [c for c, kind in kinds.items() if kind in ("temporal", "period")]
+
+    if row_count == 0 or not numeric:
+        return None
+    if row_count == 1 and len(numeric) == len(kinds) and len(numeric) <= 3:
+        return "scalar"
+    if row_count < 2:
+        return None
+    if profile["periods"] and not categorical and row_count <= TEMPLATE_MAX_PERIODS:
+        return "time_series"
+    if temporal or not 1 <= len(categorical) <= 2 or len(numeric) > 3 or row_count > TEMPLATE_MAX_ROWS:
+        return None
+    if shape["order_by"] and shape["limit"] is not None:
+        # Only rankings by a measure in the result can be described without the LLM
+        return "ranking" if ranking_order(sql, profile) else None
+    if shape["group_by"] and len(categorical) == 1:
+        return "breakdown"
+    return None
+
+
+def _render_scalar(profile: Dict[str, Any], rows: List[Dict[str, Any]], sql: str) -> str:
+    row = rows[0]
+    parts = [f"{humanize(col)}: {format_value(col, row[col])}" for col in profile["numeric"]]
+    if len(parts) == 1:
+        col = next(iter(profile["numeric"]))
+        return f"{humanize(col)} is {format_value(col, row[col])}."
+    return "; ".join(parts) + "."
+
+
+def _render_ranking(profile: Dict[str, Any], rows: List[Dict[str, Any]], sql: str) -> str:
+    measure, direction = ranking_order(sql, profile)
+    labels = _labels(profile, rows)
+    total = profile["numeric"][measure]["sum"]
+    heading = "Top" if direction == "DESC" else "Bottom"
+    lines = [f"{heading} {len(rows)} by {humanize(measure).lower()}:"]
+    for i, (label, row) in enumerate(zip(labels, rows), start=1):
+        value = row.get(measure)
+        share = f" ({float(value) / total:.1%})" if total > 0 and value is not None and float(value) >= 0 else ""
+        extras = [f"{humanize(col).lower()} {format_value(col, row.get(col))}"
+                  for col in profile["numeric"] if col != measure]
+        lines.append(f"{i}. {label}: {format_value(measure, value)}{share}"
+                     + (f", {', '.join(extras)}" if extras else ""))
+    if total > 0 and rows[0].get(measure) is not None:
+        verb = "leads" if direction == "DESC" else "is lowest"
+        lines.append(f"{labels[0]} {verb} with {float(rows[0][measure]) / total:.1%} of the listed total "
+                     f"({format_value(measure, total)}).")
+    return "\n".join(lines)
+
+
+def _render_breakdown(profile: Dict[str, Any], rows: List[Dict[str, Any]], sql: str) -> str:
+    measure = profile["measure"]
+    category, stats = next(iter(profile["categorical"].items()))
+    total = profile["numeric"][measure]["sum"]
+    lines = [f"{humanize(measure)} by {humanize(category).lower()} "
+             f"({stats['distinct']} groups, total {format_value(measure, total)}):"]
+    shown = len(stats["top"])  # PROFILE_TOP_K largest groups
+    for entry in stats["top"]:
+        share = f" ({entry['measure_share']:.1%})" if entry.get("measure_share") is not None else ""
+        lines.append(f"- {entry['value']}: {format_value(measure, entry['measure'])}{share}")
+    if stats["distinct"] > shown:
+        lines.append(f"- {stats['distinct'] - shown} more groups")
+    return "\n".join(lines)
+
+
+def _render_time_series(profile: Dict[str, Any], rows: List[Dict[str, Any]], sql: str) -> str:
+    measure = profile["measure"]
+    periods = profile["periods"]
+    delta = periods["deltas"][measure]
+    first, last = format_period(periods["first_period"]), format_period(periods["last_period"])
+    answer = (f"{humanize(measure)} went from {format_value(measure, delta['first'])} in {first} "
+              f"to {format_value(measure, delta['last'])} in {last}")
+    if delta["overall_change_pct"] is not None:
+        answer += f" ({delta['overall_change_pct']:+.1f}%)"
+    answer += (f" over {periods['count']} periods. Peak: {format_period(delta['peak_period'])} "
+               f"({format_value(measure, delta['peak'])}); low: {format_period(delta['low_period'])} "
+               f"({format_value(measure, delta['low'])}).")
+    if delta["last_change_pct"] is not None:
+        answer += f" The latest period changed {delta['last_change_pct']:+.1f}% from the one before."
+    return answer
+
+
+RENDERERS = {
+    "scalar": _render_scalar,
+    "ranking": _render_ranking,
+    "time_series": _render_time_series,
+    "breakdown": _render_breakdown,
+}
+
+
+def render_template_answer(question: str, sql: str, rows: List[Dict[str, Any]],
+                           profile: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, str]]:
+    """
+    Answer simple result shapes locally.
+
+    Returns:
+        {"shape", "answer"} or None when the question or the shape needs the LLM
+    """
+    if not ANSWER_TEMPLATES_ENABLED or not rows or wants_explanation(question):
+        return None
+    profile = profile or profile_rows(rows)
+    shape = classify_shape(sql, profile)
+    if not shape:
+        return None
+    try:
+        return {"shape": shape, "answer": RENDERERS[shape](profile, rows, sql)}
+    except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+        logger.warning("%s template failed (%s); using the LLM", shape, e)
+        return None
@@ -0,0 +1,131 @@
+# backend/app/llm/cassette.py
+"""
+Record/replay cassettes for LLM calls (call_groq_chat, call_ollama_chat).
+
+LLM_CASSETTE_MODE=record: live calls go through as usual and every successful
+response is appended to LLM_CASSETTE_PATH (JSON lines) with its latency and
+token usage.
+LLM_CASSETTE_MODE=replay: calls never leave the process; the response is
+served from the cassette, after sleeping the recorded latency times
+LLM_CASSETTE_REPLAY_LATENCY (0 = instant, 1 = as recorded). A request with
+no recording raises CassetteMiss.
+
+Requests are matched by a hash of provider, model, the messages (roles and
+whitespace-normalized content) and the generation parameters. When one request
+was recorded several times, replays cycle through the recordings in order, so
+a replayed run is deterministic.
+"""
+
+from typing import Any, Dict, List, Optional
+from collections import defaultdict
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()  # off | record | replay
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "llm_cassette.jsonl")
+LLM_CASSETTE_REPLAY_LATENCY = float(os.getenv("LLM_CASSETTE_REPLAY_LATENCY", "0"))
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMiss(RuntimeError):
+    """Replay mode got a request that was never recorded."""
+
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text).split())
+
+
+def cassette_key(provider: str, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    request = {
+        "provider": provider,
+        "model": model,
+        "messages": [[m.get("role"), _normalize(m.get("content", ""))] for m in messages],
+        "params": {k: v for k, v in params.items() if v is not None},
+    }
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str, latency_scale: float = 0.0):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[entry["key"]].append(entry)
+        logger.info("Loaded %d cassette recordings from %s", sum(map(len, entries.values())), self.path)
+        return entries
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Next recording for `key` (cycling through repeats), or None."""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            recordings = self._entries.get(key)
+            if not recordings:
+                return None
+            entry = recordings[self._cursor[key] % len(recordings)]
+            self._cursor[key] += 1
+            return entry
+
+    async def replay(self, provider: str, model: str, messages: List[Dict[str, Any]],
+                     params: Dict[str, Any]) -> Dict[str, Any]:
+        key = cassette_key(provider, model, messages, params)
+        entry = self.lookup(key)
+        if entry is None:
+            raise CassetteMiss(f"No {provider} recording for this request (key {key[:12]}) in {self.path}")
+        if self.latency_scale > 0:
+            await asyncio.sleep(entry.get("latency_ms", 0) * self.latency_scale / 1000)
+        return entry
+
+    def record(self, provider: str, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any],
+               content: str, latency_ms: float, usage: Optional[Dict[str, Any]] = None):
+        entry = {
+            "key": cassette_key(provider, model, messages, params),
+            "provider": provider,
+            "model": model,
+            "params": params,
+            "messages": messages,
+            "content": content,
+            "latency_ms": round(latency_ms, 2),
+            "usage": usage or {},
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            if self._entries is not None:
+                self._entries[entry["key"]].append(entry)
+
+
+_cassette: Optional[Cassette] = (Cassette(LLM_CASSETTE_PATH, LLM_CASSETTE_MODE, LLM_CASSETTE_REPLAY_LATENCY)
+                                 if LLM_CASSETTE_MODE in ("record", "replay") else None)
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The configured cassette, or None when LLM_CASSETTE_MODE is off."""
+    return _cassette
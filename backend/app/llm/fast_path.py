@@ -0,0 +1,440 @@
+# backend/app/llm/fast_path.py
+"""
+Rule-based fast path: compile common question shapes straight to SQL.
+
+Questions are matched against a handful of intent patterns (revenue, top-N,
+time series, country breakdowns, customer history) and the specifics of the
+question (N, dates, countries, customer IDs) are extracted as slots and emitted
+as bound parameters. High-confidence matches skip the LLM entirely.
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import date
+import os
+import re
+
+MAX_ROWS_DEFAULT = int(os.getenv("MAX_QUERY_ROWS", "1000"))
+FAST_PATH_ENABLED = os.getenv("ENABLE_FAST_PATH", "true").lower() == "true"
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+DEFAULT_TOP_N = 10
+
+# Countries present in the source dataset, keyed by the phrases users type
+COUNTRY_ALIASES = {
+    "united kingdom": "United Kingdom", "uk": "United Kingdom", "britain": "United Kingdom",
+    "great britain": "United Kingdom", "england": "United Kingdom",
+    "france": "France", "australia": "Australia", "netherlands": "Netherlands",
+    "holland": "Netherlands", "germany": "Germany", "norway": "Norway",
+    "eire": "EIRE", "ireland": "EIRE", "switzerland": "Switzerland", "spain": "Spain",
+    "poland": "Poland", "portugal": "Portugal", "italy": "Italy", "belgium": "Belgium",
+    "lithuania": "Lithuania", "japan": "Japan", "iceland": "Iceland",
+    "channel islands": "Channel Islands", "denmark": "Denmark", "cyprus": "Cyprus",
+    "sweden": "Sweden", "austria": "Austria", "israel": "Israel", "finland": "Finland",
+    "bahrain": "Bahrain", "greece": "Greece", "hong kong": "Hong Kong",
+    "singapore": "Singapore", "lebanon": "Lebanon",
+    "united arab emirates": "United Arab Emirates", "uae": "United Arab Emirates",
+    "saudi arabia": "Saudi Arabia", "czech republic": "Czech Republic", "canada": "Canada",
+    "brazil": "Brazil", "usa": "USA", "united states": "USA", "america": "USA",
+    "european community": "European Community", "malta": "Malta",
+    "south africa": "RSA", "rsa": "RSA",
+}
+
+COUNTRY_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(alias) for alias in sorted(COUNTRY_ALIASES, key=len, reverse=True)) + r")\b"
+)
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "fifteen": 15, "twenty": 20, "fifty": 50, "hundred": 100,
+}
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+
+# Phrase → DATE_TRUNC unit for time series questions
+GRAINS = [
+    (r"\b(daily|per day|by day|each day)\b", "day"),
+    (r"\b(weekly|per week|by week|each week)\b", "week"),
+    (r"\b(quarterly|per quarter|by quarter|each quarter)\b", "quarter"),
+    (r"\b(yearly|annual|annually|per year|by year|each year)\b", "year"),
+    (r"\b(monthly|per month|by month|each month|month over month|over time|trend)\b", "month"),
+]
+
+GRAIN_ADJECTIVES = {"day": "daily", "week": "weekly", "month": "monthly", "quarter": "quarterly", "year": "yearly"}
+
+# Wording the templates cannot express; these questions go to the LLM
+UNSUPPORTED_HINTS = [
+    "compare", "versus", " vs", "ratio", "percentage", "growth rate", "why",
+    "category", "categories", "supplier", "email", "average basket", "return",
+    "refund", "cancel", "never", "except", "without", "not ", "per product per",
+    "first order", "last order", "registration", "join",
+    # templates only rank descending
+    "lowest", "least", "worst", "bottom", "fewest", "smallest",
+    # templates only SUM or COUNT
+    "average", "avg", " mean", "median", "share", "distribution",
+]
+
+_N = r"(\d{1,4}|" + "|".join(NUMBER_WORDS) + r")"
+_MONTH = r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+
+REVENUE_WORDS = r"\b(revenue|sales|income|turnover|earnings|sold)\b"
+
+
+def _to_int(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_WORDS[token]
+
+
+def extract_slots(question: str) -> Dict[str, Any]:
+    """
+    Extract N, period, country, customer ID and time grain from a question.
+    Only slots that were found are present in the returned dict.
+    """
+    q = question.lower()
+    slots: Dict[str, Any] = {}
+
+    # Top-N: "top 5", "5 best", "ten biggest"
+    m = re.search(r"\btop\s+" + _N + r"\b", q) or \
+        re.search(r"\b" + _N + r"\s+(?:best|biggest|largest|highest|most|top)\b", q)
+    if m:
+        # not clamped: the route caps each response; the LIMIT bounds paging and exports
+        slots["top_n"] = _to_int(m.group(1))
+
+    # Customer ID: "customer 17850", "customer id 17850", "customer #17850"; a bare
+    # year after "customer" ("top customer 2011") is not an ID
+    m = re.search(r"\bcustomer\s*(id\s*|#\s*|no\.?\s*)?(\d{4,6})\b", q)
+    if m and (m.group(1) or not 1900 <= int(m.group(2)) <= 2099):
+        slots["customer_id"] = m.group(2)
+
+    # Country: the alternation is longest-first so "united kingdom" wins over "uk"-like fragments
+    m = COUNTRY_PATTERN.search(q)
+    if m:
+        slots["country"] = COUNTRY_ALIASES[m.group(1)]
+
+    # Relative period: "last 3 months", "past two weeks", "last month"
+    m = re.search(r"\b(?:last|past|previous)\s+" + _N + r"?\s*(day|week|month|quarter|year)s?\b", q)
+    if m:
+        count = _to_int(m.group(1)) if m.group(1) else 1
+        unit = m.group(2)
+        if unit == "quarter":
+            count, unit = count * 3, "month"
+        slots["period"] = {"kind": "relative", "count": count, "unit": unit}
+    else:
+        # Absolute month: "in December 2010", "dec 2011"
+        m = re.search(r"\b" + _MONTH + r"\s+(20\d{2})\b", q)
+        if m:
+            month = MONTHS[m.group(1)[:3]]
+            year = int(m.group(2))
+            start = date(year, month, 1)
+            end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+            slots["period"] = {"kind": "absolute", "start": start, "end": end}
+        else:
+            # Absolute year: "in 2011", or a bare year that is not the N or a customer ID ("top customer 2011")
+            m = re.search(r"\b(?:in|during|for)\s+(20\d{2})\b", q) or re.search(r"\b(20\d{2})\b", q)
+            if m and (m.group(1) != slots.get("customer_id") and int(m.group(1)) != slots.get("top_n")):
+                year = int(m.group(1))
+                slots["period"] = {"kind": "absolute", "start": date(year, 1, 1), "end": date(year + 1, 1, 1)}
+
+    for pattern, grain in GRAINS:
+        if re.search(pattern, q):
+            slots["grain"] = grain
+            break
+
+    return slots
+
+
+def has_unsupported_wording(question: str) -> bool:
+    """True if the question uses wording the templates cannot express."""
+    q = question.lower()
+    return any(hint in q for hint in UNSUPPORTED_HINTS)
+
+
+def match_intent(question: str, slots: Optional[Dict[str, Any]] = None) -> Tuple[Optional[str], float]:
+    """
+    Score the question against every intent and return (intent, confidence).
+    Returns (None, 0.0) when no intent pattern applies.
+    """
+    q = question.lower()
+    if slots is None:
+        slots = extract_slots(question)
+
+    has_revenue = bool(re.search(REVENUE_WORDS, q))
+    has_product = bool(re.search(r"\b(products?|items?|stock)\b", q))
+    has_customer = bool(re.search(r"\b(customers?|clients?|buyers?)\b", q))
+    by_country = bool(re.search(r"\b(by|per|each|every|across|for each)\s+countr(y|ies)\b|\bcountries\b", q))
+    counts_customers = bool(re.search(r"\b(how many|number of|count of|count)\s+(customers|clients|buyers)\b", q))
+    ranking = "top_n" in slots or bool(re.search(
+        r"\b(top|best[- ]?selling|bestsellers?|most popular|biggest|largest|highest|most valuable|best)\b", q))
+
+    scores: Dict[str, float] = {}
+
+    if "customer_id" in slots:
+        if re.search(r"\b(products?|items?|bought|buy|purchased)\b", q):
+            scores["customer_products"] = 0.95
+        elif re.search(r"\b(orders?|history|purchases|invoices?|spent|spend|transactions?)\b", q):
+            scores["customer_orders"] = 0.9
+        else:
+            scores["customer_orders"] = 0.6
+    elif ranking and (has_product or has_customer) and ("grain" in slots or by_country):
+        # Top-N per month / per country: the templates only rank overall
+        return None, 0.0
+    else:
+        if ranking and has_product:
+            scores["top_products"] = 0.9
+        if ranking and has_customer and not has_product:
+            scores["top_customers"] = 0.9
+        if by_country and has_revenue:
+            scores["revenue_by_country"] = 0.9
+        elif (by_country or counts_customers and "country" in slots) and has_customer and not has_product:
+            scores["customers_by_country"] = 0.85
+        if has_revenue and "grain" in slots and not has_product and not by_country:
+            scores["revenue_time_series"] = 0.9
+        if has_revenue and not (has_product or has_customer or by_country or "grain" in slots or ranking):
+            if re.search(r"\b(total|overall|how much|what (?:was|is|were)|sum)\b", q):
+                scores["revenue_total"] = 0.85
+            else:
+                scores["revenue_total"] = 0.7
+
+    if not scores:
+        return None, 0.0
+
+    intent, confidence = max(scores.items(), key=lambda item: item[1])
+
+    # Several competing shapes, or wording we cannot express, means ambiguity
+    if len(scores) > 1:
+        confidence -= 0.2
+    if has_unsupported_wording(q):
+        confidence -= 0.5
+
+    return intent, max(confidence, 0.0)
+
+
+def _period_filter(slots: Dict[str, Any], params: Dict[str, Any]) -> str:
+    period = slots.get("period")
+    if not period:
+        return ""
+    if period["kind"] == "relative":
+        # Relative to the latest order on record, not today: the dataset is historical
+        params["period"] = f"{period['count']} {period['unit']}s"
+        return "\n  AND o.order_date >= (SELECT MAX(order_date) FROM orders) - CAST(:period AS INTERVAL)"
+    params["start_date"] = period["start"]
+    params["end_date"] = period["end"]
+    return "\n  AND o.order_date >= :start_date AND o.order_date < :end_date"
+
+
+def _country_filter(slots: Dict[str, Any], params: Dict[str, Any]) -> str:
+    if "country" not in slots:
+        return ""
+    params["country"] = slots["country"]
+    return "\n  AND c.country = :country"
+
+
+def _customer_filter(slots: Dict[str, Any], params: Dict[str, Any]) -> str:
+    # customer_id is loaded from a float column, so both '17850' and '17850.0' occur
+    params["customer_id"] = slots["customer_id"]
+    params["customer_id_alt"] = f"{slots['customer_id']}.0"
+    return "o.customer_id IN (:customer_id, :customer_id_alt)"
+
+
+def build_sql(intent: str, slots: Dict[str, Any], question: str = "") -> Tuple[str, Dict[str, Any]]:
+    """
+    Build bound-parameter SQL for an intent.
+
+    Returns:
+        (sql, params)
+    """
+    params: Dict[str, Any] = {}
+    q = question.lower()
+
+    if intent == "revenue_total":
+        country_join = "\nJOIN customers c ON o.customer_id = c.customer_id" if "country" in slots else ""
+        sql = f"""SELECT SUM(oi.quantity * oi.unit_price) AS total_revenue,
+       COUNT(DISTINCT o.order_id) AS order_count,
+       COUNT(DISTINCT o.customer_id) AS customer_count
+FROM orders o
+JOIN order_items oi ON o.order_id = oi.order_id{country_join}
+WHERE o.status = 'completed'{_country_filter(slots, params)}{_period_filter(slots, params)}"""
+
+    elif intent == "revenue_by_country" and "grain" in slots:
+        grain = slots["grain"]
+        params["limit"] = MAX_ROWS_DEFAULT
+        sql = f"""SELECT c.country,
+       DATE_TRUNC('{grain}', o.order_date) AS {grain},
+       COUNT(DISTINCT o.order_id) AS order_count,
+       SUM(oi.quantity * oi.unit_price) AS {GRAIN_ADJECTIVES[grain]}_revenue
+FROM customers c
+JOIN orders o ON c.customer_id = o.customer_id
+JOIN order_items oi ON o.order_id = oi.order_id
+WHERE o.status = 'completed'{_period_filter(slots, params)}
+GROUP BY c.country, DATE_TRUNC('{grain}', o.order_date)
+ORDER BY {grain} DESC, {GRAIN_ADJECTIVES[grain]}_revenue DESC
+LIMIT :limit"""
+
+    elif intent == "revenue_by_country":
+        params["limit"] = slots.get("top_n", MAX_ROWS_DEFAULT)
+        sql = f"""SELECT c.country,
+       COUNT(DISTINCT o.order_id) AS order_count,
+       SUM(oi.quantity * oi.unit_price) AS total_revenue
+FROM customers c
+JOIN orders o ON c.customer_id = o.customer_id
+JOIN order_items oi ON o.order_id = oi.order_id
+WHERE o.status = 'completed'{_period_filter(slots, params)}
+GROUP BY c.country
+ORDER BY total_revenue DESC
+LIMIT :limit"""
+
+    elif intent == "revenue_time_series":
+        grain = slots.get("grain", "month")
+        country_join = "\nJOIN customers c ON o.customer_id = c.customer_id" if "country" in slots else ""
+        params["limit"] = MAX_ROWS_DEFAULT
+        # grain comes from the GRAINS whitelist, never from user text
+        sql = f"""SELECT DATE_TRUNC('{grain}', o.order_date) AS {grain},
+       COUNT(DISTINCT o.order_id) AS order_count,
+       SUM(oi.quantity * oi.unit_price) AS revenue
+FROM orders o
+JOIN order_items oi ON o.order_id = oi.order_id{country_join}
+WHERE o.status = 'completed'{_country_filter(slots, params)}{_period_filter(slots, params)}
+GROUP BY DATE_TRUNC('{grain}', o.order_date)
+ORDER BY {grain}
+LIMIT :limit"""
+
+    elif intent == "top_products":
+        params["limit"] = slots.get("top_n", DEFAULT_TOP_N)
+        order_col = "total_quantity_sold" if re.search(r"\b(quantity|units|volume|sold most|most sold)\b", q) else "total_revenue"
+        country_join = "\nJOIN customers c ON o.customer_id = c.customer_id" if "country" in slots else ""
+        sql = f"""SELECT p.product_id,
+       p.name,
+       p.category,
+       SUM(oi.quantity) AS total_quantity_sold,
+       SUM(oi.quantity * oi.unit_price) AS total_revenue
+FROM products p
+JOIN order_items oi ON p.product_id = oi.product_id
+JOIN orders o ON oi.order_id = o.order_id{country_join}
+WHERE o.status = 'completed'{_country_filter(slots, params)}{_period_filter(slots, params)}
+GROUP BY p.product_id, p.name, p.category
+ORDER BY {order_col} DESC
+LIMIT :limit"""
+
+    elif intent == "top_customers":
+        params["limit"] = slots.get("top_n", DEFAULT_TOP_N)
+        by_orders = re.search(r"\b(number of orders|most orders|order count|orders placed|most frequent(ly)?)\b", q)
+        order_by = "total_orders DESC, lifetime_value DESC" if by_orders else "lifetime_value DESC"
+        sql = f"""SELECT c.customer_id,
+       c.name,
+       c.country,
+       COUNT(DISTINCT o.order_id) AS total_orders,
+       SUM(o.total_amount) AS lifetime_value,
+       MIN(o.order_date) AS first_order_date,
+       MAX(o.order_date) AS last_order_date
+FROM customers c
+JOIN orders o ON c.customer_id = o.customer_id
+WHERE o.status = 'completed'{_country_filter(slots, params)}{_period_filter(slots, params)}
+GROUP BY c.customer_id, c.name, c.country
+ORDER BY {order_by}
+LIMIT :limit"""
+
+    elif intent == "customers_by_country":
+        params["limit"] = slots.get("top_n", MAX_ROWS_DEFAULT)
+        if "period" in slots:
+            # Customers who bought in the period, not everyone on record
+            sql = f"""SELECT c.country,
+       COUNT(DISTINCT c.customer_id) AS customer_count
+FROM customers c
+JOIN orders o ON c.customer_id = o.customer_id
+WHERE o.status = 'completed'{_country_filter(slots, params)}{_period_filter(slots, params)}
+GROUP BY c.country
+ORDER BY customer_count DESC
+LIMIT :limit"""
+        else:
+            country_where = "\nWHERE c.country = :country" if "country" in slots else ""
+            if "country" in slots:
+                params["country"] = slots["country"]
+            sql = f"""SELECT c.country,
+       COUNT(*) AS customer_count
+FROM customers c{country_where}
+GROUP BY c.country
+ORDER BY customer_count DESC
+LIMIT :limit"""
+
+    elif intent == "customer_orders":
+        params["limit"] = slots.get("top_n", MAX_ROWS_DEFAULT)
+        sql = f"""SELECT c.customer_id,
+       c.name,
+       o.order_id,
+       o.order_date,
+       o.total_amount
+FROM customers c
+JOIN orders o ON c.customer_id = o.customer_id
+WHERE {_customer_filter(slots, params)}{_period_filter(slots, params)}
+ORDER BY o.order_date DESC
+LIMIT :limit"""
+
+    elif intent == "customer_products":
+        params["limit"] = slots.get("top_n", MAX_ROWS_DEFAULT)
+        sql = f"""SELECT p.product_id,
+       p.name,
+       SUM(oi.quantity) AS total_quantity,
+       SUM(oi.quantity * oi.unit_price) AS total_spent,
+       COUNT(DISTINCT o.order_id) AS order_count
+FROM orders o
+JOIN order_items oi ON o.order_id = oi.order_id
+JOIN products p ON oi.product_id = p.product_id
+WHERE {_customer_filter(slots, params)}{_period_filter(slots, params)}
+GROUP BY p.product_id, p.name
+ORDER BY total_quantity DESC
+LIMIT :limit"""
+
+    else:
+        raise ValueError(f"Unknown fast-path intent: {intent}")
+
+    return sql, params
+
+
+def compile_fast_path(question: str) -> Optional[Dict[str, Any]]:
+    """
+    Match a question to an intent and compile it, regardless of confidence.
+
+    Returns:
+        {"intent", "confidence", "slots", "sql", "params"} or None if no intent applies
+    """
+    slots = extract_slots(question)
+    intent, confidence = match_intent(question, slots)
+    if not intent:
+        return None
+
+    sql, params = build_sql(intent, slots, question)
+    return {
+        "intent": intent,
+        "confidence": confidence,
+        "slots": slots,
+        "sql": sql,
+        "params": params,
+    }
+
+
+def try_fast_path(question: str) -> Optional[Dict[str, Any]]:
+    """Return a compiled fast-path match only if it is confident enough to skip the LLM."""
+    if not FAST_PATH_ENABLED:
+        return None
+    match = compile_fast_path(question)
+    if match and match["confidence"] >= FAST_PATH_MIN_CONFIDENCE:
+        return match
+    return None
+
+
+def render_inline(sql: str, params: Dict[str, Any]) -> str:
+    """
+    Substitute bound parameters as SQL literals.
+    Used where only a SQL string can be returned (the local fallback of generate_sql).
+    """
+    def literal(match):
+        value = params[match.group(1)]
+        if isinstance(value, bool):
+            return "TRUE" if value else "FALSE"
+        if isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, date):
+            return f"'{value.isoformat()}'"
+        return "'" + str(value).replace("'", "''") + "'"
+
+    return re.sub(r"(?<!:):(\w+)\b", lambda m: literal(m) if m.group(1) in params else m.group(0), sql)
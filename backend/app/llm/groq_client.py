@@ -4,10 +4,18 @@ Groq Cloud API client (correct implementation for your API key)
 """
 
 import os
+import sys
+import time
 import httpx
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.llm.cassette import get_cassette
+from app.utils.metrics import observe_llm_call
+from app.utils.tracing import start_span
+
 load_dotenv()
 
 # CORRECT GROQ API SETTINGS
@@ -49,33 +57,65 @@ async def call_groq_chat(
     
     timeout = httpx.Timeout(60.0, connect=10.0)
     
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        try:
-            response = await client.post(GROQ_API_URL, json=payload, headers=HEADERS)
-            
-            if response.status_code == 200:
-                data = response.json()
-                # Extract response from OpenAI-compatible format
-                if "choices" in data and len(data["choices"]) > 0:
-                    return data["choices"][0]["message"]["content"].strip()
-                else:
-                    return str(data)
+    with start_span("llm.chat", **{"gen_ai.system": "groq", "gen_ai.request.model": model_name,
+                                   "gen_ai.request.max_tokens": max_tokens}) as span:
+        cassette = get_cassette()
+        params = {"max_tokens": max_tokens, "temperature": temperature, "stop": stop}
+        if cassette is not None and cassette.replaying:
+            entry = await cassette.replay("groq", model_name, messages, params)
+            span.set_attribute("llm.cassette", "replay")
+            span.set_attribute("gen_ai.usage.input_tokens", entry["usage"].get("input_tokens"))
+            span.set_attribute("gen_ai.usage.output_tokens", entry["usage"].get("output_tokens"))
+            return entry["content"]
+
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            observed = False
+            try:
+                start = time.perf_counter()
+                response = await client.post(GROQ_API_URL, json=payload, headers=HEADERS)
+                latency = time.perf_counter() - start
+                usage = {}
+                if response.status_code == 200:
+                    data = response.json()
+                    usage = data.get("usage") or {}
+                span.set_attribute("http.response.status_code", response.status_code)
+                span.set_attribute("gen_ai.usage.input_tokens", usage.get("prompt_tokens"))
+                span.set_attribute("gen_ai.usage.output_tokens", usage.get("completion_tokens"))
+                observe_llm_call("groq", model_name, latency, str(response.status_code),
+                                 usage.get("prompt_tokens"), usage.get("completion_tokens"))
+                observed = True
+
+                if response.status_code == 200:
+                    # Extract response from OpenAI-compatible format
+                    if "choices" in data and len(data["choices"]) > 0:
+                        content = data["choices"][0]["message"]["content"].strip()
+                    else:
+                        content = str(data)
+                    if cassette is not None and cassette.recording:
+                        cassette.record("groq", model_name, messages, params, content, latency * 1000,
+                                        {"input_tokens": usage.get("prompt_tokens"),
+                                         "output_tokens": usage.get("completion_tokens")})
+                    return content
                     
-            elif response.status_code == 401:
-                error_msg = "Invalid Groq API key. Check your .env file."
-            elif response.status_code == 429:
-                error_msg = "Groq rate limit exceeded. Free tier has limits."
-            elif response.status_code == 404:
-                error_msg = f"Model '{model_name}' not found. Available models: llama-3.1-8b-instant, llama-3.2-3b-text, mixtral-8x7b-32768"
-            else:
-                error_msg = f"Groq API error {response.status_code}: {response.text[:200]}"
+                elif response.status_code == 401:
+                    error_msg = "Invalid Groq API key. Check your .env file."
+                elif response.status_code == 429:
+                    error_msg = "Groq rate limit exceeded. Free tier has limits."
+                elif response.status_code == 404:
+                    error_msg = f"Model '{model_name}' not found. Available models: llama-3.1-8b-instant, llama-3.2-3b-text, mixtral-8x7b-32768"
+                else:
+                    error_msg = f"Groq API error {response.status_code}: {response.text[:200]}"
                 
-            raise RuntimeError(error_msg)
+                raise RuntimeError(error_msg)
             
-        except httpx.ConnectError:
-            raise RuntimeError("Cannot connect to Groq API. Check internet connection.")
-        except Exception as e:
-            raise RuntimeError(f"Groq API request failed: {e}")
+            except httpx.ConnectError:
+                observe_llm_call("groq", model_name, time.perf_counter() - start, "connect_error")
+                raise RuntimeError("Cannot connect to Groq API. Check internet connection.")
+            except Exception as e:
+                if not observed:
+                    status = "timeout" if isinstance(e, httpx.TimeoutException) else "error"
+                    observe_llm_call("groq", model_name, time.perf_counter() - start, status)
+                raise RuntimeError(f"Groq API request failed: {e}")
 
 async def test_groq():
     """Test connection to Groq API"""
@@ -0,0 +1,378 @@
+# backend/app/llm/intent_router.py
+"""
+Learned intent router: decides per request whether a question can be served
+by the fast-path templates or needs the LLM, and which answer prompt fits.
+
+A multinomial naive Bayes model over hashed word uni/bigrams, trained from
+seed examples plus reviewed (question, label) records. A template is only
+used when the keyword rules in fast_path pick the same intent. CPU-only, no extra dependencies; one
+prediction per request replaces the repeated keyword scans in
+sql_generator and answer_formatter.
+"""
+
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+import json
+import math
+import os
+import re
+import sys
+import zlib
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.llm.fast_path import (
+    COUNTRY_PATTERN, FAST_PATH_ENABLED, FAST_PATH_MIN_CONFIDENCE, extract_slots, match_intent, build_sql, has_unsupported_wording
+)
+
+ROUTER_ENABLED = os.getenv("ENABLE_INTENT_ROUTER", "true").lower() == "true"
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.8"))
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "")
+INTENT_TRAINING_LOG = os.getenv("INTENT_TRAINING_LOG", "")
+N_FEATURES = 2 ** 18
+ALPHA = 0.1
+
+# What each intent means downstream: answer prompt, JOIN expectation, template availability
+INTENT_PROFILES = {
+    "revenue_total": {"query_type": "aggregate", "requires_joins": True, "fast_path": True},
+    "revenue_by_country": {"query_type": "customer_revenue", "requires_joins": True, "fast_path": True},
+    "revenue_time_series": {"query_type": "time_series", "requires_joins": True, "fast_path": True},
+    "top_products": {"query_type": "product_sales", "requires_joins": True, "fast_path": True},
+    "top_customers": {"query_type": "customer_revenue", "requires_joins": True, "fast_path": True},
+    "customers_by_country": {"query_type": "customer_list", "requires_joins": False, "fast_path": True},
+    "customer_orders": {"query_type": "customer_orders", "requires_joins": True, "fast_path": True},
+    "customer_products": {"query_type": "customer_product_relationship", "requires_joins": True, "fast_path": True},
+    "product_catalog": {"query_type": "product_list", "requires_joins": False, "fast_path": False},
+    "customer_directory": {"query_type": "customer_list", "requires_joins": False, "fast_path": False},
+    "order_details": {"query_type": "order_details", "requires_joins": True, "fast_path": False},
+    "relationship": {"query_type": "customer_product_relationship", "requires_joins": True, "fast_path": False},
+    "other": {"query_type": "general", "requires_joins": False, "fast_path": False},
+}
+
+# Slots an intent cannot be compiled without
+REQUIRED_SLOTS = {
+    "customer_orders": ["customer_id"],
+    "customer_products": ["customer_id"],
+}
+
+SEED_EXAMPLES = [
+    ("What is the total revenue?", "revenue_total"),
+    ("How much revenue did we make in 2011?", "revenue_total"),
+    ("Total sales last 3 months", "revenue_total"),
+    ("What was our overall income in December 2010?", "revenue_total"),
+    ("How much did we sell in Germany last month?", "revenue_total"),
+    ("Total revenue from France", "revenue_total"),
+    ("What were total sales last year?", "revenue_total"),
+    ("Sum of revenue for the past 6 months", "revenue_total"),
+    ("How much money did we make?", "revenue_total"),
+    ("Overall sales figure for Spain", "revenue_total"),
+    ("Give me the total turnover", "revenue_total"),
+    ("Revenue by country", "revenue_by_country"),
+    ("Show sales per country", "revenue_by_country"),
+    ("Which countries generate the most revenue?", "revenue_by_country"),
+    ("Top 5 countries by sales", "revenue_by_country"),
+    ("Calculate monthly revenue by country", "revenue_by_country"),
+    ("Revenue for each country in 2011", "revenue_by_country"),
+    ("Break down income across countries", "revenue_by_country"),
+    ("Sales split by country last year", "revenue_by_country"),
+    ("Which country brings in the most money?", "revenue_by_country"),
+    ("Revenue per country for the last 6 months", "revenue_by_country"),
+    ("Monthly revenue", "revenue_time_series"),
+    ("Show the revenue trend over time", "revenue_time_series"),
+    ("Sales by month in 2011", "revenue_time_series"),
+    ("Weekly sales for the last 3 months", "revenue_time_series"),
+    ("Daily revenue last month", "revenue_time_series"),
+    ("Quarterly revenue trend", "revenue_time_series"),
+    ("How did sales change month over month?", "revenue_time_series"),
+    ("Monthly revenue trend in the UK", "revenue_time_series"),
+    ("Plot revenue per week", "revenue_time_series"),
+    ("Revenue each month for the past year", "revenue_time_series"),
+    ("Show yearly sales", "revenue_time_series"),
+    ("Top 10 products by revenue", "top_products"),
+    ("What are the best selling products?", "top_products"),
+    ("Show top 5 products by sales quantity", "top_products"),
+    ("Most popular items last month", "top_products"),
+    ("Which products sold the most units in Germany?", "top_products"),
+    ("Bestsellers in 2011", "top_products"),
+    ("Highest revenue products", "top_products"),
+    ("Top 3 items sold in France", "top_products"),
+    ("Which products make the most money?", "top_products"),
+    ("Ten most popular products", "top_products"),
+    ("Top 10 customers by spending", "top_customers"),
+    ("Who are our biggest customers?", "top_customers"),
+    ("Most valuable customers in France", "top_customers"),
+    ("Show the top 5 customers by lifetime value", "top_customers"),
+    ("Which customers spent the most last year?", "top_customers"),
+    ("Best customers by total order amount", "top_customers"),
+    ("Top 20 clients", "top_customers"),
+    ("Who spends the most?", "top_customers"),
+    ("Highest value buyers in Germany", "top_customers"),
+    ("How many customers per country?", "customers_by_country"),
+    ("Customer count by country", "customers_by_country"),
+    ("Number of customers in each country", "customers_by_country"),
+    ("Which country has the most customers?", "customers_by_country"),
+    ("Show customers by country", "customers_by_country"),
+    ("Count customers in every country", "customers_by_country"),
+    ("Distribution of customers across countries", "customers_by_country"),
+    ("How many customers in France in 2011?", "customers_by_country"),
+    ("Number of customers in Germany", "customers_by_country"),
+    ("Show me customer 17850 order history", "customer_orders"),
+    ("List orders for customer 12583", "customer_orders"),
+    ("When did customer 13047 place orders?", "customer_orders"),
+    ("How much has customer 17850 spent?", "customer_orders"),
+    ("Order history of customer id 15100", "customer_orders"),
+    ("Show invoices of customer 14646", "customer_orders"),
+    ("Recent orders placed by customer 12748", "customer_orders"),
+    ("What products did customer 17850 buy?", "customer_products"),
+    ("Which items has customer 12583 purchased?", "customer_products"),
+    ("Products bought by customer 13047", "customer_products"),
+    ("What did customer 15100 buy most?", "customer_products"),
+    ("Items purchased by customer 14646 in 2011", "customer_products"),
+    ("Show the products customer 12748 ordered", "customer_products"),
+    ("List all products", "product_catalog"),
+    ("Show the product catalog with prices", "product_catalog"),
+    ("What products cost more than 10?", "product_catalog"),
+    ("Products in the General category", "product_catalog"),
+    ("Which supplier provides the most products?", "product_catalog"),
+    ("What is the price of product 85123A?", "product_catalog"),
+    ("Find products with HEART in the name", "product_catalog"),
+    ("List all customers", "customer_directory"),
+    ("Show customer emails", "customer_directory"),
+    ("Customers who registered recently", "customer_directory"),
+    ("Show me customers from Germany", "customer_directory"),
+    ("Give me the names of customers in Spain", "customer_directory"),
+    ("Find the email of customer Customer_12346", "customer_directory"),
+    ("Show order 536365 details", "order_details"),
+    ("What items are in order 536365?", "order_details"),
+    ("List line items with product names", "order_details"),
+    ("Show orders with their items and quantities", "order_details"),
+    ("Line items for the latest orders", "order_details"),
+    ("Break down order 536370 by product", "order_details"),
+    ("Show me customers and their total order amounts", "relationship"),
+    ("Which customers bought WHITE HANGING HEART T-LIGHT HOLDER?", "relationship"),
+    ("Who bought products from the General category?", "relationship"),
+    ("List all orders with customer names and countries", "relationship"),
+    ("Customers who purchased more than 10 different products", "relationship"),
+    ("Which products do German customers buy together?", "relationship"),
+    ("Show each customer with the products they ordered", "relationship"),
+    ("Compare revenue of UK vs France", "other"),
+    ("Why did sales drop in February?", "other"),
+    ("What is the average basket size?", "other"),
+    ("What percentage of orders were returned?", "other"),
+    ("How many tables are in the database?", "other"),
+    ("Customers who never ordered", "other"),
+    ("What is the ratio of repeat customers?", "other"),
+    ("What is the average order value?", "other"),
+    ("How many orders were cancelled?", "other"),
+    ("Predict next month sales", "other"),
+]
+
+
+# Collapse synonyms so a handful of examples per intent generalise
+_SYNONYMS = [
+    (re.compile(r"\b(revenue|sales|income|turnover|earnings|sell|sold|spending|spent|spend)\b"), " _money_ "),
+    (re.compile(r"\b(products?|items?|stock|bestsellers?)\b"), " product "),
+    (re.compile(r"\b(customers?|clients?|buyers?)\b"), " customer "),
+    (re.compile(r"\b(countries|country)\b"), " country "),
+    (re.compile(r"\b(daily|weekly|monthly|quarterly|yearly|annual|trend|month|week|day|quarter|year|time)\b"), " _grain_ "),
+    (re.compile(r"\b(top|best|biggest|largest|highest|most|popular|valuable)\b"), " _rank_ "),
+    (re.compile(r"\b(bought|buy|purchased|purchase)\b"), " bought "),
+    (re.compile(r"\b(orders?|invoices?|history)\b"), " order "),
+]
+
+_STOPWORDS = set(
+    "the a an of in on for to me show what is are was were our we did do does by per "
+    "list all give tell please which who with and from how has have".split()
+)
+
+
+def featurize(question: str) -> List[int]:
+    """Hashed word unigrams and bigrams, with numbers, years, countries and synonyms normalised."""
+    q = COUNTRY_PATTERN.sub(" _country_ ", question.lower())
+    q = re.sub(r"\b20\d{2}\b", " _year_ ", q)
+    q = re.sub(r"\b\d{4,6}\b", " _id_ ", q)
+    q = re.sub(r"\b\d{1,3}\b", " _num_ ", q)
+    for pattern, replacement in _SYNONYMS:
+        q = pattern.sub(replacement, q)
+
+    words = [w for w in re.findall(r"[a-z_]+", q) if w not in _STOPWORDS]
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return [zlib.crc32(g.encode("utf-8")) % N_FEATURES for g in grams]
+
+
+class IntentRouter:
+    """Multinomial naive Bayes over hashed n-gram features."""
+
+    def __init__(self):
+        self.class_counts: Dict[str, int] = {}
+        self.feature_counts: Dict[str, Dict[int, int]] = {}
+        self.feature_totals: Dict[str, int] = {}
+        self.vocab_size = 1
+        self._log_priors: Dict[str, float] = {}
+        self._log_unseen: Dict[str, float] = {}
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "IntentRouter":
+        self.class_counts, self.feature_counts, self.feature_totals = {}, {}, {}
+        vocab = set()
+        for question, intent in examples:
+            self.class_counts[intent] = self.class_counts.get(intent, 0) + 1
+            counts = self.feature_counts.setdefault(intent, {})
+            for f in featurize(question):
+                counts[f] = counts.get(f, 0) + 1
+                self.feature_totals[intent] = self.feature_totals.get(intent, 0) + 1
+                vocab.add(f)
+        self.vocab_size = max(len(vocab), 1)
+        self._prepare()
+        return self
+
+    def _prepare(self):
+        total = sum(self.class_counts.values())
+        self._log_priors = {c: math.log(n / total) for c, n in self.class_counts.items()}
+        self._log_unseen = {
+            c: math.log(ALPHA / (self.feature_totals.get(c, 0) + ALPHA * self.vocab_size))
+            for c in self.class_counts
+        }
+
+    def predict(self, question: str) -> Tuple[str, float]:
+        """Return (intent, posterior probability of that intent)."""
+        if not self.class_counts:
+            return "other", 0.0
+
+        features = featurize(question)
+        scores = {}
+        for c, prior in self._log_priors.items():
+            counts = self.feature_counts[c]
+            denom = self.feature_totals.get(c, 0) + ALPHA * self.vocab_size
+            score = prior
+            for f in features:
+                n = counts.get(f)
+                score += math.log((n + ALPHA) / denom) if n else self._log_unseen[c]
+            scores[c] = score
+
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        norm = sum(math.exp(s - top) for s in scores.values())
+        return best, 1.0 / norm
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "class_counts": self.class_counts,
+            "feature_counts": {c: {str(f): n for f, n in fc.items()} for c, fc in self.feature_counts.items()},
+            "feature_totals": self.feature_totals,
+            "vocab_size": self.vocab_size,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IntentRouter":
+        router = cls()
+        router.class_counts = data["class_counts"]
+        router.feature_counts = {c: {int(f): n for f, n in fc.items()} for c, fc in data["feature_counts"].items()}
+        router.feature_totals = data["feature_totals"]
+        router.vocab_size = data["vocab_size"]
+        router._prepare()
+        return router
+
+
+def load_training_log(path: str) -> List[Tuple[str, str]]:
+    """
+    Read reviewed questions from a JSONL file ({"question": ..., "label": ...} per line).
+
+    Only "label" is used: the "intent" recorded with each request is the router's
+    own prediction, and training on it would reinforce its mistakes.
+    """
+    examples = []
+    if not path or not os.path.exists(path):
+        return examples
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("question") and record.get("label") in INTENT_PROFILES:
+                examples.append((record["question"], record["label"]))
+    return examples
+
+
+def train_router(log_path: Optional[str] = None) -> IntentRouter:
+    """Train on the seed examples plus any reviewed questions from the training log."""
+    examples = list(SEED_EXAMPLES) + load_training_log(log_path or INTENT_TRAINING_LOG)
+    return IntentRouter().fit(examples)
+
+
+_router: Optional[IntentRouter] = None
+
+
+def get_router() -> IntentRouter:
+    """Load the persisted model if configured, otherwise train from seeds on first use."""
+    global _router
+    if _router is None:
+        if INTENT_MODEL_PATH and os.path.exists(INTENT_MODEL_PATH):
+            with open(INTENT_MODEL_PATH, encoding="utf-8") as f:
+                _router = IntentRouter.from_dict(json.load(f))
+        else:
+            _router = train_router()
+    return _router
+
+
+def route_question(question: str) -> Dict[str, Any]:
+    """
+    Predict the intent once and decide how the request is served.
+
+    Returns:
+        {"intent", "confidence", "route": "fast_path"|"llm", "query_type",
+         "requires_joins", "fast_path": compiled template or None}
+    """
+    intent, confidence = get_router().predict(question)
+    profile = INTENT_PROFILES.get(intent, INTENT_PROFILES["other"])
+    decision = {
+        "intent": intent,
+        "confidence": confidence,
+        "route": "llm",
+        "query_type": profile["query_type"],
+        "requires_joins": profile["requires_joins"],
+        "fast_path": None,
+    }
+
+    if not (FAST_PATH_ENABLED and profile["fast_path"] and confidence >= ROUTER_MIN_CONFIDENCE):
+        return decision
+    if has_unsupported_wording(question):
+        return decision
+
+    slots = extract_slots(question)
+    if any(slot not in slots for slot in REQUIRED_SLOTS.get(intent, [])):
+        return decision
+
+    # The templates only understand what the rule patterns extract (measure, direction, slots):
+    # the rules must independently pick the same intent, confidently, before the LLM is skipped
+    rule_intent, rule_confidence = match_intent(question, slots)
+    if rule_intent != intent or rule_confidence < FAST_PATH_MIN_CONFIDENCE:
+        return decision
+
+    sql, params = build_sql(intent, slots, question)
+    if intent == "revenue_by_country" and "grain" in slots:
+        decision["query_type"] = "time_series"
+    decision["route"] = "fast_path"
+    decision["fast_path"] = {
+        "intent": intent,
+        "confidence": confidence,
+        "slots": slots,
+        "sql": sql,
+        "params": params,
+    }
+    return decision
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the intent router from seeds and reviewed questions")
+    parser.add_argument("--log", default=INTENT_TRAINING_LOG, help="JSONL file with question/label records")
+    parser.add_argument("--out", default=INTENT_MODEL_PATH or "intent_model.json", help="Where to write the model")
+    args = parser.parse_args()
+
+    model = train_router(args.log)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(model.to_dict(), f)
+    print(f"✅ Trained on {sum(model.class_counts.values())} examples, "
+          f"{len(model.class_counts)} intents → {args.out}")
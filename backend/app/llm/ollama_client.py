@@ -4,12 +4,21 @@ Ollama client for local LLM inference.
 No API keys, no rate limits.
 """
 
+import asyncio
 import os
+import sys
+import time
 import aiohttp
 import json
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.llm.cassette import get_cassette
+from app.utils.metrics import observe_llm_call
+from app.utils.tracing import start_span
+
 load_dotenv()
 
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:3b")
@@ -52,19 +61,50 @@ async def call_ollama_chat(
     
     timeout = aiohttp.ClientTimeout(total=120)  # 2 minute timeout
     
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        try:
-            async with session.post(url, json=payload) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data.get("message", {}).get("content", "").strip()
-                else:
-                    error_text = await response.text()
-                    raise RuntimeError(f"Ollama API error {response.status}: {error_text}")
-        except aiohttp.ClientConnectorError:
-            raise RuntimeError(f"Cannot connect to Ollama at {OLLAMA_BASE_URL}. Is Ollama running?")
-        except Exception as e:
-            raise RuntimeError(f"Ollama request failed: {e}")
+    with start_span("llm.chat", **{"gen_ai.system": "ollama", "gen_ai.request.model": model_name,
+                                   "gen_ai.request.max_tokens": max_tokens}) as span:
+        cassette = get_cassette()
+        params = {"max_tokens": max_tokens, "temperature": temperature, "stop": stop}
+        if cassette is not None and cassette.replaying:
+            entry = await cassette.replay("ollama", model_name, formatted_messages, params)
+            span.set_attribute("llm.cassette", "replay")
+            span.set_attribute("gen_ai.usage.input_tokens", entry["usage"].get("input_tokens"))
+            span.set_attribute("gen_ai.usage.output_tokens", entry["usage"].get("output_tokens"))
+            return entry["content"]
+
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            observed = False
+            try:
+                start = time.perf_counter()
+                async with session.post(url, json=payload) as response:
+                    span.set_attribute("http.response.status_code", response.status)
+                    if response.status == 200:
+                        data = await response.json()
+                        latency = time.perf_counter() - start
+                        span.set_attribute("gen_ai.usage.input_tokens", data.get("prompt_eval_count"))
+                        span.set_attribute("gen_ai.usage.output_tokens", data.get("eval_count"))
+                        observe_llm_call("ollama", model_name, latency, "200",
+                                         data.get("prompt_eval_count"), data.get("eval_count"))
+                        observed = True
+                        content = data.get("message", {}).get("content", "").strip()
+                        if cassette is not None and cassette.recording:
+                            cassette.record("ollama", model_name, formatted_messages, params, content,
+                                            latency * 1000, {"input_tokens": data.get("prompt_eval_count"),
+                                                             "output_tokens": data.get("eval_count")})
+                        return content
+                    else:
+                        observe_llm_call("ollama", model_name, time.perf_counter() - start, str(response.status))
+                        observed = True
+                        error_text = await response.text()
+                        raise RuntimeError(f"Ollama API error {response.status}: {error_text}")
+            except aiohttp.ClientConnectorError:
+                observe_llm_call("ollama", model_name, time.perf_counter() - start, "connect_error")
+                raise RuntimeError(f"Cannot connect to Ollama at {OLLAMA_BASE_URL}. Is Ollama running?")
+            except Exception as e:
+                if not observed:
+                    status = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+                    observe_llm_call("ollama", model_name, time.perf_counter() - start, status)
+                raise RuntimeError(f"Ollama request failed: {e}")
 
 # Simple test function
 async def test_ollama():
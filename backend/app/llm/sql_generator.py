@@ -3,9 +3,10 @@
 Generate SQL queries for multi-table e-commerce database using Groq API.
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from textwrap import dedent
 import os
+import logging
 import re
 import sys
 
@@ -13,13 +14,22 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from app.utils.schema_builder import get_detailed_schema, format_schema_for_prompt
+from app.utils.sql_shape import analyze_sql
 from app.llm.groq_client import call_groq_chat
+from app.llm.fast_path import compile_fast_path, render_inline
 
 MAX_ROWS_DEFAULT = int(os.getenv("MAX_QUERY_ROWS", "1000"))
 USE_LOCAL_FALLBACK = os.getenv("USE_LOCAL_FALLBACK", "false").lower() == "true"
 FORCE_USE_LLM = os.getenv("FORCE_USE_LLM", "false").lower() == "true"
 
-async def generate_sql(user_question: str, schema_summary: Dict[str, Any], max_tokens: int = 1024) -> str:
+logger = logging.getLogger(__name__)
+
+async def generate_sql(
+    user_question: str,
+    schema_summary: Dict[str, Any],
+    max_tokens: int = 1024,
+    route: Optional[Dict[str, Any]] = None
+) -> str:
     """
     Generate SQL query for multi-table e-commerce database using Groq API.
     
@@ -27,13 +37,14 @@ async def generate_sql(user_question: str, schema_summary: Dict[str, Any], max_t
         user_question: Natural language question from user
         schema_summary: Database schema information
         max_tokens: Maximum tokens for LLM response
+        route: Intent router decision for this request (skips keyword detection)
         
     Returns:
         SQL query string
     """
     # Quick bypass for testing
     if USE_LOCAL_FALLBACK:
-        print("[SQL Generator] Using local fallback (bypassed LLM)")
+        logger.info("Using local fallback (bypassed LLM)")
         return generate_local_sql(user_question, schema_summary)
     
     # Get detailed schema with relationships
@@ -41,7 +52,7 @@ async def generate_sql(user_question: str, schema_summary: Dict[str, Any], max_t
         detailed_schema = get_detailed_schema()
         schema_prompt = format_schema_for_prompt(detailed_schema)
     except Exception as e:
-        print(f"[SQL Generator] Error loading schema: {e}")
+        logger.warning("Error loading schema: %s", e)
         return generate_local_sql(user_question, schema_summary)
     
     # Enhanced system prompt for multi-table queries
@@ -254,7 +265,7 @@ async def generate_sql(user_question: str, schema_summary: Dict[str, Any], max_t
     ]
     
     try:
-        print(f"[SQL Generator] Calling Groq API for: {user_question[:50]}...")
+        logger.debug("Calling Groq API for: %s", user_question[:50])
         sql = await call_groq_chat(
             messages=messages,
             max_tokens=max_tokens,
@@ -262,24 +273,24 @@ async def generate_sql(user_question: str, schema_summary: Dict[str, Any], max_t
             stop=["```", "Explanation:", "Here's", "The query"]
         )
         
-        if not sql or "SELECT" not in sql.upper():
-            print("[SQL Generator] Invalid SQL returned, using fallback")
-            return generate_local_sql(user_question, detailed_schema)
-        
         # Clean up the SQL
         sql = clean_sql(sql)
+        if not sql:
+            logger.warning("Invalid SQL returned, using fallback")
+            return generate_local_sql(user_question, detailed_schema)
         
         # Validate it has proper structure for multi-table questions
-        if requires_joins(user_question) and "JOIN" not in sql.upper():
-            print("[SQL Generator] Warning: Complex question but no JOINs in SQL")
+        needs_joins = route["requires_joins"] if route else requires_joins(user_question)
+        if needs_joins and analyze_sql(sql)["joins"] == 0:
+            logger.warning("Complex question but no JOINs in SQL")
             # Try to fix simple cases
             sql = attempt_join_fix(sql, user_question, detailed_schema)
         
-        print(f"[SQL Generator] Generated SQL: {sql[:150]}...")
+        logger.debug("Generated SQL: %s", sql)
         return sql
         
     except Exception as e:
-        print(f"[SQL Generator] Groq API error: {e}. Using local fallback.")
+        logger.warning("Groq API error: %s. Using local fallback.", e)
         return generate_local_sql(user_question, detailed_schema)
 
 def clean_sql(sql: str) -> str:
@@ -294,17 +305,18 @@ def clean_sql(sql: str) -> str:
     # Remove leading/trailing whitespace and semicolons
     sql = sql.strip().rstrip(';')
     
-    # Ensure it starts with SELECT
-    if not re.match(r'^\s*SELECT\b', sql, re.IGNORECASE):
-        # Try to extract SQL from text
+    # Ensure it is a SELECT statement (CTEs included)
+    if analyze_sql(sql)["statement_type"] != "SELECT":
+        # Try to extract SQL from surrounding text
         match = re.search(r'(SELECT\s+.+?(?=LIMIT|\Z))', sql, re.IGNORECASE | re.DOTALL)
         if match:
             sql = match.group(1).strip()
         else:
-            sql = ""
+            return ""
     
-    # Add LIMIT if missing and not an aggregate-only query
-    if "LIMIT" not in sql.upper() and not re.search(r'GROUP\s+BY|COUNT\(|SUM\(|AVG\(', sql, re.IGNORECASE):
+    # Add LIMIT if the outer query has none and is not an aggregate query
+    shape = analyze_sql(sql)
+    if shape["limit"] is None and not shape["group_by"] and not shape["aggregates"]:
         sql = f"{sql} LIMIT {MAX_ROWS_DEFAULT}"
     
     return sql
@@ -365,6 +377,11 @@ def generate_local_sql(user_question: str, schema_summary: Dict[str, Any]) -> st
     Generate SQL based on keywords when LLM fails.
     Enhanced for multi-table queries.
     """
+    # Prefer the fast-path templates: they honour N, dates, countries and IDs
+    match = compile_fast_path(user_question)
+    if match:
+        return render_inline(match["sql"], match["params"])
+
     question = user_question.lower()
     tables = schema_summary.get("tables", {})
     
@@ -1,12 +1,28 @@
 # backend/app/main.py
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from .routes import query as query_router
+from .db.database import engine
+from .utils.query_history import record_request
+from .utils.tracing import start_span
+from .utils.logging_setup import configure_logging, get_log_levels, sample_request, set_log_level
+from .utils.metrics import (CONTENT_TYPE, HTTP_REQUESTS, HTTP_SECONDS, IN_FLIGHT, METRICS_ENABLED,
+                            observe_request_stages, register_pool_metrics, render_metrics)
+import logging
 import os
+import secrets
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+configure_logging()
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+LOG_ADMIN_ENABLED = os.getenv("LOG_ADMIN_ENABLED", "false").lower() == "true"
+LOG_ADMIN_TOKEN = os.getenv("LOG_ADMIN_TOKEN", "")
+
 app = FastAPI(title="Ecom LLM Analytics Backend")
 
 # CORS - allow local frontend during dev
@@ -20,6 +36,111 @@ app.add_middleware(
 
 app.include_router(query_router.router, prefix="/api")
 
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """
+    Root tracing span and request metrics, plus the history record and stage
+    metrics of requests that set request.state.history (see routes/query.py).
+    """
+    if request.url.path == "/metrics":
+        return await call_next(request)
+    start = time.perf_counter()
+    IN_FLIGHT.inc()
+    status, response_bytes, error_class = 500, None, None
+    with start_span(f"{request.method} {request.url.path}", traceparent=request.headers.get("traceparent"),
+                    **{"http.request.method": request.method, "url.path": request.url.path}) as span:
+        sample_request()
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            length = response.headers.get("content-length")
+            response_bytes = int(length) if length else None
+            response.headers["X-Trace-Id"] = span.trace_id
+            history = getattr(request.state, "history", None)
+            if SERVER_TIMING_ENABLED and history is not None:
+                # Stage timings for clients and load tests (standard Server-Timing header)
+                response.headers["Server-Timing"] = ", ".join(
+                    f"{stage};dur={ms:.2f}" for stage, ms in history["timer"].stages.items())
+            return response
+        except Exception as e:
+            error_class = type(e).__name__
+            raise
+        finally:
+            IN_FLIGHT.dec()
+            path = _route_label(request)
+            span.name = f"{request.method} {path}"
+            span.set_attribute("http.route", path)
+            span.set_attribute("http.response.status_code", status)
+            HTTP_REQUESTS.inc(method=request.method, route=path, status=str(status))
+            elapsed = time.perf_counter() - start
+            HTTP_SECONDS.observe(elapsed, method=request.method, route=path)
+            logger.log(logging.WARNING if status >= 500 else logging.INFO, "%s %s %s", request.method, path, status,
+                       extra={"status": status, "duration_ms": round(elapsed * 1000, 2), "error_class": error_class})
+            _record_history(request, status, response_bytes, error_class)
+
+
+def _route_label(request: Request) -> str:
+    """Route template with its router prefix (/api/query/{query_id}/rows), so labels stay bounded."""
+    route = request.scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    # The matched route only knows its path inside the router: take the prefix from the URL
+    parts = request.url.path.split("/")
+    return "/".join(parts[:len(parts) - len(template.split("/")) + 1]) + template
+
+
+def _record_history(request: Request, status: int, response_bytes, error_class=None):
+    history = getattr(request.state, "history", None)
+    if history is None:
+        return
+    timer = history.pop("timer")
+    observe_request_stages(timer.stages, history["cache_hits"], history.get("row_count"))
+    record_request({
+        **history,
+        "status": status,
+        "response_bytes": response_bytes,
+        "error_class": timer.error_class or error_class or (f"HTTP{status}" if status >= 400 else None),
+        "error_stage": timer.error_stage,
+        "total_ms": timer.elapsed_ms(),
+        "stages": timer.stages,
+        "trace_id": history.get("trace_id"),
+    })
+
+
+if METRICS_ENABLED:
+    register_pool_metrics(engine.pool)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus scrape endpoint."""
+        return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
+def require_admin_token(x_admin_token: str = Header("")):
+    """CORS lets any origin call the API, so admin endpoints need LOG_ADMIN_TOKEN in X-Admin-Token."""
+    if not LOG_ADMIN_TOKEN or not secrets.compare_digest(x_admin_token, LOG_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid or missing admin token")
+
+
+if LOG_ADMIN_ENABLED:
+    if not LOG_ADMIN_TOKEN:
+        logger.warning("LOG_ADMIN_ENABLED is set without LOG_ADMIN_TOKEN; /admin/log-level rejects every request")
+
+    @app.get("/admin/log-level", include_in_schema=False, dependencies=[Depends(require_admin_token)])
+    async def log_levels():
+        return get_log_levels()
+
+    @app.put("/admin/log-level", include_in_schema=False, dependencies=[Depends(require_admin_token)])
+    async def change_log_level(level: str, logger_name: str = "app"):
+        """Change a logger's level at runtime, e.g. ?level=DEBUG&logger_name=app.llm"""
+        try:
+            return set_log_level(level, logger_name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/")
 async def root():
     return {"status": "ok"}
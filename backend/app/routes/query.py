@@ -1,84 +1,269 @@
 # backend/app/routes/query.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator
+import itertools
+import logging
 import os
 import time
 
 from ..utils.schema_loader import get_schema_summary
-from ..utils.sanitizer import is_safe_select, wrap_with_limit
+from ..utils.sanitizer import is_safe_select, strip_row_cap, wrap_with_limit
+from ..utils.timing import StageTimer
+from ..utils.tracing import current_span, current_trace_id, start_span
+from ..utils.sql_shape import fingerprint_sql
+from ..utils.pagination import PAGE_SIZE, InvalidCursor, get_query, next_cursor, page_query, store_query
 from ..db.database import SessionLocal
+from ..db.export import EXPORT_FORMATS, ExportUnavailable, export_csv, export_parquet
+from ..db.rollups import match_rollup
+from ..db.cost_guard import (APPROX_MAX_ROWS, COST_GUARD_MODE, QueryTooExpensive, apply_approximate_limits,
+                             check_query_cost)
 from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 
 from ..llm.sql_generator import generate_sql
+from ..llm.fast_path import try_fast_path
+from ..llm.intent_router import ROUTER_ENABLED, route_question
 from ..llm.answer_formatter import format_answer
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 class QueryRequest(BaseModel):
     userQuery: str
     includeSchema: bool = True
     maxRows: Optional[int] = None
 
+class ExportRequest(BaseModel):
+    sql: str
+    format: str = "csv"
+
 @router.post("/query")
-async def run_query(req: QueryRequest):
+async def run_query(req: QueryRequest, request: Request):
     if not req.userQuery or not req.userQuery.strip():
         raise HTTPException(status_code=400, detail="Empty userQuery")
 
-    # 1. load schema optionally
-    schema = get_schema_summary() if req.includeSchema else {"schema": {}, "samples": {}}
+    # Per-stage timings; the history middleware (main.py) writes the record after the response
+    timer = StageTimer()
+    trace_id = current_trace_id()
+    history: Dict[str, Any] = {"question": req.userQuery, "timer": timer, "cache_hits": {}, "trace_id": trace_id}
+    request.state.history = history
 
-    # 2. generate SQL via LLM (Grok)
-    try:
-        sql = await generate_sql(req.userQuery, schema)
-
-        print("\n" + "="*80)
-        print("🔍 GENERATED SQL (FULL):")
-        print("="*80)
-        print(sql)
-        print("="*80 + "\n")
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"SQL generation error: {e}")
+    # 1. route once per request: confident template matches skip schema load and LLM
+    sql_params: Dict[str, Any] = {}
+    with timer.stage("routing"):
+        route = route_question(req.userQuery) if ROUTER_ENABLED else None
+        fast = route["fast_path"] if route else try_fast_path(req.userQuery)
+    history["cache_hits"]["fast_path"] = bool(fast)
+    if fast:
+        sql, sql_params, sql_source = fast["sql"], fast["params"], "fast_path"
+        schema = {"schema": {}, "samples": {}}
+        logger.info("Fast path %s (confidence %.2f)", fast["intent"], fast["confidence"])
+    else:
+        sql_source = "llm"
+
+        # 2. load schema optionally
+        with timer.stage("schema"):
+            schema = get_schema_summary() if req.includeSchema else {"schema": {}, "samples": {}}
+
+        # 3. generate SQL via LLM (Grok)
+        try:
+            with timer.stage("sql_generation"):
+                sql = await generate_sql(req.userQuery, schema, route=route)
+        except Exception as e:
+            timer.error_class, timer.error_stage = type(e).__name__, "sql_generation"
+            raise HTTPException(status_code=500, detail=f"SQL generation error: {e}")
+    history.update({"sql": sql, "sql_source": sql_source,
+                    "intent": route["intent"] if route else (fast["intent"] if fast else None)})
+
+    logger.info("Generated SQL", extra={"sql": sql, "sql_source": sql_source})
 
     if not sql:
+        timer.error_class, timer.error_stage = "EmptySQL", "sql_generation"
         raise HTTPException(status_code=500, detail="LLM returned empty SQL")
 
-    # 3. basic safety checks
-    if not is_safe_select(sql):
-        raise HTTPException(status_code=400, detail="Generated SQL did not pass safety checks (non-SELECT or disallowed keywords).")
+    with timer.stage("validation"):
+        # 4. basic safety checks
+        if not is_safe_select(sql):
+            timer.error_class, timer.error_stage = "UnsafeSQL", "validation"
+            raise HTTPException(status_code=400, detail="Generated SQL did not pass safety checks (non-SELECT or disallowed keywords).")
 
-    # 4. enforce max rows
-    try:
-        max_rows = int(req.maxRows) if req.maxRows else int(os.getenv("MAX_QUERY_ROWS", "1000"))
-    except Exception:
-        max_rows = int(os.getenv("MAX_QUERY_ROWS", "1000"))
-    wrapped_sql, params = wrap_with_limit(sql, max_rows)
+        # 5. enforce max rows
+        try:
+            max_rows = int(req.maxRows) if req.maxRows else int(os.getenv("MAX_QUERY_ROWS", "1000"))
+        except Exception:
+            max_rows = int(os.getenv("MAX_QUERY_ROWS", "1000"))
+
+        # 6. serve hot shapes from pre-aggregated rollups when they give the same rows
+        rollup = match_rollup(sql, sql_params, fast)
+        exec_sql, exec_params = (rollup["sql"], rollup["params"]) if rollup else (sql, sql_params)
+
+        wrapped_sql, limit_params = wrap_with_limit(exec_sql, max_rows, exec_params)
+        params = {**exec_params, **limit_params}
+    history["cache_hits"]["rollup"] = bool(rollup)
+    history["rollup"] = rollup["rollup"] if rollup else None
 
-    # 5. execute SQL
+    # 7. execute SQL (after the EXPLAIN cost guard)
     rows = []
+    row_cap = max_rows
     exec_time_ms = None
+    cost_check = {"verdict": "skipped", "plan": None, "reasons": []}
     try:
         with SessionLocal() as session:
-            start = time.time()
-            result = session.execute(text(wrapped_sql), params)
-            fetched = result.fetchall()
-            exec_time_ms = int((time.time() - start) * 1000)
-            rows = [dict(r._mapping) for r in fetched]
+            # "execution" and "fetch" do not overlap, so stage timings add up to the request
+            with timer.stage("execution"):
+                with start_span("db.pool_checkout"):
+                    session.connection()
+                with start_span("db.explain"):
+                    cost_check = check_query_cost(session, wrapped_sql, params)
+                if cost_check["verdict"] == "approximate":
+                    row_cap = min(max_rows, APPROX_MAX_ROWS)
+                    wrapped_sql, limit_params = wrap_with_limit(exec_sql, row_cap, exec_params)
+                    params = {**exec_params, **limit_params}
+                    apply_approximate_limits(session)
+
+                with start_span("db.query", **{"db.system": "postgresql", "db.operation.name": "SELECT",
+                                               "db.query.fingerprint": fingerprint_sql(wrapped_sql),
+                                               "db.cost_guard.verdict": cost_check["verdict"]}):
+                    start = time.perf_counter()
+                    result = session.execute(text(wrapped_sql), params)
+
+            with timer.stage("fetch"):
+                fetched = result.fetchall()
+                exec_time_ms = int((time.perf_counter() - start) * 1000)
+                columns = list(result.keys())
+                rows = [dict(r._mapping) for r in fetched]
+                current_span().set_attribute("db.response.returned_rows", len(rows))
+    except QueryTooExpensive as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), "plan": e.plan})
+    except OperationalError as e:
+        if cost_check["verdict"] == "approximate" and "statement timeout" in str(e):
+            raise HTTPException(status_code=400, detail={
+                "message": "Query exceeded the approximate-mode time limit: " + "; ".join(cost_check["reasons"]),
+                "plan": cost_check["plan"],
+            })
+        raise HTTPException(status_code=500, detail=f"SQL execution error: {e}")
     except Exception as e:
         # include original SQL in error only for debugging in dev (avoid in prod)
         raise HTTPException(status_code=500, detail=f"SQL execution error: {e}")
+    if cost_check["plan"]:
+        history["cache_hits"]["plan"] = cost_check["plan"].get("cached", False)
+    # The query history (written off the request path) is also the index advisor's workload
+    history.update({"sql": wrapped_sql, "params": params, "row_count": len(rows)})
+
+    # 8. keep the validated SQL so further pages need no LLM call; without the
+    # default row cap, so pages and exports can go past the first MAX_QUERY_ROWS
+    stored_sql, stored_params = strip_row_cap(exec_sql, int(os.getenv("MAX_QUERY_ROWS", "1000")), exec_params)
+    query_id = store_query(stored_sql, stored_params, columns)
+    stored = get_query(query_id)
+    pagination = {
+        "mode": "keyset" if stored["keyset"] else "offset",
+        # A full first page may have more rows behind it
+        "next_cursor": next_cursor(stored, rows, 0) if len(rows) >= row_cap else None,
+    }
 
-    # 6. format answer via LLM
+    # 9. format answer via LLM
     try:
-        answer = await format_answer(req.userQuery, sql, rows, schema)
+        with timer.stage("answer"):
+            answer = await format_answer(
+                req.userQuery, sql, rows, schema,
+                query_type=route["query_type"] if route else None
+            )
     except Exception as e:
         # formatting failure should not hide the data; return rows + SQL
         answer = f"(Answer formatting failed: {e})"
 
     return {
+        "query_id": query_id,
         "sql": sql,
         "rows": rows,
         "answer": answer,
-        "meta": {"row_count": len(rows), "execution_time_ms": exec_time_ms}
+        "meta": {"row_count": len(rows), "pagination": pagination, "execution_time_ms": exec_time_ms, "sql_source": sql_source,
+                 "intent": route["intent"] if route else (fast["intent"] if fast else None),
+                 "rollup": rollup["rollup"] if rollup else None,
+                 "approximate": cost_check["verdict"] == "approximate",
+                 "cost_guard": {k: cost_check[k] for k in ("verdict", "reasons")},
+                 "trace_id": trace_id}
+    }
+
+
+@router.get("/query/{query_id}/rows")
+async def query_rows(query_id: str, cursor: Optional[str] = None, page_size: int = PAGE_SIZE):
+    """Next page of a stored query's result (see utils/pagination.py); no LLM involved."""
+    entry = get_query(query_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired query_id")
+    page_size = max(1, min(page_size, int(os.getenv("MAX_QUERY_ROWS", "1000"))))
+    try:
+        page_sql, params, mode, offset = page_query(entry, cursor, page_size)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        with SessionLocal() as session:
+            cost_check = check_query_cost(session, page_sql, params)
+            if cost_check["verdict"] == "approximate":
+                apply_approximate_limits(session)
+            start = time.perf_counter()
+            fetched = session.execute(text(page_sql), params).fetchall()
+            exec_time_ms = int((time.perf_counter() - start) * 1000)
+    except QueryTooExpensive as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), "plan": e.plan})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"SQL execution error: {e}")
+
+    rows = [dict(r._mapping) for r in fetched[:page_size]]
+    return {
+        "query_id": query_id,
+        "rows": rows,
+        "next_cursor": next_cursor(entry, rows, offset) if len(fetched) > page_size else None,
+        "meta": {"row_count": len(rows), "page_size": page_size, "offset": offset, "mode": mode,
+                 "execution_time_ms": exec_time_ms}
     }
+
+
+def _export_response(sql: str, params: Dict[str, Any], fmt: str, name: str) -> StreamingResponse:
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format '{fmt}' (use csv or parquet)")
+    media_type, extension = EXPORT_FORMATS[fmt]
+    # Exports are unbounded, so there is no approximate mode: an over-budget plan is rejected
+    try:
+        with SessionLocal() as session:
+            check_query_cost(session, sql, params, mode="off" if COST_GUARD_MODE == "off" else "reject")
+    except QueryTooExpensive as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), "plan": e.plan})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export error: {e}")
+    try:
+        stream: Iterator[bytes] = export_csv(sql, params) if fmt == "csv" else export_parquet(sql, params)
+        # Pull the first chunk here so SQL errors and timeouts at startup still get a proper status code
+        first = next(stream, b"")
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export error: {e}")
+    return StreamingResponse(
+        itertools.chain([first], stream),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+    )
+
+
+@router.get("/query/{query_id}/export")
+def export_query(query_id: str, format: str = "csv"):
+    """Full result of a stored query as a CSV / Parquet download (see db/export.py), unbounded by MAX_QUERY_ROWS."""
+    entry = get_query(query_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired query_id")
+    return _export_response(entry["sql"], entry["params"], format.lower(), f"query_{query_id}")
+
+
+@router.post("/export")
+def export_sql(req: ExportRequest):
+    """Full result of a SELECT as a CSV / Parquet download; the SQL goes through the same safety and cost checks."""
+    sql = req.sql.strip()
+    if not sql or not is_safe_select(sql):
+        raise HTTPException(status_code=400, detail="SQL did not pass safety checks (non-SELECT or disallowed keywords).")
+    return _export_response(sql, {}, req.format.lower(), "export")
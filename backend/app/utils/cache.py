@@ -0,0 +1,51 @@
+# backend/app/utils/cache.py
+"""
+Small in-process LRU cache for per-query artefacts (plans, rollup matches)
+that are keyed by SQL fingerprint rather than by function arguments.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+
+# Named caches, for hit-ratio metrics
+CACHES: Dict[str, "LRUCache"] = {}
+
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used key."""
+
+    def __init__(self, maxsize: int = 256, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        if name:
+            CACHES[name] = self
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
@@ -0,0 +1,145 @@
+# backend/app/utils/logging_setup.py
+"""
+Structured, non-blocking logging for the request path.
+
+Modules log through `logging.getLogger(__name__)` (the "app" hierarchy).
+configure_logging() gives that hierarchy a single QueueHandler: the request
+thread only stamps the record with its trace / request id and puts it on a
+bounded queue (dropping it if the queue is full). A QueueListener thread
+formats it (one JSON object per line, or plain text with LOG_FORMAT=text)
+and does the stdout write, so terminal or pipe I/O never shows up in request
+latency and lines from concurrent requests never interleave.
+
+Sampling: each request is kept for INFO/DEBUG logging with probability
+LOG_SAMPLE_RATE (decided by the HTTP middleware). WARNING and above are
+always logged, so failed requests are never lost.
+
+Levels can be changed at runtime with set_log_level() (exposed as
+PUT /admin/log-level when LOG_ADMIN_ENABLED and LOG_ADMIN_TOKEN are set).
+"""
+
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+
+from .tracing import current_span
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json | text
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+ROOT_LOGGER = "app"
+
+# Attributes every LogRecord has; anything else came in through `extra=` and goes into the JSON
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_sampled: ContextVar[bool] = ContextVar("log_sampled", default=True)
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{line} (request {request_id[:8]})" if request_id else line
+
+
+class RequestContextFilter(logging.Filter):
+    """Runs in the request's thread (before queueing): adds trace ids and applies request sampling."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and not _sampled.get():
+            return False
+        span = current_span()
+        if span is not None:
+            record.request_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> logging.Logger:
+    """Route the "app" loggers through the background writer (idempotent)."""
+    global _listener
+    logger = logging.getLogger(ROOT_LOGGER)
+    if _listener is not None:
+        return logger
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    log_queue: "queue.Queue" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return logger
+
+
+def sample_request() -> bool:
+    """Decide whether this request's INFO/DEBUG logs are kept (call once per request)."""
+    sampled = LOG_SAMPLE_RATE >= 1.0 or random.random() < LOG_SAMPLE_RATE
+    _sampled.set(sampled)
+    return sampled
+
+
+def set_log_level(level: str, logger_name: str = ROOT_LOGGER) -> Dict[str, Any]:
+    """Change a logger's level at runtime; raises ValueError for an unknown level."""
+    level = level.upper()
+    if not isinstance(logging.getLevelName(level), int):
+        raise ValueError(f"Unknown log level '{level}'")
+    if logger_name != ROOT_LOGGER and not logger_name.startswith(ROOT_LOGGER + "."):
+        raise ValueError(f"Only '{ROOT_LOGGER}' loggers can be changed")
+    logging.getLogger(logger_name).setLevel(level)
+    return get_log_levels()
+
+
+def get_log_levels() -> Dict[str, Any]:
+    """Explicitly set levels of the "app" loggers, plus the sampling rate."""
+    levels = {ROOT_LOGGER: logging.getLevelName(logging.getLogger(ROOT_LOGGER).level)}
+    for name, logger in logging.root.manager.loggerDict.items():
+        if name.startswith(ROOT_LOGGER + ".") and isinstance(logger, logging.Logger) and logger.level:
+            levels[name] = logging.getLevelName(logger.level)
+    return {"levels": levels, "sample_rate": LOG_SAMPLE_RATE}
@@ -0,0 +1,259 @@
+# backend/app/utils/metrics.py
+"""
+In-process metrics served from /metrics in the Prometheus text format.
+
+Counters, gauges and histograms are plain objects guarded by a lock; an
+observation is a dict lookup, a bisect and two additions, so timing every
+stage of every request costs microseconds. Values that already live
+elsewhere (LRU cache hit counts, the SQLAlchemy pool) are read by collector
+callbacks at scrape time instead of being tracked per request.
+
+    STAGE_SECONDS.observe(0.012, stage="execution")
+    render_metrics()  # text/plain; version=0.0.4
+"""
+
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import math
+import logging
+import os
+
+from . import sql_shape
+from .cache import CACHES
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PREFIX = "sqlbot_"
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from a cached fast-path stage to a slow LLM call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name + "_total", dict(zip(self.labelnames, key)), value)
+                    for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> List[Sample]:
+        out: List[Sample] = []
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                out.append((self.name + "_bucket", {**labels, "le": _number(bound)}, cumulative))
+            out.append((self.name + "_sum", labels, total))
+            out.append((self.name + "_count", labels, cumulative))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Tuple[Dict[str, str], float]]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, name: str, kind: str, documentation: str,
+                           collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]):
+        """A metric whose (labels, value) samples are read at scrape time."""
+        self._collectors.append((METRICS_PREFIX + name, kind, documentation, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{_labels(labels)} {_number(value)}" for name, labels, value in metric.samples())
+        for name, kind, documentation, collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception as e:  # a broken collector must not break the scrape
+                logger.warning("Metrics collector %s failed: %s", name, e)
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            suffix = "_total" if kind == "counter" else ""
+            lines.extend(f"{name}{suffix}{_labels(labels)} {_number(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests", "HTTP requests by route and status", ("method", "route", "status")))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "End-to-end request latency", ("method", "route")))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requests currently being served"))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "stage_duration_seconds", "Latency of each /api/query pipeline stage", ("stage",)))
+QUERY_ROWS = REGISTRY.register(Histogram(
+    "query_rows", "Rows returned per query", (), buckets=(0, 1, 5, 10, 25, 100, 250, 1000, 5000)))
+REQUEST_CACHE = REGISTRY.register(Counter(
+    "request_cache_lookups", "Per-request shortcuts taken (fast path, rollup, plan cache)", ("cache", "result")))
+LLM_REQUESTS = REGISTRY.register(Counter(
+    "llm_requests", "LLM provider calls by outcome", ("provider", "model", "status")))
+LLM_SECONDS = REGISTRY.register(Histogram(
+    "llm_request_duration_seconds", "LLM provider call latency", ("provider", "model")))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens", "LLM tokens per provider call, in (prompt) and out (completion)",
+    ("provider", "model", "direction")))
+
+
+def _cache_stats() -> List[Tuple[str, int, int]]:
+    """(cache, hits, misses) for the named LRU caches and the SQL parse caches."""
+    stats = [(name, cache.hits, cache.misses) for name, cache in CACHES.items()]
+    for fn in (sql_shape.parse_sql, sql_shape.analyze_sql, sql_shape.fingerprint_sql):
+        info = fn.cache_info()
+        stats.append((f"sql_shape.{fn.__name__}", info.hits, info.misses))
+    return stats
+
+
+REGISTRY.register_collector("cache_hits", "counter", "Cache hits by cache",
+                            lambda: [({"cache": name}, hits) for name, hits, _ in _cache_stats()])
+REGISTRY.register_collector("cache_misses", "counter", "Cache misses by cache",
+                            lambda: [({"cache": name}, misses) for name, _, misses in _cache_stats()])
+REGISTRY.register_collector("cache_hit_ratio", "gauge", "Cache hit ratio since start by cache",
+                            lambda: [({"cache": name}, hits / (hits + misses))
+                                     for name, hits, misses in _cache_stats() if hits + misses])
+
+
+def register_pool_metrics(pool):
+    """Gauges for a SQLAlchemy QueuePool: size, connections checked out / idle, overflow in use."""
+    def collect():
+        samples = [({"state": "checked_out"}, pool.checkedout()), ({"state": "idle"}, pool.checkedin())]
+        return samples + [({"state": "overflow"}, max(pool.overflow(), 0))]
+
+    REGISTRY.register_collector("db_pool_connections", "gauge", "Database pool connections by state", collect)
+    REGISTRY.register_collector("db_pool_size", "gauge", "Configured database pool size",
+                                lambda: [({}, pool.size())])
+    REGISTRY.register_collector("db_pool_utilization", "gauge", "Checked-out connections / pool size",
+                                lambda: [({}, pool.checkedout() / pool.size())] if pool.size() else [])
+
+
+def observe_llm_call(provider: str, model: str, seconds: float, status: str,
+                     tokens_in: Optional[int] = None, tokens_out: Optional[int] = None):
+    if not METRICS_ENABLED:
+        return
+    LLM_REQUESTS.inc(provider=provider, model=model, status=status)
+    LLM_SECONDS.observe(seconds, provider=provider, model=model)
+    if tokens_in:
+        LLM_TOKENS.inc(tokens_in, provider=provider, model=model, direction="in")
+    if tokens_out:
+        LLM_TOKENS.inc(tokens_out, provider=provider, model=model, direction="out")
+
+
+def observe_request_stages(stages: Dict[str, float], cache_hits: Dict[str, bool], row_count: Optional[int]):
+    """Stage timings (ms, from StageTimer) and cache shortcuts of one /api/query request."""
+    if not METRICS_ENABLED:
+        return
+    for stage, ms in stages.items():
+        STAGE_SECONDS.observe(ms / 1000.0, stage=stage)
+    for cache, hit in cache_hits.items():
+        REQUEST_CACHE.inc(cache=cache, result="hit" if hit else "miss")
+    if row_count is not None:
+        QUERY_ROWS.observe(row_count)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,192 @@
+# backend/app/utils/pagination.py
+"""
+Paging through a validated query's full result without asking the LLM again.
+
+/api/query stores the executed SQL under a query_id, minus the default row
+cap (sanitizer.strip_row_cap), so paging can continue past MAX_QUERY_ROWS.
+Further pages are fetched from that SQL, wrapped as a subquery:
+
+  * keyset: when the ORDER BY columns are output columns and identify a row
+    (they cover the GROUP BY key, or the primary key of a single-table
+    query), the next page is `WHERE (keys) > (last keys)`, so each page costs
+    the same however deep the reader goes
+  * OFFSET otherwise (or when the last key holds a NULL)
+
+Cursors are opaque URL-safe strings carrying the last row's keys and the
+row offset. The store is an in-process LRU with a TTL.
+"""
+
+from datetime import date, datetime, time as dtime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+import base64
+import json
+import os
+import re
+import time
+import uuid
+
+from .cache import LRUCache
+from .sql_shape import analyze_sql
+
+QUERY_STORE_SIZE = int(os.getenv("QUERY_STORE_SIZE", "1000"))
+QUERY_STORE_TTL = float(os.getenv("QUERY_STORE_TTL", "3600"))
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+
+# Columns unique per row in the normalized schema (keyset on single-table queries)
+UNIQUE_COLUMNS = {
+    "customers": "customer_id",
+    "products": "product_id",
+    "orders": "order_id",
+    "order_items": "order_item_id",
+}
+
+_ORDER_ITEM = re.compile(
+    r'^(?:"?(\w+)"?\.)?"?(\w+)"?(?:\s+(asc|desc))?(?:\s+nulls\s+(?:first|last))?$', re.IGNORECASE
+)
+
+_store = LRUCache(QUERY_STORE_SIZE, name="query_store")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _output_column(item: str, columns: List[str]) -> Optional[Tuple[str, str]]:
+    """(result column, ASC|DESC) for an ORDER BY / GROUP BY item that names or numbers an output column."""
+    by_name = {col.lower(): col for col in columns}
+    item = item.strip()
+    m = re.match(r'^(\d+)(?:\s+(asc|desc))?$', item, re.IGNORECASE)
+    if m:
+        position = int(m.group(1))
+        if not 1 <= position <= len(columns):
+            return None
+        return columns[position - 1], (m.group(2) or "asc").upper()
+    m = _ORDER_ITEM.match(item)
+    if not m or m.group(2).lower() not in by_name:
+        return None
+    return by_name[m.group(2).lower()], (m.group(3) or "asc").upper()
+
+
+def keyset_columns(sql: str, columns: List[str]) -> Optional[List[Tuple[str, str]]]:
+    """
+    [(result column, direction)] usable as a keyset for this query, or None (use OFFSET).
+    """
+    shape = analyze_sql(sql)
+    if not shape["order_by"] or not columns:
+        return None
+    keys = [_output_column(item, columns) for item in shape["order_by"]]
+    # Row comparison needs plain columns sorted in one direction
+    if any(key is None for key in keys) or len({direction for _, direction in keys}) != 1:
+        return None
+    ordered = {col for col, _ in keys}
+
+    if shape["group_by"]:
+        group = [_output_column(item, columns) for item in shape["group_by"]]
+        if all(g is not None for g in group) and {col for col, _ in group} <= ordered:
+            return keys
+        return None
+    if not shape["aggregates"] and not shape["joins"] and len(shape["tables"]) == 1:
+        table = next(iter(shape["tables"]))
+        if UNIQUE_COLUMNS.get(table) in ordered:
+            return keys
+    return None
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    if isinstance(value, dtime):
+        return {"$t": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$dec": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "$dt" in value:
+            return datetime.fromisoformat(value["$dt"])
+        if "$d" in value:
+            return date.fromisoformat(value["$d"])
+        if "$t" in value:
+            return dtime.fromisoformat(value["$t"])
+        if "$dec" in value:
+            return Decimal(value["$dec"])
+    return value
+
+
+def encode_cursor(offset: int, keys: Optional[List[Any]] = None) -> str:
+    payload = {"o": offset, "k": [_encode_value(v) for v in keys] if keys is not None else None}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, Optional[List[Any]]]:
+    """(offset, last keys or None)."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset = int(payload["o"])
+        keys = payload.get("k")
+        return offset, [_decode_value(v) for v in keys] if keys is not None else None
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+
+def next_cursor(entry: Dict[str, Any], rows: List[Dict[str, Any]], offset: int) -> str:
+    """Cursor for the page after `rows`, which started at row `offset`."""
+    keyset = entry["keyset"]
+    keys = [rows[-1].get(col) for col, _ in keyset] if keyset and rows else None
+    return encode_cursor(offset + len(rows), keys)
+
+
+def page_query(entry: Dict[str, Any], cursor: Optional[str], page_size: int) -> Tuple[str, Dict[str, Any], str, int]:
+    """
+    SQL and params for one page (fetches page_size + 1 rows to detect a next page).
+
+    Returns:
+        (sql, params, mode "keyset" | "offset", offset of the first row)
+    """
+    offset, keys = decode_cursor(cursor) if cursor else (0, None)
+    base = re.sub(r';\s*$', '', entry["sql"])
+    params = {**entry["params"], "_page_size": page_size + 1}
+    keyset = entry["keyset"]
+    order = ""
+    if keyset:
+        order = " ORDER BY " + ", ".join(f'"{col}" {direction}' for col, direction in keyset)
+
+    if keyset and (keys is None and offset == 0 or keys is not None and None not in keys):
+        where = ""
+        if keys is not None:
+            if len(keys) != len(keyset):
+                raise InvalidCursor("Cursor does not match this query")
+            op = ">" if keyset[0][1] == "ASC" else "<"
+            columns = ", ".join(f'"{col}"' for col, _ in keyset)
+            placeholders = ", ".join(f":_k{i}" for i in range(len(keys)))
+            where = f" WHERE ({columns}) {op} ({placeholders})"
+            params.update({f"_k{i}": value for i, value in enumerate(keys)})
+        return f"SELECT * FROM ({base}) AS _page{where}{order} LIMIT :_page_size", params, "keyset", offset
+
+    params["_offset"] = offset
+    return f"SELECT * FROM ({base}) AS _page{order} LIMIT :_page_size OFFSET :_offset", params, "offset", offset
+
+
+def store_query(sql: str, params: Dict[str, Any], columns: List[str]) -> str:
+    """Remember a validated query for paging; returns its query_id."""
+    query_id = uuid.uuid4().hex
+    _store.set(query_id, {
+        "sql": sql,
+        "params": dict(params),
+        "columns": list(columns),
+        "keyset": keyset_columns(sql, list(columns)),
+        "created": time.monotonic(),
+    })
+    return query_id
+
+
+def get_query(query_id: str) -> Optional[Dict[str, Any]]:
+    entry = _store.get(query_id)
+    if entry is None or time.monotonic() - entry["created"] > QUERY_STORE_TTL:
+        return None
+    return entry
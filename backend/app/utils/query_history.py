@@ -0,0 +1,225 @@
+# backend/app/utils/query_history.py
+"""
+Append-only query history in SQLite: one row per /api/query request with the
+question, the generated SQL, cache hits, row count, response bytes, stage
+timings and the error class of failed requests.
+
+The request path only puts a dict on a bounded queue (put_nowait); a daemon
+writer thread drains it and inserts batches of up to HISTORY_BATCH_SIZE rows
+in one transaction, at least every HISTORY_FLUSH_INTERVAL seconds. When the
+queue is full the record is dropped (and counted) instead of making the
+request wait. Disabled unless QUERY_HISTORY_PATH is set.
+
+The table is the data source for cache warm-up (most asked questions), the
+index advisor (python -m app.db.index_advisor) and latency analysis.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+QUERY_HISTORY_PATH = os.getenv("QUERY_HISTORY_PATH", "")
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "200"))
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "1.0"))
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "10000"))
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages with their own column (every stage is also kept in stages_json)
+STAGE_COLUMNS = {
+    "schema": "schema_ms",
+    "sql_generation": "sql_generation_ms",
+    "validation": "validation_ms",
+    "execution": "execution_ms",
+    "fetch": "fetch_ms",
+    "answer": "answer_ms",
+}
+
+COLUMNS = [
+    "ts", "question", "sql", "params_json", "sql_source", "intent", "rollup", "cache_hits_json",
+    "row_count", "response_bytes", "status", "error_class", "error_stage", "total_ms",
+    *STAGE_COLUMNS.values(), "stages_json", "trace_id",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS query_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts TEXT NOT NULL,
+    question TEXT,
+    sql TEXT,
+    params_json TEXT,
+    sql_source TEXT,
+    intent TEXT,
+    rollup TEXT,
+    cache_hits_json TEXT,
+    row_count INTEGER,
+    response_bytes INTEGER,
+    status INTEGER,
+    error_class TEXT,
+    error_stage TEXT,
+    total_ms REAL,
+    {", ".join(f"{col} REAL" for col in STAGE_COLUMNS.values())},
+    stages_json TEXT,
+    trace_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_query_history_ts ON query_history (ts);
+"""
+
+
+def _json_safe(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _to_row(record: Dict[str, Any]) -> tuple:
+    stages = record.get("stages") or {}
+    values = {
+        "ts": record.get("ts") or datetime.now().isoformat(timespec="milliseconds"),
+        "params_json": json.dumps({k: _json_safe(v) for k, v in (record.get("params") or {}).items()}, default=str),
+        "cache_hits_json": json.dumps(record.get("cache_hits") or {}),
+        "stages_json": json.dumps({k: round(v, 3) for k, v in stages.items()}),
+        **{col: stages.get(stage) for stage, col in STAGE_COLUMNS.items()},
+    }
+    return tuple(values[col] if col in values else record.get(col) for col in COLUMNS)
+
+
+class HistoryWriter:
+    """Bounded queue drained into SQLite by a background thread in batches."""
+
+    def __init__(self, path: str, batch_size: int = HISTORY_BATCH_SIZE,
+                 flush_interval: float = HISTORY_FLUSH_INTERVAL, max_queue: int = HISTORY_QUEUE_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Queue one record; never blocks (drops it when the writer is behind)."""
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until everything queued so far is written (tests, shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-history", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        # History files from before a column was added
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(query_history)")}
+        for col in COLUMNS:
+            if col not in existing:
+                conn.execute(f"ALTER TABLE query_history ADD COLUMN {col}")
+        insert = f"INSERT INTO query_history ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(insert, [_to_row(r) for r in batch])
+                self.written += len(batch)
+            except Exception as e:
+                logger.warning("Could not write %d history record(s) to %s: %s", len(batch), self.path, e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+_writer: Optional[HistoryWriter] = HistoryWriter(QUERY_HISTORY_PATH) if QUERY_HISTORY_PATH else None
+if _writer is not None:
+    atexit.register(_writer.flush)
+
+
+def record_request(record: Dict[str, Any]) -> bool:
+    """Queue one request record for the history store (no-op when disabled)."""
+    if _writer is None:
+        return False
+    return _writer.submit(record)
+
+
+def flush_history(timeout: float = 5.0):
+    if _writer is not None:
+        _writer.flush(timeout)
+
+
+def read_history(path: Optional[str] = None, since: Optional[str] = None,
+                 limit: Optional[int] = None, with_sql: bool = False) -> List[Dict[str, Any]]:
+    """History rows (oldest first) as dicts, JSON columns decoded; `since` is an ISO timestamp."""
+    path = path or QUERY_HISTORY_PATH
+    if not path or not os.path.exists(path):
+        return []
+    where, args = [], []
+    if since:
+        where.append("ts >= ?")
+        args.append(since)
+    if with_sql:
+        where.append("sql IS NOT NULL AND status < 400")
+    query = "SELECT * FROM query_history" + (f" WHERE {' AND '.join(where)}" if where else "") + " ORDER BY id"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = [dict(row) for row in conn.execute(query, args)]
+    finally:
+        conn.close()
+    for row in rows:
+        for col in ("params_json", "cache_hits_json", "stages_json"):
+            row[col[:-5]] = json.loads(row.pop(col) or "{}")
+        # Per-query time as the index advisor reads it
+        row["execution_time_ms"] = (row["execution_ms"] + (row.get("fetch_ms") or 0)
+                                    if row.get("execution_ms") is not None else None)
+    return rows
+
+
+def top_questions(path: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """Most asked successful questions (cache warm-up candidates)."""
+    path = path or QUERY_HISTORY_PATH
+    if not path or not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path)
+    try:
+        return [{"question": q, "count": n, "avg_total_ms": ms} for q, n, ms in conn.execute(
+            "SELECT question, COUNT(*), AVG(total_ms) FROM query_history WHERE status < 400 "
+            "GROUP BY question ORDER BY COUNT(*) DESC LIMIT ?", (limit,)
+        )]
+    finally:
+        conn.close()
@@ -1,44 +1,166 @@
-from typing import Tuple, Dict, Any
-import sqlparse
+from typing import Tuple, Dict, Any, Optional
 import re
 
-DISALLOWED = [
-    "insert", "update", "delete", "drop", "alter", "create",
-    "truncate", "grant", "revoke", "copy", ";", "--"
-]
+from sqlparse import tokens as T
+from sqlparse.sql import Identifier, Parenthesis
+
+from .sql_shape import analyze_sql, parse_sql, top_level_tokens
 
 def is_safe_select(sql: str) -> bool:
     """
     Basic safety checks for generated SQL.
-    Must start with SELECT and must not contain disallowed operations.
+    Must be a single SELECT statement (CTEs allowed) with no comments and no
+    disallowed keywords. Keywords are checked as parsed tokens, so identifiers
+    such as created_at or last_update are not rejected.
     """
     if not sql:
         return False
 
-    sql_low = sql.lower()
+    return analyze_sql(sql)["is_select"]
 
-    for kw in DISALLOWED:
-        if kw in sql_low:
-            return False
 
-    # Ensure first token is SELECT
-    parsed = sqlparse.parse(sql)
-    if not parsed:
-        return False
+# The inner order decides which rows are kept (DISTINCT ON) ...
+_ORDER_DEPENDENT_SUBQUERY = re.compile(r"\bDISTINCT\s+ON\b", re.IGNORECASE)
+# ... or what the outer query computes from them (order-sensitive aggregates, window functions)
+_ORDER_SENSITIVE_OUTER = re.compile(
+    r"\b(array_agg|string_agg|json_agg|jsonb_agg|json_object_agg|jsonb_object_agg|xmlagg)\s*\(|\bOVER\b",
+    re.IGNORECASE,
+)
+
 
-    # regex fallback
-    m = re.match(r'^\s*select\b', sql_low, re.I)
-    return bool(m)
+def _strip_redundant_order_by(sql: str) -> str:
+    """
+    Drop ORDER BY inside FROM-clause subqueries when the outer query sorts
+    again and the inner sort cannot change the result: the subquery has no
+    LIMIT/OFFSET/FETCH or DISTINCT ON, and the outer query has no
+    order-sensitive aggregate or window function.
+    """
+    statements = parse_sql(sql)
+    if len(statements) != 1:
+        return sql
 
+    tokens = top_level_tokens(statements[0])
+    if not any(t.ttype in T.Keyword and t.normalized == "ORDER BY" for t in tokens):
+        return sql
 
-def wrap_with_limit(sql: str, max_rows: int) -> Tuple[str, Dict[str, Any]]:
+    for tok in tokens:
+        paren = tok if isinstance(tok, Parenthesis) else tok.token_first() if isinstance(tok, Identifier) else None
+        if not isinstance(paren, Parenthesis):
+            continue
+        inner = paren.tokens
+        keywords = [t.normalized for t in inner if t.ttype in T.Keyword]
+        if "ORDER BY" not in keywords or any(k in keywords for k in ("LIMIT", "OFFSET", "FETCH")):
+            continue
+        if _ORDER_DEPENDENT_SUBQUERY.search(str(paren)):
+            continue
+        if _ORDER_SENSITIVE_OUTER.search(sql.replace(str(paren), "()", 1)):
+            continue
+        cut = next(i for i, t in enumerate(inner) if t.ttype in T.Keyword and t.normalized == "ORDER BY")
+        stripped = "".join(str(t) for t in inner[:cut]).rstrip() + ")"
+        sql = sql.replace(str(paren), stripped, 1)
+
+    return sql
+
+
+def push_down_limit(sql: str, max_rows: int, params: Optional[Dict[str, Any]] = None) -> Optional[Tuple[str, int]]:
+    """
+    Rewrite the outermost query's LIMIT to :_limit = min(inner limit, max_rows),
+    or append one if the query has none.
+
+    Returns:
+        (rewritten_sql, effective_limit), or None if the limit cannot be pushed
+        down safely (LIMIT ALL, expressions, FETCH FIRST, multiple statements)
+    """
+    sql = re.sub(r';\s*$', '', sql)
+    statements = parse_sql(sql)
+    if len(statements) != 1 or not analyze_sql(sql)["is_select"]:
+        return None
+
+    statement = statements[0]
+    tokens = top_level_tokens(statement)
+    if any(t.ttype in T.Keyword and t.normalized == "FETCH" for t in tokens):
+        return None
+
+    limit_at = next((i for i, t in enumerate(tokens) if t.ttype in T.Keyword and t.normalized == "LIMIT"), None)
+    if limit_at is None:
+        return f"{sql} LIMIT :_limit", max_rows
+    if limit_at + 1 >= len(tokens):
+        return None
+
+    value_tok = tokens[limit_at + 1]
+    if value_tok.ttype in T.Literal.Number.Integer:
+        current = int(value_tok.value)
+    elif value_tok.ttype in T.Name.Placeholder and isinstance((params or {}).get(value_tok.value[1:]), int):
+        current = params[value_tok.value[1:]]
+    else:
+        return None
+
+    rewritten = "".join(":_limit" if t is value_tok else str(t) for t in statement.tokens)
+    return rewritten.strip(), min(current, max_rows)
+
+
+def strip_row_cap(sql: str, cap: int, params: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Remove the outermost LIMIT when it is just the default row cap (the
+    LIMIT MAX_QUERY_ROWS that clean_sql, the LLM prompt and the fast-path
+    templates add), so a stored query can be paged or exported past it.
+    Explicit limits (top N) and LIMIT ... OFFSET are kept.
+
+    Returns:
+        (sql, params) with the cap and its bound parameter removed
+    """
+    sql = re.sub(r';\s*$', '', sql)
+    params = dict(params or {})
+    statements = parse_sql(sql)
+    if len(statements) != 1:
+        return sql, params
+
+    statement = statements[0]
+    tokens = top_level_tokens(statement)
+    limit_at = next((i for i, t in enumerate(tokens) if t.ttype in T.Keyword and t.normalized == "LIMIT"), None)
+    if limit_at is None or limit_at + 2 != len(tokens):
+        return sql, params
+
+    value_tok = tokens[limit_at + 1]
+    if value_tok.ttype in T.Literal.Number.Integer:
+        value = int(value_tok.value)
+    elif value_tok.ttype in T.Name.Placeholder:
+        value = params.get(value_tok.value[1:])
+    else:
+        return sql, params
+    if value != cap:
+        return sql, params
+
+    if value_tok.ttype in T.Name.Placeholder:
+        params.pop(value_tok.value[1:], None)
+    kept = statement.tokens[:statement.tokens.index(tokens[limit_at])]
+    return "".join(str(t) for t in kept).strip(), params
+
+
+def wrap_with_limit(sql: str, max_rows: int, params: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
     """
     Enforce a max row limit safely.
+
+    The limit is pushed into the outermost query where possible, so Postgres
+    can use top-N sorts and index-ordered scans; otherwise the query is
+    wrapped in a LIMITed subquery.
+
+    Args:
+        sql: validated SELECT statement
+        max_rows: row cap for this request
+        params: bound parameters of the query (used to resolve LIMIT :name)
+
     Returns:
         (wrapped_sql: str, params: dict)
     """
     # Remove trailing semicolon
     sql = re.sub(r';\s*$', '', sql)
+    sql = _strip_redundant_order_by(sql)
+
+    pushed = push_down_limit(sql, max_rows, params)
+    if pushed:
+        rewritten_sql, limit = pushed
+        return rewritten_sql, {"_limit": limit}
 
     wrapped_sql = f"SELECT * FROM ({sql}) AS _sub LIMIT :_limit"
     params = {"_limit": max_rows}
@@ -23,12 +23,32 @@ def get_detailed_schema():
         "relationships": [],
         "business_rules": [],
         "common_queries": [],
-        "table_counts": {}
+        "table_counts": {},
+        "partitioning": []
     }
     
     with engine.connect() as conn:
-        # Get all table names
-        tables = inspector.get_table_names(schema='public')
+        # Get all table names (partitions are described through their parent)
+        partitions = {row[0] for row in conn.execute(text(
+            "SELECT relname FROM pg_class WHERE relispartition"
+        ))}
+        tables = [t for t in inspector.get_table_names(schema='public') if t not in partitions]
+        
+        # Partitioned tables: key definition and number of partitions
+        for table, key, partition_count in conn.execute(text("""
+            SELECT c.relname, pg_get_partkeydef(c.oid), COUNT(i.inhrelid)
+            FROM pg_partitioned_table p
+            JOIN pg_class c ON c.oid = p.partrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = 'public'
+            LEFT JOIN pg_inherits i ON i.inhparent = c.oid
+            GROUP BY c.relname, c.oid
+            ORDER BY c.relname
+        """)):
+            schema_info["partitioning"].append({
+                "table": table,
+                "key": key,
+                "partitions": partition_count
+            })
         
         for table in tables:
             # Get row count
@@ -164,6 +184,20 @@ def format_schema_for_prompt(schema_info):
     else:
         prompt += "No foreign key relationships defined.\n"
     
+    # Partitioning: generated SQL should let the planner prune partitions
+    if schema_info.get("partitioning"):
+        prompt += "\n## PARTITIONING\n"
+        for part in schema_info["partitioning"]:
+            prompt += f"- {part['table']}: PARTITION BY {part['key']} (monthly ranges, {part['partitions']} partitions)\n"
+        prompt += "- For any date range, filter the partition key directly with plain comparisons, e.g. "
+        prompt += "o.order_date >= '2011-09-01' AND o.order_date < '2011-12-01', so only those months are scanned\n"
+        if any(part["table"] == "order_items" for part in schema_info["partitioning"]):
+            prompt += "- order_items.order_date equals its order's order_date: when joining order_items, "
+            prompt += "join ON o.order_id = oi.order_id AND o.order_date = oi.order_date and repeat the "
+            prompt += "date range on oi.order_date\n"
+        prompt += "- Never wrap order_date in functions or casts in WHERE (DATE_TRUNC, EXTRACT, ::date); "
+        prompt += "that scans every partition. DATE_TRUNC in SELECT / GROUP BY is fine\n"
+    
     # Business rules
     prompt += "\n## BUSINESS RULES\n"
     for rule in schema_info["business_rules"]:
@@ -30,6 +30,7 @@ def get_schema_summary(limit_sample_rows: int = 3) -> dict:
         SELECT table_name, column_name, data_type
         FROM information_schema.columns
         WHERE table_schema = 'public'
+          AND table_name NOT IN (SELECT relname FROM pg_class WHERE relispartition)
         ORDER BY table_name, ordinal_position;
     """)
 
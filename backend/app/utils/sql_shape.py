@@ -0,0 +1,354 @@
+# backend/app/utils/sql_shape.py
+"""
+Parse generated SQL once into a query-shape summary shared by the sanitizer,
+the SQL generator and the answer formatter.
+
+The shape is derived from the sqlparse token tree instead of substring
+tests, so identifiers such as `created_at` or `last_update` are not mistaken
+for keywords. Results are cached by SQL text.
+"""
+
+from functools import lru_cache
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+import hashlib
+import os
+import re
+
+import sqlparse
+from sqlparse import tokens as T
+from sqlparse.sql import Comparison, Function, Identifier, IdentifierList, Parenthesis, TokenList, Where
+
+SHAPE_CACHE_SIZE = int(os.getenv("SQL_SHAPE_CACHE_SIZE", "512"))
+
+AGGREGATES = {"SUM", "COUNT", "AVG", "MIN", "MAX", "STRING_AGG", "ARRAY_AGG", "STDDEV", "VARIANCE"}
+
+# Keywords that must never appear as keyword tokens in a read-only query
+FORBIDDEN_KEYWORDS = {
+    "INSERT", "UPDATE", "DELETE", "MERGE", "DROP", "ALTER", "CREATE", "TRUNCATE",
+    "GRANT", "REVOKE", "COPY", "INTO", "VACUUM", "CALL", "EXECUTE", "DO",
+}
+
+# Keywords that end a GROUP BY / ORDER BY clause
+CLAUSE_KEYWORDS = {
+    "FROM", "WHERE", "GROUP BY", "HAVING", "ORDER BY", "LIMIT", "OFFSET", "FETCH",
+    "FOR", "UNION", "UNION ALL", "INTERSECT", "EXCEPT", "WINDOW",
+}
+
+
+def _is_subquery(tok) -> bool:
+    return isinstance(tok, Parenthesis) and any(t.ttype in T.Keyword.DML for t in tok.tokens)
+
+
+def _leaves(tok) -> Iterator[Any]:
+    """Non-whitespace leaf tokens, not descending into subqueries (they are walked separately)."""
+    if not tok.is_group:
+        if not tok.is_whitespace:
+            yield tok
+        return
+    for child in tok.tokens:
+        if not _is_subquery(child):
+            yield from _leaves(child)
+
+
+def _column_refs(tok) -> List[Tuple[str, str]]:
+    """(qualifier, column) for each column reference in an expression; function names are skipped."""
+    leaves = list(_leaves(tok))
+    refs = []
+    for i, leaf in enumerate(leaves):
+        if leaf.ttype not in T.Name or leaf.ttype in T.Name.Placeholder:
+            continue
+        nxt = leaves[i + 1].value if i + 1 < len(leaves) else ""
+        if nxt in ("(", "."):
+            continue
+        # CAST(x AS type): the type name is not a column
+        if i >= 1 and leaves[i - 1].ttype in T.Keyword and leaves[i - 1].normalized == "AS":
+            continue
+        qualifier = leaves[i - 2].value if i >= 2 and leaves[i - 1].value == "." else ""
+        refs.append((qualifier.strip('"').lower(), leaf.value.strip('"').lower()))
+    return refs
+
+
+def _collect_condition(tok, shape: Dict[str, Any]):
+    """Classify one condition: column = column across two tables is a join, anything else a filter."""
+    refs = _column_refs(tok)
+    if isinstance(tok, Comparison) and len(refs) == 2 and refs[0][0] and refs[1][0] and refs[0][0] != refs[1][0]:
+        shape["_join_refs"].extend(refs)
+    else:
+        shape["_filter_refs"].extend(refs)
+
+
+def _collect_where(where: Where, shape: Dict[str, Any]):
+    """Filter and implicit-join columns of a WHERE clause."""
+    for tok in where.tokens:
+        if tok.is_whitespace or tok.ttype in T.Keyword or _is_subquery(tok):
+            continue
+        _collect_condition(tok, shape)
+
+
+def _walk(tokenlist: TokenList, shape: Dict[str, Any], cte_names: Set[str]):
+    """Collect tables, aliases, joins, functions and column usage from a token group, recursively."""
+    expect_table = False
+    expect_on = False
+    for tok in tokenlist.tokens:
+        if tok.is_whitespace or tok.ttype in T.Comment:
+            continue
+
+        if tok.ttype in T.Keyword:
+            keyword = tok.normalized
+            if keyword.endswith("JOIN"):
+                shape["joins"] += 1
+                shape["join_types"].append(keyword)
+                expect_table = True
+            else:
+                expect_table = keyword == "FROM"
+            expect_on = keyword == "ON" or (expect_on and keyword in ("AND", "OR"))
+            continue
+
+        if expect_on and isinstance(tok, Comparison):
+            _collect_condition(tok, shape)
+            continue
+        expect_on = False
+
+        if isinstance(tok, Where):
+            _collect_where(tok, shape)
+
+        if expect_table:
+            items = tok.get_identifiers() if isinstance(tok, IdentifierList) else [tok]
+            for item in items:
+                if isinstance(item, Identifier) and not isinstance(item.token_first(), Parenthesis):
+                    name = (item.get_real_name() or "").lower()
+                    if name and name not in cte_names:
+                        shape["tables"].add(name)
+                        shape["aliases"][(item.get_alias() or name).lower()] = name
+                if isinstance(item, TokenList):
+                    if isinstance(item.token_first(), Parenthesis) or isinstance(item, Parenthesis):
+                        shape["has_subquery"] = True
+                    _walk(item, shape, cte_names)
+            expect_table = False
+            continue
+
+        if isinstance(tok, Function):
+            name = (tok.get_name() or "").upper()
+            shape["functions"].add(name)
+            if name in AGGREGATES:
+                shape["aggregates"].add(name)
+
+        if tok.is_group:
+            if isinstance(tok, Parenthesis) and any(t.ttype in T.Keyword.DML for t in tok.tokens):
+                shape["has_subquery"] = True
+            _walk(tok, shape, cte_names)
+
+
+def _clause_items(tokens: List[Any], start: int) -> List[str]:
+    """Items of a GROUP BY / ORDER BY clause: text up to the next clause, split on top-level commas."""
+    parts = []
+    for tok in tokens[start:]:
+        if tok.ttype in T.Keyword and tok.normalized in CLAUSE_KEYWORDS:
+            break
+        if tok.ttype in T.Punctuation and tok.value == ";":
+            break
+        parts.append(str(tok))
+
+    items, depth, current = [], 0, ""
+    for ch in " ".join(parts):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            items.append(current.strip())
+            current = ""
+        else:
+            current += ch
+    if current.strip():
+        items.append(current.strip())
+    return [" ".join(item.split()) for item in items]
+
+
+def _parse_limit(tok) -> Any:
+    """LIMIT value: an int, a ':name' placeholder, or None for ALL/expressions."""
+    if tok.ttype in T.Literal.Number.Integer:
+        return int(tok.value)
+    if tok.ttype in T.Name.Placeholder:
+        return tok.value
+    return None
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def parse_sql(sql: str) -> tuple:
+    """Parsed non-empty statements (cached; shared by analysis and rewriting, do not mutate)."""
+    return tuple(s for s in sqlparse.parse(sql) if str(s).strip().strip(";").strip())
+
+
+def top_level_tokens(statement) -> List[Any]:
+    """Tokens of the outermost query, without whitespace and comments."""
+    return [t for t in statement.tokens if not t.is_whitespace and t.ttype not in T.Comment]
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def analyze_sql(sql: str) -> Dict[str, Any]:
+    """
+    Parse SQL and summarise its shape.
+
+    Returns a dict (treat as read-only, it is cached):
+        statement_type, statement_count, is_select, forbidden, has_comments,
+        tables, aliases, joins, join_types, aggregates, functions, columns,
+        group_by, order_by, limit, offset, has_subquery, has_cte,
+        filter_columns, join_columns, order_columns ('table.column' strings)
+    """
+    shape: Dict[str, Any] = {
+        "statement_type": "UNKNOWN",
+        "statement_count": 0,
+        "is_select": False,
+        "forbidden": [],
+        "has_comments": False,
+        "tables": set(),
+        "aliases": {},
+        "joins": 0,
+        "join_types": [],
+        "aggregates": set(),
+        "functions": set(),
+        "columns": [],
+        "group_by": [],
+        "order_by": [],
+        "limit": None,
+        "offset": None,
+        "has_subquery": False,
+        "has_cte": False,
+        "filter_columns": [],
+        "join_columns": [],
+        "order_columns": [],
+        "_filter_refs": [],
+        "_join_refs": [],
+    }
+    if not sql or not sql.strip():
+        return _freeze(shape)
+
+    statements = parse_sql(sql)
+    shape["statement_count"] = len(statements)
+    if not statements:
+        return _freeze(shape)
+
+    for statement in statements:
+        for leaf in statement.flatten():
+            if leaf.ttype in T.Comment:
+                shape["has_comments"] = True
+            elif leaf.ttype in T.Keyword and leaf.normalized in FORBIDDEN_KEYWORDS:
+                shape["forbidden"].append(leaf.normalized)
+            elif leaf.ttype in T.Keyword.DML and leaf.normalized != "SELECT":
+                shape["forbidden"].append(leaf.normalized)
+            elif leaf.ttype in T.Keyword.DDL:
+                shape["forbidden"].append(leaf.normalized)
+
+    statement = statements[0]
+    shape["statement_type"] = statement.get_type()
+
+    # CTE names are not tables
+    cte_names: Set[str] = set()
+    for tok in statement.tokens:
+        if tok.ttype in T.Keyword.CTE:
+            shape["has_cte"] = True
+        elif shape["has_cte"] and isinstance(tok, (Identifier, IdentifierList)) and not shape["columns"]:
+            for ident in (tok.get_identifiers() if isinstance(tok, IdentifierList) else [tok]):
+                if isinstance(ident, Identifier) and ident.get_name():
+                    cte_names.add(ident.get_name().lower())
+        elif tok.ttype in T.Keyword.DML:
+            break
+
+    _walk(statement, shape, cte_names)
+
+    # Top-level clauses of the outermost query
+    tokens = top_level_tokens(statement)
+    seen_select = False
+    for i, tok in enumerate(tokens):
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+        if tok.ttype in T.Keyword.DML and tok.normalized == "SELECT" and not seen_select:
+            seen_select = True
+            if nxt is not None and nxt.normalized in ("DISTINCT", "ALL") and i + 2 < len(tokens):
+                nxt = tokens[i + 2]
+            if nxt is not None and nxt.ttype not in T.Keyword:
+                for item in (nxt.get_identifiers() if isinstance(nxt, IdentifierList) else [nxt]):
+                    if isinstance(item, (Identifier, Function)):
+                        shape["columns"].append((item.get_name() or str(item)).lower())
+                    elif not item.is_whitespace:
+                        shape["columns"].append(str(item).strip().lower())
+        elif tok.ttype in T.Keyword and nxt is not None:
+            if tok.normalized == "GROUP BY":
+                shape["group_by"] = _clause_items(tokens, i + 1)
+            elif tok.normalized == "ORDER BY":
+                shape["order_by"] = _clause_items(tokens, i + 1)
+            elif tok.normalized == "LIMIT":
+                shape["limit"] = _parse_limit(nxt)
+            elif tok.normalized == "OFFSET":
+                shape["offset"] = _parse_limit(nxt)
+
+    shape["filter_columns"] = _resolve_refs(shape.pop("_filter_refs"), shape)
+    shape["join_columns"] = _resolve_refs(shape.pop("_join_refs"), shape)
+    order_refs = []
+    for item in shape["order_by"]:
+        m = re.match(r'^(?:"?(\w+)"?\.)?"?(\w+)"?(?:\s+(?:asc|desc))?(?:\s+nulls\s+(?:first|last))?$', item, re.IGNORECASE)
+        # plain output aliases (ORDER BY total_revenue) are not table columns
+        if m and (m.group(1) or m.group(2).lower() not in shape["columns"]):
+            order_refs.append(((m.group(1) or "").lower(), m.group(2).lower()))
+    shape["order_columns"] = _resolve_refs(order_refs, shape)
+
+    shape["is_select"] = (
+        shape["statement_type"] == "SELECT"
+        and shape["statement_count"] == 1
+        and not shape["forbidden"]
+        and not shape["has_comments"]
+    )
+    return _freeze(shape)
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def fingerprint_sql(sql: str) -> str:
+    """
+    Stable hash of a query's structure: literals become '?', keywords and
+    names are lower-cased and whitespace/comments are dropped, so the same
+    template with different constants shares one fingerprint.
+    """
+    parts = []
+    for statement in parse_sql(sql or ""):
+        for leaf in statement.flatten():
+            if leaf.is_whitespace or leaf.ttype in T.Comment:
+                continue
+            if leaf.ttype in T.Literal.Number or leaf.ttype in T.Literal.String:
+                parts.append("?")
+            elif leaf.ttype in T.Punctuation and leaf.value == ";":
+                continue
+            else:
+                parts.append(leaf.value.lower())
+    return hashlib.sha1(" ".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _resolve_refs(refs: List[Tuple[str, str]], shape: Dict[str, Any]) -> List[str]:
+    """Map (alias, column) pairs to unique 'table.column' strings ('?.column' if the table is ambiguous)."""
+    resolved = []
+    for qualifier, column in refs:
+        if qualifier:
+            table = shape["aliases"].get(qualifier, qualifier)
+        elif len(shape["tables"]) == 1:
+            table = next(iter(shape["tables"]))
+        else:
+            table = "?"
+        name = f"{table}.{column}"
+        if name not in resolved:
+            resolved.append(name)
+    return resolved
+
+
+def _freeze(shape: Dict[str, Any]) -> Dict[str, Any]:
+    shape["tables"] = frozenset(shape["tables"])
+    shape["aggregates"] = frozenset(shape["aggregates"])
+    shape["functions"] = frozenset(shape["functions"])
+    shape["forbidden"] = tuple(shape["forbidden"])
+    shape["columns"] = tuple(shape["columns"])
+    shape["group_by"] = tuple(shape["group_by"])
+    shape["order_by"] = tuple(shape["order_by"])
+    shape["join_types"] = tuple(shape["join_types"])
+    for key in ("filter_columns", "join_columns", "order_columns"):
+        shape[key] = tuple(shape.get(key, ()))
+    shape.pop("_filter_refs", None)
+    shape.pop("_join_refs", None)
+    return shape
@@ -0,0 +1,43 @@
+# backend/app/utils/timing.py
+"""
+Per-request stage timings for the query pipeline.
+
+    timer = StageTimer()
+    with timer.stage("execution"):
+        ...
+    timer.stages  # {"execution": 12.4}  (ms, perf_counter)
+
+The first exception leaving a stage is remembered with the stage it left, so
+a failed request records what failed where even after the route converts it
+into an HTTPException. Each stage is also a tracing span (query.<stage>).
+"""
+
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+import time
+
+from .tracing import start_span
+
+
+class StageTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.error_class: Optional[str] = None
+        self.error_stage: Optional[str] = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            with start_span(f"query.{name}"):
+                yield
+        except BaseException as e:
+            if self.error_class is None:
+                self.error_class, self.error_stage = type(e).__name__, name
+            raise
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
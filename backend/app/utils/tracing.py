@@ -0,0 +1,241 @@
+# backend/app/utils/tracing.py
+"""
+Lightweight request tracing with OpenTelemetry span semantics.
+
+A trace is a tree of spans (32-hex trace id, 16-hex span ids, parent ids,
+start/end in Unix nanoseconds, attributes, OK/ERROR status). The current
+span lives in a contextvar, so spans nest across awaits without being passed
+around:
+
+    with start_span("llm.chat", **{"gen_ai.request.model": model}) as span:
+        ...
+        span.set_attribute("gen_ai.usage.output_tokens", 42)
+
+The HTTP middleware opens the root span (continuing an incoming W3C
+`traceparent` header when there is one) and every StageTimer stage opens a
+child span, so /api/query gets one span per pipeline stage for free.
+
+Sampling is decided when the root span ends: a trace is kept with
+probability TRACE_SAMPLE_RATE, and always when it failed or took longer than
+TRACE_SLOW_MS (the p99 outliers worth looking at). Kept traces go to a
+background thread that writes OTLP/JSON, either one trace per line to
+TRACE_FILE_PATH or POSTed to TRACE_OTLP_ENDPOINT (an OTLP/HTTP collector's
+/v1/traces). With TRACE_EXPORTER=none, spans are still created (trace ids are
+returned to clients) but nothing is written.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()  # none | file | otlp
+TRACE_FILE_PATH = os.getenv("TRACE_FILE_PATH", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "sql-generator-bot")
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "status", "status_message", "_trace")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], trace: "_Trace",
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+        self.status_message: Optional[str] = None
+        self._trace = trace
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, exc: BaseException):
+        self.status = "ERROR"
+        self.status_message = f"{type(exc).__name__}: {exc}"[:500]
+        self.attributes.setdefault("error.type", type(exc).__name__)
+
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 2 if self.parent_id is None or self._trace.remote_parent == self.parent_id else 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2 if self.status == "ERROR" else 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class _Trace:
+    """Finished spans of one trace, held until the root span ends and the sampling decision is made."""
+
+    def __init__(self, remote_parent: Optional[str] = None, sampled: bool = False):
+        self.remote_parent = remote_parent
+        self.sampled = sampled  # upstream asked for this trace
+        self.spans: List[Span] = []
+        self.failed = False
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current.get()
+    return span.trace_id if span else None
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Dict[str, Any]]:
+    """W3C traceparent -> {"trace_id", "parent_id", "sampled"}, or None."""
+    m = _TRACEPARENT.match((header or "").strip().lower())
+    if not m or m.group(1) == "0" * 32 or m.group(2) == "0" * 16:
+        return None
+    return {"trace_id": m.group(1), "parent_id": m.group(2), "sampled": int(m.group(3), 16) & 1 == 1}
+
+
+@contextmanager
+def start_span(name: str, traceparent: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+    """Child of the current span, or a new root (continuing `traceparent` if given)."""
+    parent = _current.get()
+    if parent is not None:
+        span = Span(name, parent.trace_id, parent.span_id, parent._trace, attributes)
+    else:
+        remote = parse_traceparent(traceparent)
+        trace = _Trace(remote["parent_id"], remote["sampled"]) if remote else _Trace()
+        trace_id = remote["trace_id"] if remote else f"{random.getrandbits(128):032x}"
+        span = Span(name, trace_id, remote["parent_id"] if remote else None, trace, attributes)
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.set_error(e)
+        span._trace.failed = True
+        raise
+    finally:
+        _current.reset(token)
+        span.end_ns = time.time_ns()
+        span._trace.spans.append(span)
+        if parent is None:
+            _finish_trace(span)
+
+
+def _finish_trace(root: Span):
+    trace = root._trace
+    if root.status == "ERROR" or root.attributes.get("http.response.status_code", 0) >= 500:
+        trace.failed = True
+    keep = (trace.sampled or trace.failed or root.duration_ms() >= TRACE_SLOW_MS
+            or random.random() < TRACE_SAMPLE_RATE)
+    if keep and _exporter is not None:
+        _exporter.submit(trace.spans)
+
+
+def _otlp_payload(spans: List[Span]) -> Dict[str, Any]:
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_otlp_attribute("service.name", TRACE_SERVICE_NAME)]},
+        "scopeSpans": [{"scope": {"name": "app.utils.tracing"}, "spans": [s.to_otlp() for s in spans]}],
+    }]}
+
+
+class SpanExporter:
+    """Background thread writing kept traces as OTLP/JSON (file lines or OTLP/HTTP POSTs)."""
+
+    def __init__(self, kind: str, max_queue: int = 1000):
+        self.kind = kind
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, spans: List[Span]):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _run(self):
+        client = None
+        if self.kind == "otlp":
+            import httpx
+            client = httpx.Client(timeout=5.0)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if client is not None:
+                    spans = [span for trace in batch for span in trace]
+                    client.post(TRACE_OTLP_ENDPOINT, json=_otlp_payload(spans)).raise_for_status()
+                else:
+                    with open(TRACE_FILE_PATH, "a", encoding="utf-8") as f:
+                        for trace in batch:
+                            f.write(json.dumps(_otlp_payload(trace), default=str) + "\n")
+            except Exception as e:
+                logger.warning("Could not export %d trace(s): %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+_exporter: Optional[SpanExporter] = SpanExporter(TRACE_EXPORTER) if TRACE_EXPORTER in ("file", "otlp") else None
+if _exporter is not None:
+    atexit.register(_exporter.flush)
+
+
+def flush_traces(timeout: float = 5.0):
+    if _exporter is not None:
+        _exporter.flush(timeout)
@@ -0,0 +1,84 @@
+# backend/benchmark_intent_router.py
+"""
+Training and inference benchmark for the intent router.
+Runs offline: no database or Groq key needed.
+
+    python benchmark_intent_router.py [--log labels.jsonl] [--repeat 200]
+"""
+import argparse
+import statistics
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.llm.intent_router import IntentRouter, SEED_EXAMPLES, load_training_log, route_question
+from app.llm.sql_generator import requires_joins
+from app.llm.answer_formatter import detect_query_type_better
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", default="", help="Optional JSONL file with question/label records")
+    parser.add_argument("--repeat", type=int, default=200, help="Inference passes over the example set")
+    args = parser.parse_args()
+
+    examples = list(SEED_EXAMPLES) + load_training_log(args.log)
+    questions = [q for q, _ in examples]
+
+    print("=" * 60)
+    print("🧪 INTENT ROUTER BENCHMARK")
+    print("=" * 60)
+    print(f"   Examples: {len(examples)} across {len(set(i for _, i in examples))} intents")
+
+    # 1. Training time (scaled up to show it stays linear and cheap)
+    print("\n[1/3] Training time:")
+    for scale in (1, 10, 100):
+        data = examples * scale
+        start = time.perf_counter()
+        IntentRouter().fit(data)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"   {len(data):>7,} examples → {elapsed:8.1f} ms")
+
+    # 2. Leave-one-out accuracy
+    print("\n[2/3] Leave-one-out accuracy:")
+    correct = 0
+    for i, (question, intent) in enumerate(examples):
+        model = IntentRouter().fit(examples[:i] + examples[i + 1:])
+        predicted, _ = model.predict(question)
+        correct += predicted == intent
+    print(f"   {correct}/{len(examples)} correct ({correct / len(examples):.1%})")
+
+    # 3. Inference latency: router vs the keyword scans it replaces
+    print("\n[3/3] Per-request latency:")
+    route_question(questions[0])  # warm up / train default model
+
+    def timed(fn):
+        samples = []
+        for _ in range(args.repeat):
+            for q in questions:
+                start = time.perf_counter()
+                fn(q)
+                samples.append((time.perf_counter() - start) * 1e6)
+        return samples
+
+    router_us = timed(route_question)
+    keyword_us = timed(lambda q: (requires_joins(q), detect_query_type_better("", q)))
+
+    for name, samples in (("route_question", router_us), ("keyword scans", keyword_us)):
+        print(f"   {name:15} mean {statistics.mean(samples):7.1f} µs   "
+              f"p50 {percentile(samples, 50):7.1f} µs   p99 {percentile(samples, 99):7.1f} µs")
+
+    fast = sum(1 for q in questions if route_question(q)["route"] == "fast_path")
+    print(f"\n   Fast-path routed: {fast}/{len(questions)} example questions ({fast / len(questions):.0%})")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
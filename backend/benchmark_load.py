@@ -0,0 +1,378 @@
+# backend/benchmark_load.py
+"""
+End-to-end load test of /api/query against a local stand-in for the LLM.
+
+A mock OpenAI-compatible server (/v1/chat/completions) replaces Groq: it
+answers SQL-generation prompts with the local fallback SQL and answer prompts
+with a short text, after a latency drawn from a configurable distribution,
+optionally returning 429s and streaming tokens (stream=true). The app runs
+in-process (httpx ASGI transport) or under uvicorn, against the configured
+PostgreSQL database (seed it with create_normalized_tables.py first).
+
+N virtual users send a weighted mix of questions (template fast path, LLM
+generated SQL, explanations) with think time between requests. The report
+gives throughput, latency p50/p95/p99 overall, per question kind and per
+pipeline stage (from the Server-Timing header), error rates and mock LLM
+statistics, as JSON for regression comparison:
+
+    python benchmark_load.py --users 20 --duration 60 --llm-latency lognormal:600,0.4 --out run.json
+    python benchmark_load.py --uvicorn --workers 4 --compare run.json
+    python benchmark_load.py --replay llm_cassette.jsonl --replay-latency 0   # non-LLM stages only
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# (question, kind, weight)
+DEFAULT_MIX = [
+    ("top 5 products by revenue", "fast_path", 12),
+    ("total revenue", "fast_path", 10),
+    ("monthly revenue in 2011", "fast_path", 10),
+    ("top 10 customers by total spent", "fast_path", 10),
+    ("revenue by country", "fast_path", 10),
+    ("how many orders were placed in 2011", "llm", 8),
+    ("which products are often bought by customers in France", "llm", 8),
+    ("show me orders with more than 50 items", "llm", 6),
+    ("average order value per customer", "llm", 6),
+    ("number of customers per country", "llm", 6),
+    ("explain why revenue dropped in december 2011", "explain", 7),
+    ("what insights do you see in sales by country", "explain", 7),
+]
+
+STAGE_PATTERN = re.compile(r"([\w.]+);dur=([\d.]+)")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 2),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(max(values), 2),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Mock OpenAI-compatible LLM server
+# ---------------------------------------------------------------------------
+
+def parse_latency(spec):
+    """'fixed:200', 'uniform:100,500', 'normal:400,100' or 'lognormal:600,0.4' (median ms, sigma) -> sampler (s)."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v] if args else []
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "normal":
+        return lambda: max(random.gauss(values[0], values[1]), 0) / 1000
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+
+class MockLLM:
+    def __init__(self, latency, error_rate, token_delay_ms):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.token_delay = token_delay_ms / 1000
+        self.stats = defaultdict(int)
+        self.port = None
+        self._loop = None
+
+    def _reply(self, messages):
+        from app.llm.sql_generator import generate_local_sql
+
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        if "SQL generator" in system:
+            question = user.split("USER QUESTION:", 1)[-1].strip().split("\n", 1)[0].strip()
+            tables = {"tables": {t: {} for t in ("customers", "products", "orders", "order_items")}}
+            self.stats["sql_calls"] += 1
+            return " ".join(generate_local_sql(question, tables).split())
+        self.stats["answer_calls"] += 1
+        return ("Based on the results, the leading entries account for most of the total. "
+                "Revenue is concentrated in a few groups, and the trend is broadly stable over the period.")
+
+    async def handle(self, request):
+        from aiohttp import web
+
+        payload = await request.json()
+        self.stats["requests"] += 1
+        if random.random() < self.error_rate:
+            self.stats["rate_limited"] += 1
+            return web.json_response({"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                                     status=429, headers={"Retry-After": "1"})
+        await asyncio.sleep(self.latency())
+        text = self._reply(payload.get("messages", []))
+        tokens_in = sum(len(m.get("content", "")) for m in payload.get("messages", [])) // 4
+        tokens_out = max(len(text) // 4, 1)
+        model = payload.get("model", "mock")
+
+        if not payload.get("stream"):
+            return web.json_response({
+                "id": f"mock-{self.stats['requests']}", "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": tokens_in, "completion_tokens": tokens_out,
+                          "total_tokens": tokens_in + tokens_out},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for word in re.findall(r"\S+\s*", text):
+            chunk = {"object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(self.token_delay)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def start(self):
+        """Serve on a free port from a thread with its own event loop (blocking DB work cannot stall it)."""
+        from aiohttp import web
+
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            app = web.Application()
+            app.router.add_post("/v1/chat/completions", self.handle)
+            app.router.add_post("/openai/v1/chat/completions", self.handle)
+            runner = web.AppRunner(app, access_log=None)
+            self._loop.run_until_complete(runner.setup())
+            sock = socket.socket()
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+            self._loop.run_until_complete(web.SockSite(runner, sock).start())
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, name="mock-llm", daemon=True).start()
+        ready.wait(10)
+        return f"http://127.0.0.1:{self.port}/v1/chat/completions"
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+def load_mix(path):
+    if not path:
+        return DEFAULT_MIX
+    with open(path, encoding="utf-8") as f:
+        return [(m["question"], m.get("kind", "custom"), m.get("weight", 1)) for m in json.load(f)]
+
+
+async def virtual_user(client, mix, deadline, max_requests, think_ms, results, counter):
+    questions = [m for m in mix]
+    weights = [m[2] for m in mix]
+    while time.monotonic() < deadline and (not max_requests or counter[0] < max_requests):
+        counter[0] += 1
+        question, kind, _ = random.choices(questions, weights)[0]
+        start = time.perf_counter()
+        record = {"kind": kind, "question": question}
+        try:
+            response = await client.post("/api/query", json={"userQuery": question})
+            record["status"] = response.status_code
+            record["stages"] = {k: float(v) for k, v in STAGE_PATTERN.findall(response.headers.get("server-timing", ""))}
+            if response.status_code == 200:
+                meta = response.json().get("meta", {})
+                record["sql_source"] = meta.get("sql_source")
+        except Exception as e:
+            record["status"] = 0
+            record["error"] = type(e).__name__
+        record["latency_ms"] = (time.perf_counter() - start) * 1000
+        results.append(record)
+        if think_ms:
+            await asyncio.sleep(random.expovariate(1 / think_ms) / 1000)
+
+
+async def run_load(client, args, mix):
+    results, counter = [], [0]
+    # Warm-up: first schema load, plan cache, connections
+    for question, _, _ in mix[:3]:
+        await client.post("/api/query", json={"userQuery": question})
+    start = time.perf_counter()
+    deadline = time.monotonic() + args.duration
+    await asyncio.gather(*(virtual_user(client, mix, deadline, args.requests, args.think_ms, results, counter)
+                           for _ in range(args.users)))
+    return results, time.perf_counter() - start
+
+
+def build_report(results, elapsed, args, mock):
+    ok = [r for r in results if r["status"] == 200]
+    errors = defaultdict(int)
+    for r in results:
+        if r["status"] != 200:
+            errors[r.get("error") or str(r["status"])] += 1
+
+    stages = defaultdict(list)
+    for r in ok:
+        for stage, ms in r.get("stages", {}).items():
+            stages[stage].append(ms)
+    kinds = defaultdict(list)
+    for r in ok:
+        kinds[r["kind"]].append(r["latency_ms"])
+
+    return {
+        "config": {"mode": "uvicorn" if args.uvicorn else "in-process", "users": args.users,
+                   "llm_replay": args.replay or None,
+                   "duration_s": args.duration, "think_ms": args.think_ms, "llm_latency": args.llm_latency,
+                   "llm_429_rate": args.llm_429_rate, "workers": args.workers if args.uvicorn else 1},
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else None,
+        "errors": dict(errors),
+        "latency_ms": summarize([r["latency_ms"] for r in ok]),
+        "by_kind": {kind: summarize(values) for kind, values in sorted(kinds.items())},
+        "stages_ms": {stage: summarize(values) for stage, values in sorted(stages.items())},
+        "sql_source": {src: sum(1 for r in ok if r.get("sql_source") == src)
+                       for src in sorted({r.get("sql_source") for r in ok if r.get("sql_source")})},
+        "mock_llm": dict(mock.stats),
+    }
+
+
+def compare(report, baseline_path, tolerance):
+    """Print deltas against a baseline report; returns False when a tracked number regressed."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    checks = [("throughput_rps", report["throughput_rps"], baseline.get("throughput_rps"), True)]
+    for pct in ("p50", "p95", "p99"):
+        checks.append((f"latency {pct}", report["latency_ms"].get(pct), baseline.get("latency_ms", {}).get(pct), False))
+    for stage, stats in report["stages_ms"].items():
+        old = baseline.get("stages_ms", {}).get(stage, {}).get("p95")
+        checks.append((f"{stage} p95", stats.get("p95"), old, False))
+
+    ok = True
+    print(f"\n📈 Against {baseline_path} (tolerance {tolerance:.0%}):")
+    for name, new, old, higher_is_better in checks:
+        if new is None or not old:
+            continue
+        change = (new - old) / old
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        ok &= not regressed
+        print(f"   {'❌' if regressed else '✅'} {name:28} {old:>10.2f} -> {new:>10.2f} ({change:+.1%})")
+    return ok
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def main_async(args):
+    import httpx
+
+    mock = MockLLM(parse_latency(args.llm_latency), args.llm_429_rate, args.token_delay_ms)
+    llm_url = mock.start()
+    # Point the app at the mock before it is imported / started; keep side outputs off
+    os.environ.update({
+        "GROQ_API_URL": llm_url, "GROQ_API_KEY": "mock", "USE_LOCAL_FALLBACK": "false",
+        "TRACE_EXPORTER": os.getenv("TRACE_EXPORTER", "none"), "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    })
+    if args.replay:
+        # Serve LLM responses from a recorded cassette instead of the mock
+        os.environ.update({"LLM_CASSETTE_MODE": "replay", "LLM_CASSETTE_PATH": args.replay,
+                           "LLM_CASSETTE_REPLAY_LATENCY": str(args.replay_latency)})
+    mix = load_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    timeout = httpx.Timeout(120.0)
+
+    server = None
+    if args.uvicorn:
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(args.workers),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=os.environ.copy(),
+        )
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=timeout)
+        for _ in range(100):
+            try:
+                await client.get("/")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                   limits=limits, timeout=timeout)
+
+    try:
+        results, elapsed = await run_load(client, args, mix)
+    finally:
+        await client.aclose()
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+    return build_report(results, elapsed, args, mock)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/query against a mock LLM")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0 = duration only)")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean think time between a user's requests")
+    parser.add_argument("--mix", default="", help='JSON list of {"question", "kind", "weight"}')
+    parser.add_argument("--llm-latency", default="lognormal:400,0.5",
+                        help="fixed:MS | uniform:LO,HI | normal:MEAN,SD | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--llm-429-rate", type=float, default=0.0, help="Fraction of LLM calls answered with 429")
+    parser.add_argument("--token-delay-ms", type=float, default=5, help="Delay per token for stream=true calls")
+    parser.add_argument("--replay", default="", help="Replay LLM responses from this cassette (LLM_CASSETTE_PATH)")
+    parser.add_argument("--replay-latency", type=float, default=1.0,
+                        help="Scale of the recorded LLM latency when replaying (0 = instant)")
+    parser.add_argument("--uvicorn", action="store_true", help="Run the app under uvicorn instead of in-process")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--out", default="", help="Write the JSON report here")
+    parser.add_argument("--compare", default="", help="Baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression before --compare fails")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for the question mix")
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    print("=" * 60)
+    print("🏋️  LOAD TEST /api/query (mock LLM)")
+    print("=" * 60)
+    report = asyncio.run(main_async(args))
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.out}")
+    if args.compare and not compare(report, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
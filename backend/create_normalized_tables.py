@@ -2,42 +2,50 @@
 import pandas as pd
 import numpy as np
 from sqlalchemy import create_engine, text
+import argparse
 import os
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 
+from app.db.bulk_load import bulk_load_tables
+from app.db.data_version import bump_data_version
+from app.db.incremental_ingest import incremental_ingest
+from app.db.parallel_ingest import parallel_ingest
+from app.db.partitions import PARTITION_FACT_TABLES
+from app.db.normalize import SOURCE_DTYPES, build_customers, build_order_items, build_orders, build_products, clean_transactions
+from app.db.rollups import drop_rollups, refresh_rollups
+from app.db.schema_setup import add_foreign_keys, drop_foreign_keys, setup_schema
+from app.db.stream_ingest import CHUNK_ROWS, stream_ingest
+
 load_dotenv()
 
-def create_normalized_database():
+# Adjust the path to your CSV file
+CSV_PATH = 'E:/ecom-llm-analytics/data/ecommerce-data.csv'
+
+def create_normalized_database(csv_path=CSV_PATH, loader='copy', partitioned=False):
     """
     Transform the single transactions table into 4 normalized tables.
+    
+    loader: 'copy' / 'binary' stream through COPY into staging tables that are
+    swapped in atomically; 'to_sql' is the original pandas INSERT path.
+    partitioned: orders / order_items partitioned by month on order_date (COPY loaders).
     """
     print("📦 Starting database normalization...")
     
     # 1. Load your original data
     try:
-        # Adjust the path to your CSV file
-        df = pd.read_csv('E:/ecom-llm-analytics/data/ecommerce-data.csv', encoding='ISO-8859-1')
+        # Same explicit dtypes as the streaming / incremental modes (StockCode is text)
+        df = pd.read_csv(csv_path, encoding='ISO-8859-1', dtype=SOURCE_DTYPES)
         print(f"✅ Loaded original data: {len(df)} rows, {len(df.columns)} columns")
     except Exception as e:
         print(f"❌ Error loading CSV: {e}")
         return
     
-    # 2. Clean the data
+    # 2. Clean the data (drop non-customer rows and cancellations, add line totals)
     print("\n🧹 Cleaning data...")
-    df_clean = df.copy()
-    
-    # Remove rows with missing CustomerID (they represent non-customer transactions)
-    df_clean = df_clean[df_clean['CustomerID'].notna()]
-    df_clean['CustomerID'] = df_clean['CustomerID'].astype(str).str.strip()
-    
-    # Handle negative quantities (returns/cancellations)
-    df_clean['Quantity'] = pd.to_numeric(df_clean['Quantity'], errors='coerce')
-    df_clean['UnitPrice'] = pd.to_numeric(df_clean['UnitPrice'], errors='coerce')
-    
-    # Filter out cancelled orders (where InvoiceNo starts with 'C')
-    df_clean = df_clean[~df_clean['InvoiceNo'].astype(str).str.startswith('C')]
-    
+    transform_start = time.perf_counter()
+    df_clean = clean_transactions(df)
     print(f"   Cleaned data: {len(df_clean)} rows remaining")
     
     # 3. Create database connection
@@ -46,113 +54,148 @@ def create_normalized_database():
     
     # 4. CREATE TABLE: Customers
     print("\n👥 Creating customers table...")
-    customers = df_clean[['CustomerID', 'Country']].copy()
-    customers = customers.drop_duplicates(subset=['CustomerID'])
-    customers.columns = ['customer_id', 'country']
-    
-    # Add dummy data for missing columns (for demo purposes)
-    customers['name'] = 'Customer_' + customers['customer_id']
-    customers['email'] = customers['customer_id'] + '@example.com'
-    customers['registration_date'] = pd.to_datetime('2010-01-01')  # Default date
-    
-    customers.to_sql('customers', engine, if_exists='replace', index=False)
-    print(f"   ✅ Created {len(customers)} customer records")
+    customers = build_customers(df_clean)
+    print(f"   ✅ Built {len(customers)} customer records")
     
     # 5. CREATE TABLE: Products
     print("\n📦 Creating products table...")
-    products = df_clean[['StockCode', 'Description', 'UnitPrice']].copy()
-    products = products.drop_duplicates(subset=['StockCode'])
-    products.columns = ['product_id', 'name', 'unit_price']
-    
-    # Add dummy data for missing columns
-    products['category'] = 'General'
-    products['supplier'] = 'Default Supplier'
+    products = build_products(df_clean)
+    print(f"   ✅ Built {len(products)} product records")
     
-    products.to_sql('products', engine, if_exists='replace', index=False)
-    print(f"   ✅ Created {len(products)} product records")
-    
-    # 6. CREATE TABLE: Orders
+    # 6. CREATE TABLE: Orders (one named-aggregation groupby over InvoiceNo)
     print("\n📋 Creating orders table...")
-    
-    # Group by InvoiceNo to create orders
-    orders = df_clean.groupby('InvoiceNo').agg({
-        'CustomerID': 'first',
-        'InvoiceDate': 'first',
-        'Quantity': 'sum',
-        'UnitPrice': lambda x: sum(x * df_clean.loc[x.index, 'Quantity'])
-    }).reset_index()
-    
-    orders.columns = ['order_id', 'customer_id', 'order_date', 'total_quantity', 'total_amount']
-    
-    # Clean order_date
-    orders['order_date'] = pd.to_datetime(orders['order_date'], errors='coerce')
-    
-    # Add status (simplified: if total_quantity > 0 then 'completed')
-    orders['status'] = 'completed'
-    
-    orders.to_sql('orders', engine, if_exists='replace', index=False)
-    print(f"   ✅ Created {len(orders)} order records")
+    orders = build_orders(df_clean)
+    print(f"   ✅ Built {len(orders)} order records")
     
     # 7. CREATE TABLE: Order Items
     print("\n🛍️ Creating order_items table...")
+    order_items = build_order_items(df_clean, orders, with_order_date=partitioned)
+    print(f"   ✅ Built {len(order_items)} order item records")
+    print(f"   ⏱️ Transform finished in {time.perf_counter() - transform_start:.2f}s")
+    
+    frames = {
+        'customers': customers,
+        'products': products,
+        'orders': orders,
+        'order_items': order_items,
+    }
+    
+    # 8. Load the tables, keys and foreign key constraints
+    load_start = time.perf_counter()
+    if loader in ('copy', 'binary'):
+        bulk_load_tables(engine, frames, fmt='binary' if loader == 'binary' else 'csv', partitioned=partitioned)
+    else:
+        load_with_to_sql(engine, frames)
+    print(f"   ⏱️ Load finished in {time.perf_counter() - load_start:.2f}s ({loader})")
+    
+    # 9. Rebuild rollups for the hot aggregate queries
+    print("\n📈 Refreshing rollups...")
+    refresh_rollups(engine, full=True)
+    
+    print_summary({table: len(frame) for table, frame in frames.items()})
+
+def create_normalized_database_streaming(csv_path=CSV_PATH, loader='copy', chunksize=CHUNK_ROWS):
+    """
+    Chunked variant for large extracts: memory stays flat regardless of CSV size.
+    """
+    print("📦 Starting streaming database normalization...")
+    DATABASE_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+    engine = create_engine(DATABASE_URL)
     
-    # Get order_id to InvoiceNo mapping
-    order_mapping = orders[['order_id']].reset_index()
-    
-    # Create order_items from original line items
-    order_items = df_clean[['InvoiceNo', 'StockCode', 'Quantity', 'UnitPrice']].copy()
-    order_items.columns = ['order_id', 'product_id', 'quantity', 'unit_price']
-    
-    # Merge to get the correct order_id
-    order_items = order_items.merge(orders[['order_id']], left_on='order_id', right_on='order_id', how='inner')
-    
-    # Reset index to create order_item_id
-    order_items = order_items.reset_index(drop=True)
-    order_items.index.name = 'order_item_id'
-    order_items = order_items.reset_index()
-    order_items['order_item_id'] = order_items['order_item_id'] + 1  # Start from 1
+    counts = stream_ingest(engine, csv_path, chunksize, fmt='binary' if loader == 'binary' else 'csv')
     
-    order_items.to_sql('order_items', engine, if_exists='replace', index=False)
-    print(f"   ✅ Created {len(order_items)} order item records")
+    print("\n📈 Refreshing rollups...")
+    refresh_rollups(engine, full=True)
+    print_summary(counts)
+
+def create_normalized_database_parallel(csv_path=CSV_PATH, loader='copy', workers=None, partitioned=False):
+    """
+    Process-pool transforms and concurrent COPY connections; scales with cores.
+    """
+    print("📦 Starting parallel database normalization...")
+    DATABASE_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+    engine = create_engine(DATABASE_URL)
     
-    # 8. Add Foreign Key constraints
-    print("\n🔗 Adding foreign key constraints...")
-    with engine.connect() as conn:
-        try:
-            # Add FK: orders.customer_id → customers.customer_id
-            conn.execute(text("""
-                ALTER TABLE orders 
-                ADD CONSTRAINT fk_orders_customers 
-                FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
-            """))
-            
-            # Add FK: order_items.order_id → orders.order_id
-            conn.execute(text("""
-                ALTER TABLE order_items 
-                ADD CONSTRAINT fk_order_items_orders 
-                FOREIGN KEY (order_id) REFERENCES orders(order_id)
-            """))
-            
-            # Add FK: order_items.product_id → products.product_id
-            conn.execute(text("""
-                ALTER TABLE order_items 
-                ADD CONSTRAINT fk_order_items_products 
-                FOREIGN KEY (product_id) REFERENCES products(product_id)
-            """))
-            
-            print("   ✅ Foreign key constraints added")
-        except Exception as e:
-            print(f"   ⚠️ Could not add foreign keys (might already exist): {e}")
+    counts = parallel_ingest(engine, csv_path, workers, fmt='binary' if loader == 'binary' else 'csv',
+                             partitioned=partitioned)
     
+    print("\n📈 Refreshing rollups...")
+    refresh_rollups(engine, full=True)
+    print_summary(counts)
+
+def ingest_new_invoices(csv_path=CSV_PATH):
+    """
+    Incremental mode for daily loads: upsert customers / products, append only
+    new invoices. Tables, keys and indexes stay in place.
+    """
+    print("📦 Starting incremental ingest...")
+    DATABASE_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+    engine = create_engine(DATABASE_URL)
+    incremental_ingest(engine, csv_path)
+
+def print_summary(counts):
     print("\n" + "="*60)
     print("🎉 DATABASE NORMALIZATION COMPLETE!")
     print("="*60)
     print(f"📊 Summary:")
-    print(f"   • Customers: {len(customers)} records")
-    print(f"   • Products: {len(products)} records")
-    print(f"   • Orders: {len(orders)} records")
-    print(f"   • Order Items: {len(order_items)} records")
+    print(f"   • Customers: {counts['customers']} records")
+    print(f"   • Products: {counts['products']} records")
+    print(f"   • Orders: {counts['orders']} records")
+    print(f"   • Order Items: {counts['order_items']} records")
     print("\n✅ Your database now has 4 related tables ready for AI queries!")
 
+def load_with_to_sql(engine, frames):
+    """Original load path: drop and recreate each table with pandas INSERTs."""
+    # Replacing the base tables invalidates every rollup; they are rebuilt in full at the end
+    drop_rollups(engine)
+    # FK constraints would block the DROP TABLE inside to_sql(if_exists='replace')
+    drop_foreign_keys(engine)
+    
+    for table, frame in frames.items():
+        start = time.perf_counter()
+        frame.to_sql(table, engine, if_exists='replace', index=False)
+        elapsed = time.perf_counter() - start
+        print(f"   ✅ {table}: {len(frame):,} rows in {elapsed:.2f}s ({len(frame) / elapsed if elapsed else 0:,.0f} rows/s, to_sql)")
+    
+    print("\n🔗 Adding foreign key constraints...")
+    # Keys and FK indexes first: the constraints need unique referenced columns
+    setup_schema(engine)
+    add_foreign_keys(engine)
+    with engine.begin() as conn:
+        bump_data_version(conn, "full_reload", sum(len(frame) for frame in frames.values()))
+
 if __name__ == "__main__":
-    create_normalized_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Normalize the transactions CSV into 4 tables")
+    parser.add_argument("--csv", default=CSV_PATH, help="Source CSV file")
+    parser.add_argument("--loader", choices=["copy", "binary", "to_sql"], default="copy",
+                        help="COPY (csv/binary) into staging tables with an atomic swap, or pandas to_sql")
+    parser.add_argument("--chunksize", type=int, default=0,
+                        help="Stream the CSV in chunks of this many rows (bounded memory; COPY loaders only)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Parallel ingest with this many transform processes / COPY connections (COPY loaders only)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only add new invoices (upsert customers/products) instead of replacing the tables")
+    parser.add_argument("--partitioned", action="store_true", default=None,
+                        help="Create orders / order_items as monthly range partitions on order_date "
+                             "(default: PARTITION_FACT_TABLES where the loader supports it; "
+                             "incremental ingest follows the live tables)")
+    args = parser.parse_args()
+    if (args.chunksize or args.workers) and args.loader == 'to_sql':
+        parser.error("--chunksize / --workers require --loader copy or binary")
+    if args.chunksize and args.workers:
+        # The parallel loader reads the whole CSV up front; it has no bounded-memory mode
+        parser.error("--chunksize and --workers cannot be combined")
+    can_partition = args.loader != 'to_sql' and not args.chunksize
+    if args.partitioned is None:
+        # The env default only applies where it can; an explicit --partitioned is checked below
+        args.partitioned = PARTITION_FACT_TABLES and can_partition
+    elif not args.incremental and not can_partition:
+        parser.error("--partitioned requires --loader copy or binary, without --chunksize")
+    if args.incremental:
+        ingest_new_invoices(args.csv)
+    elif args.workers:
+        create_normalized_database_parallel(args.csv, args.loader, args.workers, args.partitioned)
+    elif args.chunksize:
+        create_normalized_database_streaming(args.csv, args.loader, args.chunksize)
+    else:
+        create_normalized_database(args.csv, args.loader, args.partitioned)
\ No newline at end of file
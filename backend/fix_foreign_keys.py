@@ -3,6 +3,8 @@ from sqlalchemy import create_engine, text
 import os
 from dotenv import load_dotenv
 
+from app.db.schema_setup import create_indexes, ensure_primary_keys
+
 load_dotenv()
 
 def fix_foreign_keys():
@@ -13,7 +15,11 @@ def fix_foreign_keys():
     DATABASE_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
     engine = create_engine(DATABASE_URL)
     
-    with engine.connect() as conn:
+    # Primary keys first, each skipped if present (a second ADD PRIMARY KEY would abort the transaction)
+    ensure_primary_keys(engine)
+    print("✅ Primary key constraints in place")
+    
+    with engine.begin() as conn:
         try:
             # 1. Drop existing constraints if they exist
             conn.execute(text("""
@@ -23,15 +29,7 @@ def fix_foreign_keys():
             """))
             print("✅ Dropped existing constraints (if any)")
             
-            # 2. Ensure primary keys exist
-            conn.execute(text("""
-                ALTER TABLE customers ADD PRIMARY KEY (customer_id);
-                ALTER TABLE products ADD PRIMARY KEY (product_id);
-                ALTER TABLE orders ADD PRIMARY KEY (order_id);
-            """))
-            print("✅ Added primary key constraints")
-            
-            # 3. Now add foreign keys
+            # 2. Now add foreign keys
             conn.execute(text("""
                 ALTER TABLE orders 
                 ADD CONSTRAINT fk_orders_customers 
@@ -52,7 +50,7 @@ def fix_foreign_keys():
             
             print("✅ Foreign key constraints added successfully!")
             
-            # 4. Verify the constraints
+            # 3. Verify the constraints
             result = conn.execute(text("""
                 SELECT
                     tc.table_name, 
@@ -74,11 +72,14 @@ def fix_foreign_keys():
             for fk in foreign_keys:
                 print(f"   {fk[0]}.{fk[1]} → {fk[2]}.{fk[3]}")
             
-            return True
-            
         except Exception as e:
             print(f"❌ Error fixing foreign keys: {e}")
             return False
+    
+    # 4. Index the FK columns (Postgres does not do this for foreign keys)
+    print("\n🗂️ Indexing foreign key columns...")
+    create_indexes(engine)
+    return True
 
 if __name__ == "__main__":
     fix_foreign_keys()
\ No newline at end of file
@@ -0,0 +1,89 @@
+# backend/test_fast_path.py
+"""
+Rule-based fast path (app/llm/fast_path.py): which questions the templates
+may answer, and with which slots. A wrong match is a confident wrong answer,
+so every question the templates cannot express must go to the LLM.
+No database needed: python -m pytest test_fast_path.py (or run directly).
+"""
+import sys
+import os
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.llm.fast_path import FAST_PATH_MIN_CONFIDENCE, build_sql, extract_slots, match_intent
+
+
+def _fast_intent(question):
+    """Intent the rules would serve without the LLM, or None."""
+    intent, confidence = match_intent(question)
+    return intent if confidence >= FAST_PATH_MIN_CONFIDENCE else None
+
+
+def test_supported_questions():
+    for question, intent in [
+        ("top 5 products", "top_products"),
+        ("top 10 customers", "top_customers"),
+        ("total revenue", "revenue_total"),
+        ("monthly revenue", "revenue_time_series"),
+        ("revenue by country", "revenue_by_country"),
+        ("customers by country", "customers_by_country"),
+        ("How many customers in France in 2011?", "customers_by_country"),
+        ("customer 17850 orders", "customer_orders"),
+        ("what products did customer 17850 buy", "customer_products"),
+    ]:
+        assert _fast_intent(question) == intent, question
+
+
+def test_per_group_rankings_go_to_llm():
+    for question in [
+        "best selling product per month",
+        "monthly revenue of top products",
+        "top 5 products in each country",
+        "top products by revenue per country",
+        "top 10 customers by revenue each month",
+    ]:
+        assert _fast_intent(question) is None, question
+
+
+def test_other_aggregates_go_to_llm():
+    for question in [
+        "What is the average monthly revenue?",
+        "average revenue by country",
+        "revenue share by country",
+        "median order value by country",
+        "lowest revenue countries",
+    ]:
+        assert _fast_intent(question) is None, question
+
+
+def test_low_confidence_matches_go_to_llm():
+    assert _fast_intent("revenue for customer 17850") is None
+
+
+def test_customer_id_and_year():
+    assert extract_slots("customer 17850 orders")["customer_id"] == "17850"
+    assert extract_slots("customer id 2011 orders")["customer_id"] == "2011"
+    slots = extract_slots("top customer 2011")
+    assert "customer_id" not in slots
+    assert slots["period"] == {"kind": "absolute", "start": date(2011, 1, 1), "end": date(2012, 1, 1)}
+    assert _fast_intent("top customer 2011") == "top_customers"
+    assert extract_slots("top 2010 products") == {"top_n": 2010}
+
+
+def test_customers_by_country_applies_slots():
+    sql, params = build_sql("customers_by_country", extract_slots("How many customers in France in 2011?"))
+    assert "c.country = :country" in sql and params["country"] == "France"
+    assert "o.order_date >= :start_date" in sql and params["start_date"] == date(2011, 1, 1)
+    assert "COUNT(DISTINCT c.customer_id)" in sql
+
+    sql, params = build_sql("customers_by_country", extract_slots("how many customers in Germany"))
+    assert "WHERE c.country = :country" in sql and params["country"] == "Germany"
+    assert "orders" not in sql
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
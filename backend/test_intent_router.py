@@ -0,0 +1,69 @@
+# backend/test_intent_router.py
+"""
+Intent router (app/llm/intent_router.py): when a question may skip the LLM.
+The router trains from its seed examples, so no database or model file is
+needed: python -m pytest test_intent_router.py (or run directly).
+"""
+import sys
+import os
+import json
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.llm.intent_router import IntentRouter, load_training_log, route_question, train_router
+
+
+def test_fast_path_when_router_and_rules_agree():
+    for question, intent in [
+        ("top 5 products", "top_products"),
+        ("monthly revenue", "revenue_time_series"),
+        ("revenue by country", "revenue_by_country"),
+        ("How many customers in France in 2011?", "customers_by_country"),
+    ]:
+        decision = route_question(question)
+        assert decision["route"] == "fast_path", question
+        assert decision["fast_path"]["intent"] == intent, question
+
+
+def test_llm_when_rules_are_not_confident():
+    # The rules match these intents only at 0.6-0.7, or not at all
+    for question in [
+        "top products by revenue per country",
+        "top 10 customers by revenue each month",
+        "revenue for customer 17850",
+        "best selling product per month",
+        "average revenue by country",
+    ]:
+        decision = route_question(question)
+        assert decision["route"] == "llm", question
+        assert decision["fast_path"] is None, question
+
+
+def test_training_log_uses_reviewed_labels_only():
+    records = [
+        {"question": "sales per nation", "label": "revenue_by_country"},
+        # The router's own prediction, never reviewed
+        {"question": "how are we doing", "intent": "revenue_total"},
+        {"question": "unknown label", "label": "not_an_intent"},
+    ]
+    with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as f:
+        f.write("\n".join(json.dumps(r) for r in records) + "\nnot json\n")
+    try:
+        assert load_training_log(f.name) == [("sales per nation", "revenue_by_country")]
+    finally:
+        os.remove(f.name)
+
+
+def test_model_round_trip():
+    router = train_router()
+    restored = IntentRouter.from_dict(json.loads(json.dumps(router.to_dict())))
+    for question in ["top 5 products", "customers by country", "how many orders did customer 17850 place"]:
+        assert restored.predict(question) == router.predict(question), question
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,81 @@
+# backend/test_sanitizer.py
+"""
+Row-cap and ORDER BY rewrites in app/utils/sanitizer.py. A wrong rewrite
+silently changes query results, so the expected SQL is pinned here.
+No database needed: python -m pytest test_sanitizer.py (or run directly).
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.sanitizer import _strip_redundant_order_by, push_down_limit, strip_row_cap, wrap_with_limit
+
+
+def test_push_down_limit():
+    # No LIMIT: the cap is appended
+    assert push_down_limit("SELECT a FROM t", 1000) == ("SELECT a FROM t LIMIT :_limit", 1000)
+    # A smaller limit is kept, a larger one is capped
+    assert push_down_limit("SELECT a FROM t LIMIT 5", 1000) == ("SELECT a FROM t LIMIT :_limit", 5)
+    assert push_down_limit("SELECT a FROM t LIMIT 5000", 1000) == ("SELECT a FROM t LIMIT :_limit", 1000)
+    # Bound LIMIT values are resolved from the params
+    assert push_down_limit("SELECT a FROM t LIMIT :n", 1000, {"n": 3}) == ("SELECT a FROM t LIMIT :_limit", 3)
+    # OFFSET stays where it is
+    assert push_down_limit("SELECT a FROM t LIMIT 10 OFFSET 20", 1000) == \
+        ("SELECT a FROM t LIMIT :_limit OFFSET 20", 10)
+    assert push_down_limit("SELECT a FROM t;", 1000) == ("SELECT a FROM t LIMIT :_limit", 1000)
+
+
+def test_push_down_limit_refuses_unsafe_shapes():
+    assert push_down_limit("SELECT a FROM t FETCH FIRST 5 ROWS ONLY", 1000) is None
+    assert push_down_limit("SELECT a FROM t LIMIT ALL", 1000) is None
+    assert push_down_limit("SELECT a FROM t LIMIT :n", 1000, {}) is None
+    assert push_down_limit("DELETE FROM t", 1000) is None
+
+
+def test_wrap_with_limit_falls_back_to_subquery():
+    assert wrap_with_limit("SELECT a FROM t FETCH FIRST 5 ROWS ONLY", 1000) == \
+        ("SELECT * FROM (SELECT a FROM t FETCH FIRST 5 ROWS ONLY) AS _sub LIMIT :_limit", {"_limit": 1000})
+    assert wrap_with_limit("SELECT a FROM t LIMIT ALL;", 1000) == \
+        ("SELECT * FROM (SELECT a FROM t LIMIT ALL) AS _sub LIMIT :_limit", {"_limit": 1000})
+
+
+def test_strip_row_cap():
+    assert strip_row_cap("SELECT a FROM t LIMIT 1000", 1000) == ("SELECT a FROM t", {})
+    assert strip_row_cap("SELECT a FROM t LIMIT :limit;", 1000, {"limit": 1000, "x": 1}) == \
+        ("SELECT a FROM t", {"x": 1})
+    # Explicit limits, paged limits and inner limits are not the cap
+    assert strip_row_cap("SELECT a FROM t LIMIT 10", 1000) == ("SELECT a FROM t LIMIT 10", {})
+    assert strip_row_cap("SELECT a FROM t LIMIT 1000 OFFSET 5", 1000) == ("SELECT a FROM t LIMIT 1000 OFFSET 5", {})
+    assert strip_row_cap("SELECT a FROM (SELECT a FROM t LIMIT 1000) s", 1000) == \
+        ("SELECT a FROM (SELECT a FROM t LIMIT 1000) s", {})
+
+
+def test_redundant_subquery_order_by_is_dropped():
+    assert _strip_redundant_order_by("SELECT * FROM (SELECT a FROM t ORDER BY a) s ORDER BY a") == \
+        "SELECT * FROM (SELECT a FROM t) s ORDER BY a"
+    # Without an outer ORDER BY the query is left alone
+    sql = "SELECT * FROM (SELECT a FROM t ORDER BY a) s"
+    assert _strip_redundant_order_by(sql) == sql
+
+
+def test_order_dependent_subquery_order_by_is_kept():
+    for sql in [
+        # LIMIT / FETCH pick rows by the inner order
+        "SELECT * FROM (SELECT a FROM t ORDER BY a LIMIT 3) s ORDER BY a",
+        "SELECT * FROM (SELECT a FROM t ORDER BY a FETCH FIRST 3 ROWS ONLY) s ORDER BY a",
+        # DISTINCT ON keeps the first row of each group
+        "SELECT * FROM (SELECT DISTINCT ON (a) a, b FROM t ORDER BY a, b DESC) s ORDER BY b",
+        # Ordered aggregates and window functions read rows in the inner order
+        "SELECT string_agg(a, ',') FROM (SELECT a FROM t ORDER BY a) s GROUP BY 1 ORDER BY 1",
+        "SELECT array_agg(a) FROM (SELECT a FROM t ORDER BY a) s ORDER BY 1",
+        "SELECT a, row_number() OVER () FROM (SELECT a FROM t ORDER BY a) s ORDER BY a",
+    ]:
+        assert _strip_redundant_order_by(sql) == sql, sql
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -8,6 +8,8 @@ from dotenv import load_dotenv
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv()
 
+from app.db.schema_setup import TEMPLATE_QUERIES
+
 def verify_database():
     """Verify normalized database structure and relationships"""
     
@@ -59,29 +61,14 @@ def verify_database():
         
         # Query 1: Customer count by country
         print("\n   1. Customers by country (top 5):")
-        result = conn.execute(text("""
-            SELECT country, COUNT(*) as customer_count
-            FROM customers
-            GROUP BY country
-            ORDER BY customer_count DESC
-            LIMIT 5;
-        """))
+        result = conn.execute(text(TEMPLATE_QUERIES["customers_by_country"]))
         
         for row in result.fetchall():
             print(f"      {row[0]:20} → {row[1]:>5} customers")
         
         # Query 2: Top selling products
         print("\n   2. Top selling products (by quantity):")
-        result = conn.execute(text("""
-            SELECT p.name, SUM(oi.quantity) as total_quantity
-            FROM products p
-            JOIN order_items oi ON p.product_id = oi.product_id
-            JOIN orders o ON oi.order_id = o.order_id
-            WHERE o.status = 'completed'
-            GROUP BY p.product_id, p.name
-            ORDER BY total_quantity DESC
-            LIMIT 5;
-        """))
+        result = conn.execute(text(TEMPLATE_QUERIES["top_products"]))
         
         for row in result.fetchall():
             product_name = str(row[0])[:40] + "..." if len(str(row[0])) > 40 else row[0]
@@ -89,37 +76,14 @@ def verify_database():
         
         # Query 3: Customer lifetime value
         print("\n   3. Top customers by spending:")
-        result = conn.execute(text("""
-            SELECT c.customer_id, c.country, 
-                   SUM(o.total_amount) as total_spent,
-                   COUNT(o.order_id) as order_count
-            FROM customers c
-            JOIN orders o ON c.customer_id = o.customer_id
-            WHERE o.status = 'completed'
-            GROUP BY c.customer_id, c.country
-            ORDER BY total_spent DESC
-            LIMIT 5;
-        """))
+        result = conn.execute(text(TEMPLATE_QUERIES["top_customers"]))
         
         for row in result.fetchall():
             print(f"      Customer {row[0]} ({row[1]}): ${row[2]:>9,.2f} in {row[3]} orders")
         
         # Query 4: Test JOIN across all 4 tables
         print("\n   4. Complex JOIN test (all 4 tables):")
-        result = conn.execute(text("""
-            SELECT c.customer_id, c.country, 
-                   o.order_id, o.order_date,
-                   p.name as product_name,
-                   oi.quantity, oi.unit_price,
-                   (oi.quantity * oi.unit_price) as line_total
-            FROM customers c
-            JOIN orders o ON c.customer_id = o.customer_id
-            JOIN order_items oi ON o.order_id = oi.order_id
-            JOIN products p ON oi.product_id = p.product_id
-            WHERE o.status = 'completed'
-            ORDER BY o.order_date DESC
-            LIMIT 3;
-        """))
+        result = conn.execute(text(TEMPLATE_QUERIES["four_table_join"]))
         
         rows = result.fetchall()
         print(f"      ✅ Query successful! Returned {len(rows)} rows")